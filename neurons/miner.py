@@ -26,6 +26,7 @@ import base64
 import asyncio
 import threading
 import traceback
+import redis
 import bittensor as bt
 from typing import Dict
 from redis import asyncio as aioredis
@@ -36,15 +37,16 @@ from pprint import pformat
 import storage
 from storage.shared.ecc import (
     hash_data,
+    DataHasher,
+    hash_stream,
     ECCommitment,
     ecc_point_to_hex,
     hex_to_ecc_point,
+    negotiate_point_encoding,
 )
 
 from storage.shared.utils import (
     b64_encode,
-    chunk_data,
-    safe_key_search,
     get_redis_password,
 )
 
@@ -56,17 +58,40 @@ from storage.miner import (
 
 from storage.miner.utils import (
     compute_subsequent_commitment,
-    save_data_to_filesystem,
-    load_from_filesystem,
-    commit_data_with_seed,
+    compute_commitment_from_proof,
+    precompute_storage_proof,
+    read_segment,
+    blob_size,
+    get_directory_size,
     init_wandb,
     update_storage_stats,
     load_request_log,
     log_request,
+    compute_stake_weights,
     RateLimiter,
-    get_purge_ttl_script_path,
 )
 
+from storage.miner.background import BackgroundWorker
+from storage.miner.blobio import BlobIO
+from storage.miner.cache import BlobCache
+from storage.miner.disks import DiskSet
+from storage.miner.tiering import AccessTracker, rebalance_tiers
+from storage.miner.blobstore import (
+    BLOB_DIRECTORY,
+    BLOB_RETIRE_GRACE_PERIOD,
+    BlobStore,
+    compact_packfiles,
+    delete_retired_blobs,
+    migrate_blob_layout,
+    purge_expired_chunks,
+)
+from storage.miner.packfile import PackStore
+from storage.miner.commitment import CommitmentEngine
+from storage.miner.metrics import MetricsRegistry, MetricsServer, write_metrics_snapshot
+from storage.miner.scheduler import DeadlineExceeded, WorkScheduler
+from storage.miner.scrubber import scrub_blobs
+from storage.miner.admission import AdmissionController, DEPRIORITIZE, SHED
+
 from storage.miner.config import (
     config,
     check_config,
@@ -75,10 +100,14 @@ from storage.miner.config import (
 
 from storage.miner.database import (
     store_chunk_metadata,
-    update_seed_info,
-    get_chunk_metadata,
+    update_proof_info,
+    rotate_chunk_seed,
     get_filepath,
+    get_total_storage_used,
+    bootstrap_storage_ledger,
+    index_chunk_expiry,
     store_or_update_chunk_metadata,
+    upgrade_schema,
 )
 
 
@@ -178,8 +207,60 @@ class miner:
             socket_connect_timeout=300,
             password=redis_password,
         )
-        self.purge_ttl_path = get_purge_ttl_script_path(
-            os.path.dirname(os.path.abspath(__file__))
+        # Blocking client for the storage stats, which are refreshed from the block handler thread
+        self.sync_database = redis.StrictRedis(
+            host=self.config.database.host,
+            port=self.config.database.port,
+            db=self.config.database.index,
+            socket_keepalive=True,
+            socket_connect_timeout=300,
+            password=redis_password,
+        )
+        # Disk reads and writes of the handlers run on a thread pool, off the axon's event loop
+        self.blob_io = BlobIO(
+            max_workers=self.config.miner.io_threads,
+            max_pending=self.config.miner.io_queue_depth,
+            fsync=self.config.miner.fsync,
+            fsync_interval=self.config.miner.fsync_interval,
+        )
+        # Spread new blobs over the data directories of every disk
+        self.disks = DiskSet(
+            [self.config.database.directory] + list(self.config.database.extra_directories or []),
+            min_free_bytes=self.config.database.min_free_space,
+            fast_directories=self.config.database.fast_directories or [],
+        )
+        # Challenges and retrieves per blob, driving the moves between the fast and bulk tiers
+        self.access_tracker = AccessTracker()
+        self.blob_store = BlobStore(
+            self.config.database.directory,
+            self.config.miner.blob_shard_levels,
+            packs=PackStore(
+                os.path.join(self.config.database.directory, BLOB_DIRECTORY),
+                segment_size=self.config.miner.packfile_segment_size,
+                max_blob_size=self.config.miner.packfile_max_blob_size,
+                io=self.blob_io,
+            )
+            if self.config.miner.packfile
+            else None,
+            io=self.blob_io,
+            cache=BlobCache(
+                self.config.miner.blob_cache_size,
+                self.config.miner.blob_cache_max_blob_size,
+            )
+            if self.config.miner.blob_cache_size > 0
+            else None,
+            disks=self.disks,
+        )
+        # Maintenance tasks run on their own event loop and Redis client
+        self.background = BackgroundWorker(
+            lambda: aioredis.StrictRedis(
+                host=self.config.database.host,
+                port=self.config.database.port,
+                db=self.config.database.index,
+                socket_keepalive=True,
+                socket_connect_timeout=300,
+                password=redis_password,
+            )
         )
 
         self.my_subnet_uid = self.metagraph.hotkeys.index(
@@ -210,6 +291,10 @@ class miner:
             forward_fn=self.retrieve,
             blacklist_fn=self.retrieve_blacklist_fn,
             priority_fn=self.retrieve_priority_fn,
+        ).attach(
+            forward_fn=self.retrieve_stream,
+            blacklist_fn=self.retrieve_stream_blacklist_fn,
+            priority_fn=self.retrieve_stream_priority_fn,
         )
 
         # Serve passes the axon information to the network + netuid we are hosting on.
@@ -241,11 +326,89 @@ class miner:
         self.requests_per_hour = []
         self.average_requests_per_hour = 0
 
-        # Init the miner's storage usage tracker
+        # Init the per caller rate limiter, weighted by stake
+        self.rate_limiter = RateLimiter(
+            self.config.miner.max_requests_per_window,
+            self.config.miner.rate_limit_window,
+        )
+        self.update_rate_limit_weights()
+        self.request_log = load_request_log(self.config.miner.request_log_path)
+
+        # Background tasks precomputing the storage proofs of updated seeds
+        self.proof_tasks = set()
+
+        # Latency histograms of the handler phases, request counters and gauges of the miner's state
+        self.metrics = MetricsRegistry()
+        self.metrics_server = None
+
+        # Init the worker processes that compute the challenge commitments
+        self.commitment_engine = CommitmentEngine(
+            self.config.miner.commitment_workers, metrics=self.metrics
+        )
+
+        # Init the worker threads running the hashing and commitments of requests by priority
+        self.scheduler = WorkScheduler(
+            self.config.miner.cpu_workers or os.cpu_count() or 1,
+            self.config.miner.cpu_queue_size,
+        )
+
+        # Admit challenges by their estimated cost against the capacity of the commitment workers
+        self.admission = AdmissionController(
+            self.commitment_engine.max_workers,
+            self.config.miner.admission_window,
+            self.config.miner.commit_cost,
+        )
+        self.register_metrics()
+
+        # Init the miner's storage usage tracker, which also logs the state of the workers above
         update_storage_stats(self)
 
-        self.rate_limiters = {}
-        self.request_log = load_request_log(self.config.miner.request_log_path)
+    def register_metrics(self):
+        """
+        Describes the metrics of the miner and registers the gauges read from its components.
+        """
+        self.metrics.describe(
+            "miner_phase_seconds",
+            "Seconds spent in each phase of the request handlers.",
+        )
+        self.metrics.describe(
+            "miner_requests_total", "Requests received, by handler and validator hotkey."
+        )
+        self.metrics.describe(
+            "miner_dropped_requests_total", "Requests dropped before their deadline, by handler."
+        )
+        self.metrics.gauge("miner_cpu_queue_depth", lambda: self.scheduler.queue_depth)
+        self.metrics.gauge("miner_io_pending", lambda: self.blob_io.pending)
+        self.metrics.gauge(
+            "miner_admission_outstanding_seconds", lambda: self.admission.outstanding
+        )
+        self.metrics.gauge("miner_storage_bytes", lambda: self.current_storage_usage)
+        self.metrics.gauge(
+            "miner_disk_free_bytes",
+            lambda: {disk["directory"]: disk["free_bytes"] for disk in self.disks.stats()},
+            label="directory",
+        )
+        self.metrics.gauge(
+            "miner_disk_total_bytes",
+            lambda: {disk["directory"]: disk["total_bytes"] for disk in self.disks.stats()},
+            label="directory",
+        )
+        if self.blob_store.cache is not None:
+            self.metrics.gauge("miner_cache_hit_rate", lambda: self.blob_store.cache.hit_rate)
+            self.metrics.gauge("miner_cache_bytes", lambda: self.blob_store.cache.size)
+
+    def count_request(self, handler: str, synapse: bt.Synapse):
+        """
+        Counts a request received by a handler, in total and per validator.
+        """
+        self.request_count += 1
+        self.metrics.inc("miner_requests_total", handler=handler, hotkey=synapse.dendrite.hotkey)
+
+    def phase(self, handler: str, phase: str):
+        """
+        Times a phase of a request handler, e.g. `with self.phase("challenge", "redis"):`.
+        """
+        return self.metrics.time("miner_phase_seconds", handler=handler, phase=phase)
 
     def start_request_count_timer(self):
         """
@@ -284,13 +447,45 @@ class miner:
         self.request_count = 0
         self.start_request_count_timer()
 
+    def schedule_storage_proof(
+        self, chunk_hash: str, hotkey: str, filepath: str, seed: str
+    ):
+        """
+        Schedules the computation of the storage proof, hash(data + seed), for a freshly written seed.
+
+        The proof is computed in the background right after the seed update and stored with the chunk
+        metadata, so the next challenge or retrieve for this chunk only has to hash the small proof
+        string with its new seed instead of hashing the whole blob on the request path.
+
+        Args:
+            chunk_hash (str): The unique hash identifying the chunk.
+            hotkey (str): The caller hotkey the seed belongs to.
+            filepath (str or BlobRange): The location of the blob on disk.
+            seed (str): The seed just written for this chunk and hotkey.
+        """
+        if not filepath:
+            return
+
+        async def precompute():
+            try:
+                await precompute_storage_proof(
+                    self.database, chunk_hash, hotkey, filepath, seed
+                )
+            except Exception as e:
+                bt.logging.warning(f"Could not precompute proof for {chunk_hash}: {e}")
+
+        task = asyncio.create_task(precompute())
+        self.proof_tasks.add(task)
+        task.add_done_callback(self.proof_tasks.discard)
+
     @property
     async def total_storage(self):
         """
         Calculates the total size of data stored by the miner.
 
-        This method fetches all data keys from the Redis database and sums up the size of each data object.
-        It provides an estimate of the total amount of data currently held by the miner.
+        This method reads the storage ledger, which is updated on every store and delete, so it does
+        not need to scan the Redis database. Until the ledger has been built, the data directories
+        are walked instead.
 
         Returns:
             int: Total size of data (in bytes) stored by the miner.
@@ -299,21 +494,58 @@ class miner:
             >>> miner.total_storage()
             102400  # Example output indicating 102,400 bytes of data stored
         """
-        # Fetch all keys from Redis
-        all_keys = await safe_key_search(self.database, "*")
+        total = await get_total_storage_used(self.database)
+        if total is None:
+            total = await asyncio.to_thread(
+                lambda: sum(get_directory_size(root.directory) for root in self.disks.roots)
+            )
+        return total
 
-        # Filter out keys that contain a period (temporary, remove later)
-        filtered_keys = [key for key in all_keys if b"." not in key]
-        total_size = 0
-        for key in filtered_keys:
-            try:
-                key_dict = await self.database.hgetall(key)
-                first_hotkey = list(key_dict)[0]
-                size = int(json.loads(key_dict[first_hotkey]).get("size", 0))
-            except Exception as e:
-                size = 0
-            total_size += size
-        return total_size
+    def update_rate_limit_weights(self):
+        """
+        Recomputes the stake weighted request rate of every hotkey from the metagraph.
+        """
+        self.hotkey_weights = compute_stake_weights(
+            self.metagraph.hotkeys,
+            self.metagraph.S.tolist(),
+            self.config.miner.rate_limit_min_weight,
+            self.config.miner.rate_limit_max_weight,
+        )
+
+    def blacklist_request(self, synapse: bt.Synapse) -> typing.Tuple[bool, str]:
+        """
+        Blacklist logic shared by every synapse type.
+
+        Callers are checked against the configured blacklist and the metagraph before any state is
+        kept for them, so unknown hotkeys are rejected cheaply and cannot grow the request log or the
+        rate limiter. Registered callers then take a token from their own stake weighted bucket.
+        """
+        caller = synapse.dendrite.hotkey
+        if caller in self.config.blacklist.blacklist_hotkeys:
+            return True, f"Hotkey {caller} in blacklist."
+
+        whitelisted = caller in self.config.blacklist.whitelist_hotkeys
+        weight = self.hotkey_weights.get(caller)
+        if weight is None and not whitelisted:
+            bt.logging.trace(f"Blacklisting unrecognized hotkey {caller}")
+            return True, "Unrecognized hotkey"
+
+        try:
+            self.request_log = log_request(synapse, self.request_log)
+        except Exception as e:
+            bt.logging.error(f"Error logging request: {e}")
+
+        if whitelisted:
+            return False, f"Hotkey {caller} in whitelist."
+
+        if not self.rate_limiter.is_allowed(caller, weight):
+            limit = self.config.miner.max_requests_per_window * weight
+            window = self.config.miner.rate_limit_window
+            reason = f"Caller {caller} rate limited. Exceeded {limit:.1f} requests in {window} seconds."
+            return True, reason
+
+        bt.logging.trace(f"Not Blacklisting recognized hotkey {caller}")
+        return False, "Hotkey recognized!"
 
     def store_blacklist_fn(
         self, synapse: storage.protocol.Store
@@ -340,35 +572,7 @@ class miner:
         This method is internally used by the network to ensure that only recognized
         entities can participate in communication or transactions.
         """
-        try:
-            self.request_log = log_request(synapse, self.request_log)
-        except Exception as e:
-            bt.logging.error(f"Error logging request: {e}")
-
-        caller = synapse.dendrite.hotkey
-        if caller in self.config.blacklist.blacklist_hotkeys:
-            return True, f"Hotkey {caller} in blacklist."
-        elif caller in self.config.blacklist.whitelist_hotkeys:
-            return False, f"Hotkey {caller} in whitelist."
-
-        if caller not in self.rate_limiters:
-            self.rate_limiters[caller] = RateLimiter(
-                self.config.miner.max_requests_per_window,
-                self.config.miner.rate_limit_window,
-            )
-
-        if not self.rate_limiters[caller].is_allowed(caller):
-            window = self.config.miner.max_requests_per_window
-            blocks = self.config.miner.rate_limit_window
-            reason = f"Caller {caller} rate limited. Exceeded {window} requests in {blocks} blocks."
-            return True, reason
-
-        if caller not in self.metagraph.hotkeys:
-            bt.logging.trace(f"Blacklisting unrecognized hotkey {caller}")
-            return True, "Unrecognized hotkey"
-
-        bt.logging.trace(f"Not Blacklisting recognized hotkey {caller}")
-        return False, "Hotkey recognized!"
+        return self.blacklist_request(synapse)
 
     def store_priority_fn(self, synapse: storage.protocol.Store) -> float:
         """
@@ -427,35 +631,7 @@ class miner:
         This method is internally used by the network to ensure that only recognized
         entities can participate in communication or transactions.
         """
-        try:
-            self.request_log = log_request(synapse, self.request_log)
-        except Exception as e:
-            bt.logging.error(f"Error logging request: {e}")
-
-        caller = synapse.dendrite.hotkey
-        if caller in self.config.blacklist.blacklist_hotkeys:
-            return True, f"Hotkey {caller} in blacklist."
-        elif caller in self.config.blacklist.whitelist_hotkeys:
-            return False, f"Hotkey {caller} in whitelist."
-
-        if caller not in self.rate_limiters:
-            self.rate_limiters[caller] = RateLimiter(
-                self.config.miner.max_requests_per_window,
-                self.config.miner.rate_limit_window,
-            )
-
-        if not self.rate_limiters[caller].is_allowed(caller):
-            window = self.config.miner.max_requests_per_window
-            blocks = self.config.miner.rate_limit_window
-            reason = f"Caller {caller} rate limited. Exceeded {window} requests in {blocks} blocks."
-            return True, reason
-
-        if caller not in self.metagraph.hotkeys:
-            bt.logging.trace(f"Blacklisting unrecognized hotkey {caller}")
-            return True, "Unrecognized hotkey"
-
-        bt.logging.trace(f"Not Blacklisting recognized hotkey {caller}")
-        return False, "Hotkey recognized!"
+        return self.blacklist_request(synapse)
 
     def challenge_priority_fn(self, synapse: storage.protocol.Challenge) -> float:
         """
@@ -514,35 +690,7 @@ class miner:
         This method is internally used by the network to ensure that only recognized
         entities can participate in communication or transactions.
         """
-        try:
-            self.request_log = log_request(synapse, self.request_log)
-        except Exception as e:
-            bt.logging.error(f"Error logging request: {e}")
-
-        caller = synapse.dendrite.hotkey
-        if caller in self.config.blacklist.blacklist_hotkeys:
-            return True, f"Hotkey {caller} in blacklist."
-        elif caller in self.config.blacklist.whitelist_hotkeys:
-            return False, f"Hotkey {caller} in whitelist."
-
-        if caller not in self.rate_limiters:
-            self.rate_limiters[caller] = RateLimiter(
-                self.config.miner.max_requests_per_window,
-                self.config.miner.rate_limit_window,
-            )
-
-        if not self.rate_limiters[caller].is_allowed(caller):
-            window = self.config.miner.max_requests_per_window
-            blocks = self.config.miner.rate_limit_window
-            reason = f"Caller {caller} rate limited. Exceeded {window} requests in {blocks} blocks."
-            return True, reason
-
-        if caller not in self.metagraph.hotkeys:
-            bt.logging.trace(f"Blacklisting unrecognized hotkey {caller}")
-            return True, "Unrecognized hotkey"
-
-        bt.logging.trace(f"Not Blacklisting recognized hotkey {caller}")
-        return False, "Hotkey recognized!"
+        return self.blacklist_request(synapse)
 
     def retrieve_priority_fn(self, synapse: storage.protocol.Retrieve) -> float:
         """
@@ -576,6 +724,74 @@ class miner:
         )
         return prirority
 
+    def retrieve_stream_blacklist_fn(
+        self, synapse: storage.protocol.RetrieveStream
+    ) -> typing.Tuple[bool, str]:
+        """
+        Blacklists streaming retrieve requests like `retrieve_blacklist_fn`.
+        """
+        return self.blacklist_request(synapse)
+
+    def retrieve_stream_priority_fn(
+        self, synapse: storage.protocol.RetrieveStream
+    ) -> float:
+        """
+        Prioritizes streaming retrieve requests by the stake of the caller, like `retrieve_priority_fn`.
+        """
+        caller_uid = self.metagraph.hotkeys.index(synapse.dendrite.hotkey)
+        return float(self.metagraph.S[caller_uid])
+
+    def caller_stake(self, synapse: bt.Synapse) -> float:
+        """
+        Returns the stake of the validator sending a request, 0 for unknown hotkeys.
+        """
+        try:
+            return float(self.metagraph.S[self.metagraph.hotkeys.index(synapse.dendrite.hotkey)])
+        except ValueError:
+            return 0.0
+
+    def request_deadline(self, synapse: bt.Synapse) -> float:
+        """
+        Returns the `time.monotonic()` time after which the validator stops waiting for the response
+        to a request, keeping `--miner.deadline_margin` seconds to send it back.
+        """
+        timeout = synapse.timeout or self.config.miner.default_request_timeout
+        return time.monotonic() + timeout - self.config.miner.deadline_margin
+
+    def drop_request(self, synapse: bt.Synapse, reason: Exception) -> bt.Synapse:
+        """
+        Answers a request whose work was dropped by the work scheduler.
+        """
+        bt.logging.warning(
+            f"Dropping {synapse.__class__.__name__} from {synapse.dendrite.hotkey}: {reason}"
+        )
+        self.metrics.inc(
+            "miner_dropped_requests_total", handler=synapse.__class__.__name__.lower()
+        )
+        synapse.axon.status_code = 408
+        synapse.axon.status_message = "Request timeout"
+        return synapse
+
+    def commit_store_data(self, synapse: storage.protocol.Store):
+        """
+        Decodes the data of a store request, hashes it, and commits to it with the validator's
+        curve parameters and seed. Blocking, meant to run on the work scheduler.
+
+        Returns:
+            tuple: The raw data, its hash, the committer, and the commitment point, hashed
+            message and randomness of the commitment.
+        """
+        encrypted_byte_data = base64.b64decode(synapse.encrypted_data)
+        data_hash = hash_data(encrypted_byte_data)
+        committer = ECCommitment(
+            hex_to_ecc_point(synapse.g, synapse.curve),
+            hex_to_ecc_point(synapse.h, synapse.curve),
+        )
+        c, m_val, r = committer.commit_hashed(
+            hash_stream((encrypted_byte_data, str(synapse.seed).encode()))
+        )
+        return encrypted_byte_data, data_hash, committer, c, m_val, r
+
     async def store(self, synapse: storage.protocol.Store) -> storage.protocol.Store:
         """
         Processes the storage request from a synapse by securely storing the provided data and returning
@@ -608,48 +824,49 @@ class miner:
             >>> updated_synapse = self.store(synapse)
         """
         bt.logging.info(f"received store request: {synapse.encrypted_data[:24]}")
-        self.request_count += 1
+        self.count_request("store", synapse)
 
-        # Decode the data from base64 to raw bytes
-        encrypted_byte_data = base64.b64decode(synapse.encrypted_data)
+        # Decode, hash and commit to the data on the work scheduler, before touching the disk
+        bt.logging.trace("entering commit_store_data()")
+        try:
+            with self.phase("store", "commitment"):
+                encrypted_byte_data, data_hash, committer, c, m_val, r = await self.scheduler.run(
+                    self.commit_store_data,
+                    synapse,
+                    kind="store",
+                    stake=self.caller_stake(synapse),
+                    deadline=self.request_deadline(synapse),
+                )
+        except DeadlineExceeded as e:
+            return self.drop_request(synapse, e)
         bt.logging.trace(f"store b64decrypted data: {encrypted_byte_data[:24]}")
 
-        # Store the data with the hash as the key in the filesystem
-        bt.logging.trace("entering hash_data()")
-        data_hash = hash_data(encrypted_byte_data)
-
         # If already storing this hash, simply update the validator seeds and return challenge
         bt.logging.trace("checking if data already exists...")
-        
-        if not await self.database.hexists(data_hash, synapse.dendrite.hotkey):
-            # Store the data in the filesystem
-            filepath = save_data_to_filesystem(
-                encrypted_byte_data, self.config.database.directory, synapse.dendrite.hotkey, str(data_hash)
-            )
-            bt.logging.trace(f"stored data {data_hash} in filepath: {filepath}")
-        else:
-            filepath = await get_filepath(self.database, data_hash, synapse.dendrite.hotkey)
-
-        # Add the initial chunk, size, and validator seed information
-        # If data exists and is the same hotkey caller, overwrite prev seed, otherwise add a new entry
-        await store_or_update_chunk_metadata(
-            self.database,
-            data_hash,
-            filepath,
-            synapse.dendrite.hotkey,
-            sys.getsizeof(encrypted_byte_data),
-            synapse.seed,
-            synapse.ttl,
-        )
+        async with self.blob_store.lock(data_hash):
+            if not await self.database.hexists(data_hash, synapse.dendrite.hotkey):
+                # Store the data in the blob store, shared with any other hotkey storing it
+                with self.phase("store", "write"):
+                    filepath = await self.blob_store.store(
+                        self.database, data_hash, encrypted_byte_data
+                    )
+                bt.logging.trace(f"stored data {data_hash} in filepath: {filepath}")
+            else:
+                filepath = await get_filepath(self.database, data_hash, synapse.dendrite.hotkey)
+
+            # Add the initial chunk, size, and validator seed information
+            # If data exists and is the same hotkey caller, overwrite prev seed, otherwise add a new entry
+            with self.phase("store", "redis"):
+                await store_or_update_chunk_metadata(
+                    self.database,
+                    data_hash,
+                    filepath,
+                    synapse.dendrite.hotkey,
+                    len(encrypted_byte_data),
+                    synapse.seed,
+                    synapse.ttl,
+                )
 
-        # Commit to the entire data block
-        bt.logging.trace("entering ECCommitment()")
-        committer = ECCommitment(
-            hex_to_ecc_point(synapse.g, synapse.curve),
-            hex_to_ecc_point(synapse.h, synapse.curve),
-        )
-        bt.logging.trace("entering commit()")
-        c, m_val, r = committer.commit(encrypted_byte_data + str(synapse.seed).encode())
         if self.config.miner.verbose:
             bt.logging.debug(f"committer: {committer}")
             bt.logging.debug(f"encrypted_byte_data: {encrypted_byte_data}")
@@ -659,11 +876,16 @@ class miner:
 
         # Send back some proof that we stored the data
         synapse.randomness = r
-        synapse.commitment = ecc_point_to_hex(c)
+        synapse.commitment = ecc_point_to_hex(c, negotiate_point_encoding(synapse.point_encoding))
         bt.logging.trace(f"signed commitment: {synapse.commitment}")
 
         # Initialize the commitment hash with the initial commitment for chained proofs
         synapse.commitment_hash = str(m_val)
+
+        # hash(data + seed) is also the proof for the next challenge or retrieve
+        await update_proof_info(
+            self.database, data_hash, synapse.dendrite.hotkey, str(synapse.seed), m_val
+        )
         bt.logging.trace(f"initial commitment_hash: {synapse.commitment_hash}")
         if self.config.miner.verbose:
             bt.logging.debug(f"signed m_val: {synapse.signature.hex()}")
@@ -714,59 +936,61 @@ class miner:
         """
         # Retrieve the data itself from miner storage
         bt.logging.info(f"received challenge hash: {synapse.challenge_hash}")
-        self.request_count += 1
-
-        bt.logging.trace("entering get_chunk_metadata()")
-        data = await get_chunk_metadata(
-            r=self.database,
-            chunk_hash=synapse.challenge_hash,
-            hotkey=synapse.dendrite.hotkey,
-        )
+        self.count_request("challenge", synapse)
+        deadline = self.request_deadline(synapse)
+
+        # Fetch the metadata and replace the seed with the new one in a single round trip
+        bt.logging.trace("entering rotate_chunk_seed()")
+        with self.phase("challenge", "redis"):
+            data = await rotate_chunk_seed(
+                r=self.database,
+                chunk_hash=synapse.challenge_hash,
+                hotkey=synapse.dendrite.hotkey,
+                seed=synapse.seed,
+            )
         if data is None:
             bt.logging.error(f"No data found for {synapse.challenge_hash}")
             return synapse
 
         bt.logging.trace(f"retrieved data: {pformat(data)}")
 
-        # Chunk the data according to the specified (random) chunk size
-        filepath = data.get("filepath", None)
-        if filepath is None:
-            # fallback to load the data from the filesystem via database path construction
-            # use new path construction by hotkey and challenge hash
-            file_not_found = True
-            new_filepath = os.path.expanduser(
-                f"{self.config.database.directory}/{synapse.dendrite.hotkey}/{synapse.challenge_hash}"
+        # Estimate the CPU cost of the challenge from its metadata before touching the blob
+        cost = self.admission.estimate(
+            data.get("size", 0), synapse.chunk_size, data.get("proof") is not None
+        )
+        stake = self.caller_stake(synapse)
+        priority = self.scheduler.priority("challenge", stake)
+        if not self.config.miner.admission_off:
+            decision = self.admission.admit(
+                synapse.dendrite.hotkey,
+                cost,
+                deadline - time.monotonic(),
+                self.hotkey_weights.get(synapse.dendrite.hotkey, 1.0),
             )
-            if os.path.isfile(new_filepath):
-                file_not_found = False
-                filepath = new_filepath
-
-            if file_not_found:
-                # Use old path construction by just challenge hash
-                fallback_filepath = os.path.expanduser(
-                    f"{self.config.database.directory}/{synapse.challenge_hash}"
+            if decision == SHED:
+                return self.drop_request(
+                    synapse,
+                    DeadlineExceeded(f"estimated cost of {cost:.3f}s CPU cannot be admitted"),
                 )
-                if not os.path.isfile(fallback_filepath):
-                    bt.logging.error(
-                        f"challenge() No file found for {synapse.challenge_hash} in {fallback_filepath}."
-                    )
-                    synapse.axon.status_code = 404
-                    synapse.axon.status_message = "File not found"
-                    return synapse
-                else:
-                    filepath = fallback_filepath
-                    bt.logging.debug(
-                        f"challenge() File found for {synapse.challenge_hash} in {filepath}."
-                    )
+            if decision == DEPRIORITIZE:
+                # Below every admitted challenge, for the proof and the commitment batches alike
+                stake = 0.0
+                priority = 0.0
 
-        bt.logging.trace("entering load_from_filesystem()")
-        try:
-            encrypted_data_bytes = load_from_filesystem(filepath)
-        except Exception as e:
-            bt.logging.error(f"Error loading file {filepath}: {e}")
+        # Chunk the data according to the specified (random) chunk size
+        # Locate the blob, falling back to the layouts used before the blob store
+        filepath = await self.blob_store.resolve(
+            self.database,
+            synapse.challenge_hash,
+            synapse.dendrite.hotkey,
+            data.get("filepath", None),
+        )
+        if filepath is None:
+            bt.logging.error(f"challenge() No file found for {synapse.challenge_hash}.")
             synapse.axon.status_code = 404
             synapse.axon.status_message = "File not found"
             return synapse
+        self.access_tracker.record(synapse.challenge_hash)
 
         # Construct the next commitment hash using previous commitment and hash
         # of the data to prove storage over time
@@ -779,11 +1003,36 @@ class miner:
             bt.logging.error(f"No seed found for {synapse.challenge_hash}")
             return synapse
 
-        bt.logging.trace("entering comput_subsequent_commitment()...")
         new_seed = synapse.seed.encode()
-        next_commitment, proof = compute_subsequent_commitment(
-            encrypted_data_bytes, prev_seed, new_seed, verbose=self.config.miner.verbose
-        )
+        try:
+            file_size = blob_size(filepath)
+            if data.get("proof") is not None:
+                # Use the proof precomputed when the previous seed was stored
+                bt.logging.trace("entering compute_commitment_from_proof()...")
+                next_commitment, proof = compute_commitment_from_proof(
+                    data["proof"], new_seed
+                )
+            else:
+                bt.logging.trace("entering comput_subsequent_commitment()...")
+                with self.phase("challenge", "hash"):
+                    next_commitment, proof = await self.scheduler.run(
+                        self.prove_blob,
+                        synapse.challenge_hash,
+                        filepath,
+                        prev_seed,
+                        new_seed,
+                        kind="challenge",
+                        stake=stake,
+                        deadline=deadline,
+                    )
+        except DeadlineExceeded as e:
+            return self.drop_request(synapse, e)
+        except Exception as e:
+            bt.logging.error(f"Error loading file {filepath}: {e}")
+            synapse.axon.status_code = 404
+            synapse.axon.status_message = "File not found"
+            return synapse
+
         if self.config.miner.verbose:
             bt.logging.debug(f"prev seed : {prev_seed}")
             bt.logging.debug(f"new seed  : {new_seed}")
@@ -792,45 +1041,55 @@ class miner:
         synapse.commitment_hash = next_commitment
         synapse.commitment_proof = proof
 
-        # update the commitment seed challenge hash in storage
-        bt.logging.trace(f"udpating challenge miner storage: {pformat(data)}")
-        await update_seed_info(
-            self.database,
-            chunk_hash=synapse.challenge_hash,
-            hotkey=synapse.dendrite.hotkey,
-            seed=new_seed.decode("utf-8"),
+        # The seed was already rotated in storage, precompute the proof for the next request
+        self.schedule_storage_proof(
+            synapse.challenge_hash,
+            synapse.dendrite.hotkey,
+            filepath,
+            new_seed.decode("utf-8"),
         )
 
-        # Chunk the data according to the provided chunk_size
-        bt.logging.trace("entering chunk_data()")
-        data_chunks = chunk_data(encrypted_data_bytes, synapse.chunk_size)
-
-        # Extract setup params
-        g = hex_to_ecc_point(synapse.g, synapse.curve)
-        h = hex_to_ecc_point(synapse.h, synapse.curve)
-
-        # Commit the data chunks based on the provided curve points
-        bt.logging.trace("entering ECCcommitment()")
-        committer = ECCommitment(g, h)
-        bt.logging.trace("entering commit_data_with_seed()")
-        randomness, chunks, commitments, merkle_tree = commit_data_with_seed(
-            committer,
-            data_chunks=data_chunks,
-            n_chunks=sys.getsizeof(encrypted_data_bytes) // synapse.chunk_size + 1,
-            seed=synapse.seed,
-        )
+        # Commit the data chunks of the provided chunk_size based on the provided curve points
+        if time.monotonic() >= deadline:
+            return self.drop_request(
+                synapse, DeadlineExceeded("no time left to commit to the chunks")
+            )
+        bt.logging.trace("entering commitment_engine.commit_file_with_seed()")
+        admission = self.admission.start(synapse.dendrite.hotkey, cost)
+        try:
+            randomness, commitments, merkle_tree = await self.commitment_engine.commit_file_with_seed(
+                synapse.g,
+                synapse.h,
+                synapse.curve,
+                filepath=filepath,
+                chunk_size=synapse.chunk_size,
+                n_chunks=file_size // synapse.chunk_size + 1,
+                seed=synapse.seed,
+                encoding=negotiate_point_encoding(synapse.point_encoding),
+                priority=priority,
+            )
+        finally:
+            self.admission.finish(admission, -(-file_size // synapse.chunk_size))
 
         # Prepare return values to validator
         bt.logging.trace("entering b64_encode()")
         synapse.commitment = commitments[synapse.challenge_index]
-        synapse.data_chunk = base64.b64encode(chunks[synapse.challenge_index])
+        with self.phase("challenge", "read"):
+            synapse.data_chunk = await self.blob_io.run(
+                self.read_blob_chunk,
+                synapse.challenge_hash,
+                filepath,
+                synapse.challenge_index,
+                synapse.chunk_size,
+            )
         synapse.randomness = randomness[synapse.challenge_index]
-        synapse.merkle_proof = b64_encode(
-            merkle_tree.get_proof(synapse.challenge_index)
-        )
+        with self.phase("challenge", "encode"):
+            synapse.merkle_proof = b64_encode(
+                merkle_tree.get_proof(synapse.challenge_index)
+            )
 
-        bt.logging.trace("getting merkle root...")
-        synapse.merkle_root = merkle_tree.get_merkle_root()
+            bt.logging.trace("getting merkle root...")
+            synapse.merkle_root = merkle_tree.get_merkle_root()
 
         if self.config.miner.verbose:
             bt.logging.debug(f"commitment: {str(synapse.commitment)[:24]}")
@@ -875,87 +1134,301 @@ class miner:
             >>> updated_synapse = self.retrieve(synapse)
         """
         bt.logging.info(f"received retrieve hash: {synapse.data_hash}")
-        self.request_count += 1
-
-        # Fetch the data from the miner database
-        bt.logging.trace("entering get_chunk_metadata()")
-        data = await get_chunk_metadata(
-            r=self.database, chunk_hash=synapse.data_hash, hotkey=synapse.dendrite.hotkey
-        )
+        self.count_request("retrieve", synapse)
+        deadline = self.request_deadline(synapse)
+
+        # Fetch the metadata and store the new seed in a single round trip
+        bt.logging.trace("entering rotate_chunk_seed()")
+        with self.phase("retrieve", "redis"):
+            data = await rotate_chunk_seed(
+                r=self.database,
+                chunk_hash=synapse.data_hash,
+                hotkey=synapse.dendrite.hotkey,
+                seed=synapse.seed,
+            )
+        if data is None:
+            bt.logging.error(f"No data found for {synapse.data_hash}")
+            synapse.axon.status_code = 404
+            synapse.axon.status_message = "File not found"
+            return synapse
 
-        # Decode the data + metadata from bytes to json
         bt.logging.debug(f"retrieved data: {pformat(data)}")
 
         # Get the data from filesystem to retrieve
-        filepath = data.get("filepath", None)
+        # Locate the blob, falling back to the layouts used before the blob store
+        filepath = await self.blob_store.resolve(
+            self.database,
+            synapse.data_hash,
+            synapse.dendrite.hotkey,
+            data.get("filepath", None),
+        )
         if filepath is None:
-            # fallback to load the data from the filesystem via database path construction
-            # use new path construction by hotkey and retrieve hash
-            file_not_found = True
-            new_filepath = os.path.expanduser(
-                f"{self.config.database.directory}/{synapse.dendrite.hotkey}/{synapse.data_hash}"
-            )
-            if os.path.isfile(new_filepath):
-                file_not_found = False
-                filepath = new_filepath
-
-            if file_not_found:
-                # Use old path construction by just retrieve hash
-                fallback_filepath = os.path.expanduser(
-                    f"{self.config.database.directory}/{synapse.data_hash}"
+            bt.logging.error(f"retrieve() No file found for {synapse.data_hash}.")
+            synapse.axon.status_code = 404
+            synapse.axon.status_message = "File not found"
+            return synapse
+        self.access_tracker.record(synapse.data_hash)
+
+        try:
+            # incorporate a final seed challenge to verify they still have the data at retrieval time
+            if data.get("proof") is not None:
+                bt.logging.trace("entering compute_commitment_from_proof()")
+                commitment, proof = compute_commitment_from_proof(
+                    data["proof"], new_seed=synapse.seed.encode()
                 )
-                if not os.path.isfile(fallback_filepath):
-                    bt.logging.error(
-                        f"retrieve() No file found for {synapse.data_hash} in {fallback_filepath}."
-                    )
-                    synapse.axon.status_code = 404
-                    synapse.axon.status_message = "File not found"
-                    return synapse
-                else:
-                    filepath = fallback_filepath
-                    bt.logging.debug(
-                        f"retrieve() File found for {synapse.data_hash} in {filepath}."
+            else:
+                bt.logging.trace("entering compute_subsequent_commitment()")
+                with self.phase("retrieve", "hash"):
+                    commitment, proof = await self.scheduler.run(
+                        self.prove_blob,
+                        synapse.data_hash,
+                        filepath,
+                        data.get("seed", "").encode(),
+                        synapse.seed.encode(),
+                        kind="retrieve",
+                        stake=self.caller_stake(synapse),
+                        deadline=deadline,
                     )
 
-        bt.logging.trace("entering load_from_filesystem()")
-        try:
-            encrypted_data_bytes = load_from_filesystem(filepath)
+            # Return base64 data, read and encoded off the event loop
+            bt.logging.trace("entering b64_encode()")
+            with self.phase("retrieve", "read"):
+                synapse.data = await self.blob_io.run(
+                    self.read_blob_b64, synapse.data_hash, filepath
+                )
+        except DeadlineExceeded as e:
+            return self.drop_request(synapse, e)
         except Exception as e:
             bt.logging.error(f"Error loading file {filepath}: {e}")
             synapse.axon.status_code = 404
             synapse.axon.status_message = "File not found"
             return synapse
 
-        # incorporate a final seed challenge to verify they still have the data at retrieval time
-        bt.logging.trace("entering compute_subsequent_commitment()")
-        commitment, proof = compute_subsequent_commitment(
-            encrypted_data_bytes,
-            previous_seed=data.get("seed", "").encode(),
-            new_seed=synapse.seed.encode(),
-            verbose=self.config.miner.verbose,
-        )
         synapse.commitment_hash = commitment
         synapse.commitment_proof = proof
 
-        # store new seed
-        bt.logging.trace("entering update_seed_info()")
-        await update_seed_info(
-            self.database,
-            chunk_hash=synapse.data_hash,
-            hotkey=synapse.dendrite.hotkey,
-            seed=synapse.seed,
+        # The new seed was already stored, precompute the proof for the next request
+        self.schedule_storage_proof(
+            synapse.data_hash, synapse.dendrite.hotkey, filepath, synapse.seed
         )
         bt.logging.debug(f"udpated retrieve miner storage: {pformat(data)}")
-
-        # Return base64 data
-        bt.logging.trace("entering b64_encode()")
-        synapse.data = base64.b64encode(encrypted_data_bytes)
         bt.logging.info(f"returning retrieved data {synapse.data[:24]}...")
         return synapse
 
+    async def retrieve_stream(
+        self, synapse: storage.protocol.RetrieveStream
+    ) -> bt.StreamingSynapse.BTStreamingResponse:
+        """
+        Streaming counterpart of `retrieve`: the seed is rotated the same way, but the blob is sent
+        as raw segments framed by `storage.protocol.encode_stream_frame` and the commitment hash and
+        proof follow in the trailer frame. Segments are read off the event loop one at a time, and
+        when no proof was precomputed it is hashed from the segments as they are sent, so the blob
+        is never held in memory or base64 encoded as a whole.
+
+        Args:
+            synapse (storage.protocol.RetrieveStream): The hash of the data to be retrieved and a
+            seed for the cryptographic challenge.
+
+        Returns:
+            bt.StreamingSynapse.BTStreamingResponse: The streaming response sending the frames. Errors
+            are reported in the trailer, as the response status is sent before the first frame.
+        """
+        bt.logging.info(f"received streaming retrieve hash: {synapse.data_hash}")
+        self.count_request("retrieve_stream", synapse)
+
+        with self.phase("retrieve_stream", "redis"):
+            data = await rotate_chunk_seed(
+                r=self.database,
+                chunk_hash=synapse.data_hash,
+                hotkey=synapse.dendrite.hotkey,
+                seed=synapse.seed,
+            )
+        filepath = None
+        if data is None:
+            bt.logging.error(f"No data found for {synapse.data_hash}")
+        else:
+            filepath = await self.blob_store.resolve(
+                self.database,
+                synapse.data_hash,
+                synapse.dendrite.hotkey,
+                data.get("filepath", None),
+            )
+            if filepath is None:
+                bt.logging.error(f"retrieve_stream() No file found for {synapse.data_hash}.")
+            else:
+                self.access_tracker.record(synapse.data_hash)
+
+        hotkey = synapse.dendrite.hotkey
+
+        async def stream(send):
+            await self.stream_blob(
+                send, synapse.data_hash, hotkey, data, filepath, synapse.seed
+            )
+
+        return synapse.create_streaming_response(stream)
+
+    async def stream_blob(self, send, data_hash, hotkey, data, filepath, seed: str):
+        """
+        Sends the frames of a `retrieve_stream` response through the ASGI `send` callable.
+        """
+
+        async def send_frame(kind, payload, more_body=True):
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": storage.protocol.encode_stream_frame(kind, payload),
+                    "more_body": more_body,
+                }
+            )
+
+        async def send_trailer(trailer):
+            await send_frame(
+                storage.protocol.STREAM_FRAME_TRAILER,
+                json.dumps(trailer).encode(),
+                more_body=False,
+            )
+
+        if filepath is None:
+            await send_trailer({"error": "File not found"})
+            return
+
+        # Without a precomputed proof, hash(data + previous seed) is computed from the segments
+        hasher = DataHasher() if data.get("proof") is None else None
+        size = 0
+        try:
+            with self.blob_store.open(data_hash, filepath) as encrypted_data_bytes:
+                for offset in range(
+                    0, len(encrypted_data_bytes), storage.protocol.STREAM_SEGMENT_SIZE
+                ):
+                    segment = await self.blob_io.run(
+                        read_segment,
+                        encrypted_data_bytes,
+                        offset,
+                        storage.protocol.STREAM_SEGMENT_SIZE,
+                        hasher,
+                    )
+                    await send_frame(storage.protocol.STREAM_FRAME_DATA, segment)
+                    size += len(segment)
+            if hasher is not None:
+                proof = hasher.update(data.get("seed", "").encode()).intdigest()
+            else:
+                proof = data["proof"]
+            commitment, proof = compute_commitment_from_proof(proof, seed.encode())
+        except Exception as e:
+            bt.logging.error(f"Error streaming file {filepath}: {e}")
+            await send_trailer({"error": "File not found"})
+            return
+
+        await send_trailer(
+            {
+                "size": size,
+                "commitment_hash": str(commitment),
+                "commitment_proof": str(proof),
+            }
+        )
+
+        # The new seed was already stored, precompute the proof for the next request
+        self.schedule_storage_proof(data_hash, hotkey, filepath, seed)
+        bt.logging.info(f"streamed {size} bytes of {data_hash}")
+
+    def prove_blob(self, data_hash, filepath, previous_seed: bytes, new_seed: bytes):
+        """
+        Computes the commitment and proof of a blob for a new seed, reading it from the blob cache
+        or from disk. Blocking, meant to run on the work scheduler.
+        """
+        with self.blob_store.open(data_hash, filepath) as encrypted_data_bytes:
+            return compute_subsequent_commitment(
+                encrypted_data_bytes,
+                previous_seed,
+                new_seed,
+                verbose=self.config.miner.verbose,
+            )
+
+    def read_blob_b64(self, data_hash, filepath) -> bytes:
+        """
+        Reads a blob from the blob cache or from disk and returns it base64 encoded.
+        Blocking, meant to run on the I/O pool.
+        """
+        with self.blob_store.open(data_hash, filepath) as encrypted_data_bytes:
+            return base64.b64encode(encrypted_data_bytes)
+
+    def read_blob_chunk(self, data_hash, filepath, index: int, chunk_size: int) -> bytes:
+        """
+        Reads the `index`-th chunk of `chunk_size` bytes of a blob from the blob cache or from disk
+        and returns it base64 encoded. Blocking, meant to run on the I/O pool.
+        """
+        with self.blob_store.open(data_hash, filepath) as encrypted_data_bytes:
+            chunk = encrypted_data_bytes[index * chunk_size : (index + 1) * chunk_size]
+            try:
+                return base64.b64encode(chunk)
+            finally:
+                chunk.release()
+
     def run(self):
         run(self)
 
+    def start_background_tasks(self):
+        """
+        Starts the maintenance tasks of the miner on the background worker.
+        """
+        self.background.submit(upgrade_schema, self.config.miner.schema_upgrade_batch_size)
+        self.background.submit(bootstrap_storage_ledger)
+        if self.config.miner.metrics_port:
+            self.metrics_server = MetricsServer(
+                self.metrics, self.config.miner.metrics_host, self.config.miner.metrics_port
+            )
+            self.metrics_server.start()
+        if self.config.miner.metrics_snapshot_interval > 0:
+            self.background.schedule(
+                self.config.miner.metrics_snapshot_interval,
+                write_metrics_snapshot,
+                self.metrics,
+                self.config.miner.metrics_snapshot_path
+                or os.path.join(self.config.miner.full_path, "metrics.json"),
+            )
+        if not self.config.miner.blob_migration_off:
+            self.background.submit(migrate_blob_layout, self.blob_store)
+        # Old copies of the blobs moved by the migration and the tiering
+        self.background.schedule(
+            BLOB_RETIRE_GRACE_PERIOD, delete_retired_blobs, self.blob_store
+        )
+        if not self.config.miner.ttl_purge_off:
+            self.background.submit(index_chunk_expiry)
+            self.background.schedule(
+                self.config.miner.ttl_purge_interval,
+                purge_expired_chunks,
+                self.blob_store,
+                self.config.miner.ttl_purge_batch_size,
+            )
+        if not self.config.miner.scrub_off:
+            self.background.schedule(
+                self.config.miner.scrub_interval,
+                scrub_blobs,
+                self.blob_store,
+                self.config.miner.scrub_rate,
+                100,
+                self.config.miner.scrub_keys_per_run,
+            )
+        if self.disks.tiered:
+            self.background.schedule(
+                self.config.miner.tiering_interval,
+                rebalance_tiers,
+                self.blob_store,
+                self.access_tracker,
+                self.config.miner.tiering_hot_threshold,
+                self.config.miner.tiering_cold_threshold,
+                self.config.miner.tiering_min_age,
+                self.config.miner.tiering_rate,
+                self.config.miner.tiering_max_moves,
+                self.config.miner.tiering_decay,
+            )
+        if self.blob_store.packs is not None:
+            self.background.schedule(
+                self.config.miner.packfile_compaction_interval,
+                compact_packfiles,
+                self.blob_store,
+            )
+
     def run_in_background_thread(self):
         """
         Starts the miner's operations in a separate background thread.
@@ -966,6 +1439,7 @@ class miner:
             self.should_exit = False
             self.thread = threading.Thread(target=self.run, daemon=True)
             self.thread.start()
+            self.start_background_tasks()
             self.is_running = True
             bt.logging.debug("Started")
 
@@ -977,6 +1451,12 @@ class miner:
             bt.logging.debug("Stopping miner in background thread.")
             self.should_exit = True
             self.thread.join(5)
+            self.background.stop()
+            if self.metrics_server is not None:
+                self.metrics_server.stop()
+            self.commitment_engine.shutdown()
+            self.scheduler.shutdown()
+            self.blob_io.shutdown()
             self.is_running = False
             bt.logging.debug("Stopped")
 
@@ -194,6 +194,9 @@ class neuron:
         # TODO: load this from disk instead of reset on restart
         self.monitor_lookup = {uid: 0 for uid in self.metagraph.uids.tolist()}
 
+        # Newest point encoding each miner answered with, see storage.shared.ecc
+        self.point_encodings = {}
+
         # Instantiate runners
         self.should_exit: bool = False
         self.subscription_is_running: bool = False
@@ -5,7 +5,7 @@ import argparse
 import bittensor as bt
 from storage.shared.utils import get_redis_password
 from storage.shared.checks import check_environment
-from storage.miner.database import migrate_data_directory
+from storage.miner.migration import migrate_data_directory
 
 
 async def main(args):
@@ -15,7 +15,7 @@ async def main(args):
         os.makedirs(new_directory, exist_ok=True)
 
     try:
-        asyncio.run(check_environment(args.redis_conf_path))
+        await check_environment(args.redis_conf_path)
     except AssertionError as e:
         bt.logging.warning(
             f"Something is missing in your environment: {e}. Please check your configuration, use the README for help, and try again."
@@ -32,9 +32,16 @@ async def main(args):
         db=args.database_index,
         password=redis_password,
     )
-    failed_uids = await migrate_data_directory(database, new_directory, return_failures=True)
+    failed_uids = await migrate_data_directory(
+        database,
+        new_directory,
+        return_failures=True,
+        old_base_directory=args.old_data_directory,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
 
-    if failed_uids is not None:
+    if failed_uids:
         bt.logging.error(
             f"Failed to migrate {len(failed_uids)} filepaths to the new directory: {new_directory}."
         )
@@ -60,6 +67,24 @@ if __name__ == "__main__":
     parser.add_argument("--database_port", type=int, default=6379)
     parser.add_argument("--database_index", type=int, default=0)
     parser.add_argument("--new_data_directory", type=str, required=True)
+    parser.add_argument(
+        "--old_data_directory",
+        type=str,
+        default=None,
+        help="current data directory, inferred from the index if not given",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=1000,
+        help="number of index keys migrated per batch",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=16,
+        help="maximum number of files moved at once",
+    )
     args = parser.parse_args()
 
     asyncio.run(main(args))
@@ -0,0 +1,47 @@
+import asyncio
+from redis import asyncio as aioredis
+import argparse
+import bittensor as bt
+from storage.shared.utils import get_redis_password
+from storage.miner.database import reconcile_storage_ledger
+
+
+async def main(args):
+    bt.logging.info(
+        f"Loading database from {args.database_host}:{args.database_port}"
+    )
+    redis_password = get_redis_password(args.redis_password)
+    database = aioredis.StrictRedis(
+        host=args.database_host,
+        port=args.database_port,
+        db=args.database_index,
+        password=redis_password,
+    )
+
+    bt.logging.info("Rebuilding the storage ledger from the index and data on disk...")
+    ledger = await reconcile_storage_ledger(database)
+
+    bt.logging.success(
+        f"Storage ledger rebuilt: {ledger['objects']} objects, {ledger['bytes']} bytes, "
+        f"{ledger['blobs']} blobs taking {ledger['disk_bytes']} bytes on disk"
+    )
+    for hotkey, counts in ledger["hotkeys"].items():
+        bt.logging.info(
+            f"{hotkey}: {counts['objects']} objects, {counts['bytes']} bytes"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--redis_password",
+        type=str,
+        default=None,
+        help="password for the redis database",
+    )
+    parser.add_argument("--database_host", type=str, default="localhost")
+    parser.add_argument("--database_port", type=int, default=6379)
+    parser.add_argument("--database_index", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
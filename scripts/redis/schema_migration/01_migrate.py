@@ -13,7 +13,7 @@ from storage.miner.database import convert_all_to_hotkey_format
 async def main(args):
 
     try:
-        asyncio.run(check_environment(args.redis_conf_path))
+        await check_environment(args.redis_conf_path)
     except AssertionError as e:
         bt.logging.warning(
             f"Something is missing in your environment: {e}. Please check your configuration, use the README for help, and try again."
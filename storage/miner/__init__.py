@@ -18,5 +18,6 @@
 
 from . import config
 from . import utils
+from . import commitment
 from .run import run
 from .set_weights import set_weights
@@ -0,0 +1,203 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import math
+import time
+import threading
+from typing import Any, Dict, Tuple
+
+
+# Admission decisions
+ADMIT = "admit"
+DEPRIORITIZE = "deprioritize"
+SHED = "shed"
+
+# Smoothing factor of the moving average cost of a commitment
+EWMA_ALPHA = 0.1
+
+# Decayed CPU seconds below which a validator no longer counts towards the stake shares
+IDLE_CONSUMPTION = 1e-6
+
+
+class AdmissionController:
+    """
+    Cost based admission control for challenges.
+
+    The cost of a challenge is dominated by its `size / chunk_size` elliptic curve commitments,
+    plus hashing the blob when no proof was precomputed, and both are known from the chunk
+    metadata before the blob is read. The controller estimates this cost in CPU seconds, using a
+    moving average of the measured cost of a commitment, and keeps track of:
+
+    - the outstanding cost of the challenges being committed, which with the `capacity` of the
+      commitment workers gives the time a new challenge would take to complete. Challenges that
+      cannot complete before their deadline are shed.
+    - the CPU seconds consumed by each validator, decayed over `window` seconds. A validator may
+      use a share of the capacity proportional to its stake weight among the validators seen
+      recently; beyond it, its challenges are deprioritized, or shed while other work is waiting.
+      Validators idle for longer than `window`, whose consumption has decayed away, are forgotten.
+
+    The controller is thread safe.
+
+    Attributes:
+        capacity (float): The CPU seconds of commitments available per second, i.e. the number of
+                          commitment workers.
+        window (float): The time constant in seconds of the per validator accounting.
+        commit_cost (float): The estimated CPU seconds of one commitment.
+        hash_cost (float): The estimated CPU seconds of hashing one byte.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        window: float = 60.0,
+        commit_cost: float = 0.005,
+        hash_cost: float = 5e-9,
+    ):
+        self.capacity = max(1.0, float(capacity))
+        self.window = window
+        self.commit_cost = commit_cost
+        self.hash_cost = hash_cost
+        self.outstanding = 0.0
+        self.in_flight = 0
+        self.decisions = {ADMIT: 0, DEPRIORITIZE: 0, SHED: 0}
+        # hotkey -> [consumed CPU seconds, last update, weight, last seen]
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    def estimate(self, size: int, chunk_size: int, has_proof: bool = False) -> float:
+        """
+        Estimates the CPU seconds of a challenge of a blob of `size` bytes.
+        """
+        n_commits = -(-max(int(size), 1) // max(int(chunk_size), 1))
+        cost = n_commits * self.commit_cost
+        if not has_proof:
+            cost += int(size) * self.hash_cost
+        return cost
+
+    def _decayed(self, hotkey: str, now: float) -> float:
+        entry = self._validators.get(hotkey)
+        if entry is None:
+            return 0.0
+        entry[0] *= math.exp(-(now - entry[1]) / self.window)
+        entry[1] = now
+        return entry[0]
+
+    def _evict(self, now: float):
+        for hotkey, entry in list(self._validators.items()):
+            if now - entry[3] > self.window and self._decayed(hotkey, now) < IDLE_CONSUMPTION:
+                del self._validators[hotkey]
+
+    def budget(self, hotkey: str) -> float:
+        """
+        Returns the CPU seconds a validator may consume over the accounting window.
+        """
+        with self._lock:
+            return self._budget(hotkey)
+
+    def _budget(self, hotkey: str) -> float:
+        total_weight = sum(entry[2] for entry in self._validators.values()) or 1.0
+        weight = self._validators[hotkey][2] if hotkey in self._validators else total_weight
+        return self.capacity * self.window * weight / total_weight
+
+    def admit(self, hotkey: str, cost: float, time_left: float, weight: float = 1.0) -> str:
+        """
+        Decides whether a challenge is run.
+
+        Args:
+            hotkey (str): The validator sending the challenge.
+            cost (float): The estimated CPU seconds of the challenge, see `estimate`.
+            time_left (float): Seconds until the deadline of the challenge.
+            weight (float): The stake weight of the validator.
+
+        Returns:
+            str: ADMIT, DEPRIORITIZE to run it after other work, or SHED to drop it.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._validators.setdefault(hotkey, [0.0, now, weight, now])
+            entry[2] = weight
+            entry[3] = now
+            consumed = self._decayed(hotkey, now)
+            if (self.outstanding + cost) / self.capacity > time_left:
+                decision = SHED
+            elif consumed + cost > self._budget(hotkey):
+                decision = SHED if self.outstanding > 0 else DEPRIORITIZE
+            else:
+                decision = ADMIT
+            self.decisions[decision] += 1
+            return decision
+
+    def start(self, hotkey: str, cost: float) -> Tuple[str, float, float]:
+        """
+        Accounts for a challenge starting its commitments.
+
+        Returns:
+            tuple: The token to pass to `finish`.
+        """
+        with self._lock:
+            self.outstanding += cost
+            self.in_flight += 1
+        return hotkey, cost, time.monotonic()
+
+    def finish(self, token: Tuple[str, float, float], n_commits: int):
+        """
+        Accounts for a challenge done with its commitments: its measured cost is charged to its
+        validator and refines the estimated cost of a commitment.
+        """
+        hotkey, cost, started = token
+        now = time.monotonic()
+        with self._lock:
+            # The workers were shared with the other challenges in flight
+            cpu_seconds = (now - started) * self.capacity / max(1, self.in_flight)
+            self.outstanding = max(0.0, self.outstanding - cost)
+            self.in_flight -= 1
+            if n_commits > 0:
+                self.commit_cost += EWMA_ALPHA * (cpu_seconds / n_commits - self.commit_cost)
+            self._decayed(hotkey, now)
+            entry = self._validators.setdefault(hotkey, [0.0, now, 1.0, now])
+            entry[0] += cpu_seconds
+            entry[3] = now
+
+    def consumed(self, hotkey: str) -> float:
+        """
+        Returns the decayed CPU seconds consumed by a validator.
+        """
+        with self._lock:
+            return self._decayed(hotkey, time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the outstanding cost, the estimated cost of a commitment, the number of each
+        decision, and the consumed CPU seconds and budget of every validator.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "outstanding": self.outstanding,
+                "commit_cost": self.commit_cost,
+                "decisions": dict(self.decisions),
+                "validators": {
+                    hotkey: {
+                        "consumed": self._decayed(hotkey, now),
+                        "budget": self._budget(hotkey),
+                    }
+                    for hotkey in list(self._validators)
+                },
+            }
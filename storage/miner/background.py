@@ -0,0 +1,132 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import asyncio
+import threading
+import bittensor as bt
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+
+class BackgroundWorker:
+    """
+    Runs the miner's maintenance coroutines (migrations, purges, scrubs...) on an event loop of
+    their own in a daemon thread, so they never compete with the axon handlers for their loop.
+
+    Redis clients are bound to the loop they are used on, so the worker builds its own client
+    with `database_factory` once its loop is running, and passes it to every coroutine function.
+
+    Attributes:
+        database_factory (Callable): Builds the Redis client used by the background coroutines.
+        name (str): The name of the thread.
+    """
+
+    def __init__(self, database_factory: Callable, name: str = "miner-background"):
+        self.database_factory = database_factory
+        self.name = name
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.database = None
+        self.thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """
+        Starts the event loop thread, if it is not running yet.
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self._ready.clear()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.database = self.database_factory()
+        self._ready.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+
+    def submit(self, coroutine_function: Callable, *args) -> Future:
+        """
+        Runs `coroutine_function(database, *args)` once on the background loop.
+
+        Returns:
+            Future: The future of the result of the coroutine.
+        """
+        self.start()
+
+        async def run():
+            try:
+                return await coroutine_function(self.database, *args)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                bt.logging.error(f"Background task {coroutine_function.__name__} failed: {e}")
+                raise
+
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def schedule(self, interval: float, coroutine_function: Callable, *args) -> Future:
+        """
+        Runs `coroutine_function(database, *args)` on the background loop every `interval` seconds,
+        until the worker is stopped. A failed run is logged and the next one still happens.
+
+        Returns:
+            Future: The future of the periodic task, which can be cancelled.
+        """
+        self.start()
+
+        async def run_periodically():
+            while True:
+                try:
+                    await coroutine_function(self.database, *args)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    bt.logging.error(
+                        f"Background task {coroutine_function.__name__} failed: {e}"
+                    )
+                await asyncio.sleep(interval)
+
+        return asyncio.run_coroutine_threadsafe(run_periodically(), self.loop)
+
+    def stop(self, timeout: float = 5):
+        """
+        Cancels the running coroutines and stops the event loop thread.
+        """
+        if self.thread is None or not self.thread.is_alive():
+            return
+
+        async def cancel_all():
+            tasks = [
+                task
+                for task in asyncio.all_tasks()
+                if task is not asyncio.current_task()
+            ]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+
+        asyncio.run_coroutine_threadsafe(cancel_all(), self.loop)
+        self.thread.join(timeout)
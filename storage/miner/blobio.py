@@ -0,0 +1,284 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import queue
+import shutil
+import asyncio
+import threading
+import bittensor as bt
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Tuple
+
+
+# How long to wait before retrying when every I/O slot is taken
+SLOT_POLL_INTERVAL = 0.002
+
+# Suffix of the temporary file a blob is written to before it is renamed into place
+TEMP_SUFFIX = ".tmp"
+
+
+def temp_path(path: str) -> str:
+    """
+    Returns the temporary path a blob is written to, unique to the writing thread.
+    """
+    return f"{path}.{os.getpid()}.{threading.get_ident()}{TEMP_SUFFIX}"
+
+
+def fsync_directory(directory: str):
+    """
+    Flushes the entries of a directory, making the files renamed into it durable.
+    """
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_file_atomic(path: str, data: bytes, fsync: bool = False) -> str:
+    """
+    Writes a file through a temporary file renamed into place, so readers never see a partial
+    blob and a crash never leaves one behind under its final name.
+
+    Args:
+        path (str): The final path of the file.
+        data (bytes): The content of the file.
+        fsync (bool): Whether to flush the file and its directory to disk before returning.
+
+    Returns:
+        str: The path of the file.
+    """
+    tmp = write_temp(path, data, fsync)
+    os.replace(tmp, path)
+    if fsync:
+        fsync_directory(os.path.dirname(path))
+    return path
+
+
+def copy_file_atomic(source: str, path: str, fsync: bool = False, link: bool = False) -> str:
+    """
+    Copies a file through a temporary file renamed into place, like `write_file_atomic`. With
+    `link`, the file is hard linked instead when both paths are on the same file system.
+
+    Returns:
+        str: The path of the copy.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        if link:
+            try:
+                os.link(source, tmp)
+            except OSError:
+                # Another file system, or one without hard links
+                link = False
+        if not link:
+            shutil.copyfile(source, tmp)
+        if fsync:
+            with open(tmp, "rb") as file:
+                os.fsync(file.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    if fsync:
+        fsync_directory(os.path.dirname(path))
+    return path
+
+
+def write_temp(path: str, data: bytes, fsync: bool = False) -> str:
+    """
+    Writes the content of a file to its temporary path, without renaming it into place.
+
+    Returns:
+        str: The temporary path.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = temp_path(path)
+    try:
+        with open(tmp, "wb") as file:
+            file.write(data)
+            if fsync:
+                file.flush()
+                os.fsync(file.fileno())
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return tmp
+
+
+class GroupCommitter:
+    """
+    Renames written blobs into place in batches and flushes each directory of a batch once.
+
+    Writers flush their own temporary file in parallel, then hand it to the committer thread,
+    which waits `interval` seconds for more writes to arrive. The renames of the batch are then
+    made durable with a single fsync per directory instead of one per blob.
+
+    Attributes:
+        interval (float): Seconds to wait for other writes before committing a batch.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(
+            target=self._run, name="storage-group-commit", daemon=True
+        )
+        self._thread.start()
+
+    def commit(self, tmp: str, path: str) -> Future:
+        """
+        Queues the rename of a temporary file, resolved once the rename is durable.
+        """
+        future = Future()
+        self._queue.put((tmp, path, future))
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            time.sleep(self.interval)
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._commit(batch)
+                    return
+                batch.append(item)
+            self._commit(batch)
+
+    @staticmethod
+    def _commit(batch: List[Tuple[str, str, Future]]):
+        directories = {}
+        for tmp, path, future in batch:
+            try:
+                os.replace(tmp, path)
+                directories.setdefault(os.path.dirname(path), []).append(future)
+            except Exception as e:
+                future.set_exception(e)
+        for directory, futures in directories.items():
+            try:
+                fsync_directory(directory)
+            except Exception as e:
+                # The renames may not survive a crash, so the writes are not acknowledged
+                bt.logging.error(f"Could not flush directory {directory}: {e}")
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            for future in futures:
+                future.set_result(None)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class BlobIO:
+    """
+    Runs the blocking disk I/O of the miner on a thread pool so the axon's event loop keeps
+    serving other requests while blobs are written and read.
+
+    At most `max_pending` operations are queued or running at once; callers beyond that wait
+    their turn without blocking the loop, which keeps a burst of large stores from piling their
+    data up in memory. Blobs are written to a temporary file and renamed into place. With `fsync`,
+    every blob is flushed before the store is acknowledged, and the renames are committed in
+    groups to amortize the directory flushes.
+
+    The slots are thread safe, so the axon loop and the background worker share one pool.
+
+    Attributes:
+        max_workers (int): The number of I/O threads.
+        max_pending (int): The number of operations queued or running at once.
+        fsync (bool): Whether writes are flushed to disk before they complete.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_pending: int = 64,
+        fsync: bool = False,
+        fsync_interval: float = 0.005,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(self.max_workers, max_pending)
+        self.fsync = fsync
+        self.pool = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="storage-io"
+        )
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self.committer = GroupCommitter(fsync_interval) if fsync else None
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """
+        Runs a blocking function on the I/O pool, waiting for a free slot first.
+        """
+        with self._pending_lock:
+            self._pending += 1
+        try:
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self.pool, fn, *args
+                )
+            finally:
+                self._slots.release()
+        finally:
+            with self._pending_lock:
+                self._pending -= 1
+
+    @property
+    def pending(self) -> int:
+        """
+        The number of operations running, queued or waiting for a slot.
+        """
+        return self._pending
+
+    async def write(self, path: str, data: bytes) -> str:
+        """
+        Writes a blob atomically, durably when `fsync` is set.
+
+        Returns:
+            str: The path of the blob.
+        """
+        if self.committer is None:
+            return await self.run(write_file_atomic, path, data)
+        tmp = await self.run(write_temp, path, data, True)
+        await asyncio.wrap_future(self.committer.commit(tmp, path))
+        return path
+
+    def shutdown(self):
+        """
+        Waits for the pending writes and stops the I/O threads.
+        """
+        self.pool.shutdown(wait=True)
+        if self.committer is not None:
+            self.committer.stop()
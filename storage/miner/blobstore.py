@@ -0,0 +1,580 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import json
+import time
+import asyncio
+import threading
+import bittensor as bt
+from contextlib import asynccontextmanager, contextmanager
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+from typing import Any, Dict, List, Optional, Union
+
+from .blobio import BlobIO, copy_file_atomic, write_file_atomic
+from .cache import BlobCache
+from .codec import shard_directories
+from .disks import BLOB_DIRECTORY, DiskSet
+from .database import (
+    ACCESS_INDEX_KEY,
+    EXPIRY_INDEX_KEY,
+    delete_chunk_metadata,
+    expiry_member,
+    get_expired_chunks,
+    is_chunk_key,
+    metadata_codec,
+    update_chunk_filepath,
+)
+from .packfile import BlobRange, PackStore
+from .utils import open_blob
+
+
+# How long to wait before retrying a blob lock held by another task
+LOCK_POLL_INTERVAL = 0.005
+
+# Redis hash mapping the paths of moved blobs to their data hash and the time they were retired
+BLOB_RETIRED_KEY = "blob:retired"
+
+# Seconds the old copy of a moved blob is kept, so requests that resolved it before the move can finish
+BLOB_RETIRE_GRACE_PERIOD = 300
+
+
+class BlobStore:
+    """
+    Content addressed store for the encrypted data held by the miner.
+
+    Every blob is stored once under its data hash, whichever validator hotkeys store it, and the
+    per hotkey metadata entries all point at the same file. The entries of a data hash in the Redis
+    index are its references: a blob is only deleted when the last hotkey referencing it is released.
+
+    Writes, moves and releases of the same data hash are serialized with a per hash lock, so a blob
+    is never deleted while a store for another hotkey is reusing it. The locks work across threads,
+    so background tasks running on their own event loop are serialized with the axon handlers too.
+
+    Blobs are spread over `shard_levels` levels of shard directories named after the leading hex
+    digits of their hash, e.g. blobs/3f/a0/<hash>, so no directory grows too large to list.
+
+    With a `PackStore`, small blobs are appended to packfile segments instead of getting a file of
+    their own. Their metadata still records their path in the blob layout, and `resolve` returns
+    their range in the segment.
+
+    Blobs are written to a temporary file renamed into place, so a crash or a concurrent reader
+    never sees a partial blob. `store` runs the write on the `BlobIO` thread pool.
+
+    With a `BlobCache`, the contents of recently stored and read blobs are kept in memory and
+    `open` serves them without touching the disk. Entries are dropped when their blob is deleted.
+
+    With a `DiskSet` of several data roots, new blobs are placed on one of them by `store` and
+    keep the same layout under its blob directory. Blobs are found through their recorded path,
+    or by looking for them in every root. `directory` is the primary root of the set.
+
+    Requests resolve the path of a blob without its lock and read it much later, so `relocate`
+    and `migrate` do not delete the old copy of a blob they move. It is retired instead, and
+    deleted by `delete_retired` after a grace period, like the compacted segments of a packfile.
+
+    Attributes:
+        directory (str): The miner data directory.
+        blob_directory (str): The directory holding the content addressed blobs.
+        disks (DiskSet): The data roots new blobs are placed on.
+        shard_levels (int): The number of levels of shard directories, 0 for a flat directory.
+        packs (PackStore): The packfile store for small blobs, if enabled.
+        io (BlobIO): The thread pool the blob writes of `store` run on.
+        cache (BlobCache): The cache of hot blob contents, if enabled.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        shard_levels: int = 2,
+        packs: Optional[PackStore] = None,
+        io: Optional[BlobIO] = None,
+        cache: Optional[BlobCache] = None,
+        disks: Optional[DiskSet] = None,
+    ):
+        self.disks = disks or DiskSet([directory])
+        self.directory = self.disks.primary.directory
+        self.blob_directory = self.disks.primary.blob_directory
+        self.shard_levels = shard_levels
+        self.packs = packs
+        self.io = io or BlobIO()
+        self.cache = cache
+        self._locks = {}  # data hash -> [lock, number of tasks using it]
+        self._locks_guard = threading.Lock()
+
+    @asynccontextmanager
+    async def lock(self, data_hash):
+        """
+        Holds the lock serializing writes, moves and releases of a data hash.
+        """
+        key = str(data_hash)
+        with self._locks_guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            while not entry[0].acquire(blocking=False):
+                await asyncio.sleep(LOCK_POLL_INTERVAL)
+            try:
+                yield
+            finally:
+                entry[0].release()
+        finally:
+            with self._locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._locks[key]
+
+    def path(self, data_hash, blob_directory: Optional[str] = None) -> str:
+        """
+        Returns the path of the blob of a data hash, on the primary data root by default.
+        """
+        data_hash = str(data_hash)
+        blob_directory = blob_directory or self.blob_directory
+        if not self.shard_levels:
+            return os.path.join(blob_directory, data_hash)
+        return os.path.join(
+            blob_directory,
+            shard_directories(data_hash, self.shard_levels),
+            data_hash,
+        )
+
+    def paths(self, data_hash) -> List[str]:
+        """
+        Returns the paths the blob of a data hash may be placed at, one per data root.
+        """
+        return [self.path(data_hash, root.blob_directory) for root in self.disks.roots]
+
+    def legacy_paths(self, data_hash, hotkey: str) -> List[str]:
+        """
+        Returns the paths a blob may have been stored at by older layouts, newest layout first.
+        """
+        data_hash = str(data_hash)
+        paths = [
+            os.path.join(self.blob_directory, shard_directories(data_hash, levels), data_hash)
+            for levels in (1, 2, 3)
+            if levels != self.shard_levels
+        ]
+        if self.shard_levels:
+            paths.append(os.path.join(self.blob_directory, data_hash))
+        paths.append(os.path.join(self.directory, hotkey, data_hash))
+        paths.append(os.path.join(self.directory, data_hash))
+        return paths
+
+    def locate(self, data_hash, hotkey: str, filepath: Optional[str] = None) -> Optional[str]:
+        """
+        Finds the file holding a blob, trying the path recorded in its metadata first.
+
+        Returns:
+            str: The path of the blob, or None if it is not found anywhere.
+        """
+        candidates = self.paths(data_hash) + self.legacy_paths(data_hash, hotkey)
+        if filepath:
+            candidates.insert(0, os.path.expanduser(filepath))
+        for candidate in candidates:
+            if os.path.isfile(candidate):
+                return candidate
+        return None
+
+    def put(self, data_hash, data: bytes) -> str:
+        """
+        Stores a blob unless it is already present.
+
+        The data hash identifies the content, so an existing blob of the same size is reused as is.
+
+        Returns:
+            str: The path of the blob.
+        """
+        filepath = self._find_stored(data_hash, data)
+        if filepath is not None:
+            return filepath
+        root = self.disks.choose(len(data))
+        with self.disks.writing(root, len(data)):
+            return write_file_atomic(
+                self.path(data_hash, root.blob_directory), data, self.io.fsync
+            )
+
+    def _find_stored(self, data_hash, data: bytes) -> Optional[str]:
+        for filepath in self.paths(data_hash):
+            if os.path.isfile(filepath) and os.path.getsize(filepath) == len(data):
+                bt.logging.trace(f"Blob at {filepath} already stored, adding a reference")
+                return filepath
+        return None
+
+    async def store(self, r: "aioredis.StrictRedis", data_hash, data: bytes) -> str:
+        """
+        Stores a blob unless it is already present, in a packfile segment if it is small enough.
+        Must be called holding the lock of the data hash.
+
+        Returns:
+            str: The path of the blob in the blob layout, to be recorded in its metadata.
+        """
+        if self.cache is not None:
+            # Freshly stored blobs are the most likely to be challenged next
+            self.cache.put(data_hash, data)
+        if self.packs is not None and self.packs.accepts(len(data)):
+            await self.packs.put(r, data_hash, data)
+            return self.path(data_hash)
+        filepath = self._find_stored(data_hash, data)
+        if filepath is not None:
+            return filepath
+        root = self.disks.choose(len(data))
+        with self.disks.writing(root, len(data)):
+            return await self.io.write(self.path(data_hash, root.blob_directory), data)
+
+    async def resolve(
+        self,
+        r: "aioredis.StrictRedis",
+        data_hash,
+        hotkey: str,
+        filepath: Optional[str] = None,
+    ) -> Optional[Union[str, BlobRange]]:
+        """
+        Finds where a blob is stored, in a packfile segment or in a file of its own.
+
+        Returns:
+            str or BlobRange: The location of the blob, which `open_blob` accepts, or None if it
+                              is not found anywhere.
+        """
+        if self.packs is not None:
+            location = await self.packs.get(r, data_hash)
+            if location is not None:
+                return location
+        return self.locate(data_hash, hotkey, filepath)
+
+    @contextmanager
+    def open(self, data_hash, location: Union[str, BlobRange]):
+        """
+        Yields a read-only view of the contents of a blob, from the cache when it holds the blob
+        and from `location` otherwise, see `open_blob`. Blobs read from disk are admitted to the
+        cache. Blocking, meant to run on the I/O threads.
+
+        Args:
+            data_hash: The data hash of the blob.
+            location (str or BlobRange): Where the blob is stored, as returned by `resolve`.
+
+        Yields:
+            memoryview: The contents of the blob, which must not be used after the context exits.
+        """
+        data = self.cache.get(data_hash) if self.cache is not None else None
+        if data is not None:
+            view = memoryview(data)
+            try:
+                yield view
+            finally:
+                view.release()
+            return
+        with open_blob(location) as view:
+            if self.cache is not None and self.cache.admits(len(view)):
+                self.cache.put(data_hash, view)
+            yield view
+
+    async def find(self, r: "aioredis.StrictRedis", data_hash) -> Optional[str]:
+        """
+        Returns the path of the blob of a data hash in the current layout, on whichever data root
+        it is, skipping the old copies of moved blobs. None if there is no such file.
+        """
+        for path in self.paths(data_hash):
+            if os.path.isfile(path) and not await r.hexists(BLOB_RETIRED_KEY, path):
+                return path
+        return None
+
+    async def retire(self, r: "aioredis.StrictRedis", data_hash, path: str):
+        """
+        Schedules the deletion of the old copy of a moved blob, see `delete_retired`.
+        """
+        entry = {"data_hash": str(data_hash), "retired": time.time()}
+        await r.hset(BLOB_RETIRED_KEY, path, json.dumps(entry))
+
+    async def delete_retired(
+        self, r: "aioredis.StrictRedis", grace_period: float = BLOB_RETIRE_GRACE_PERIOD
+    ) -> int:
+        """
+        Deletes the old copies of moved blobs retired at least `grace_period` seconds ago. A path
+        that an entry points at again, e.g. a blob moved back to its previous root, is kept.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        reclaimed = 0
+        for path, raw in (await r.hgetall(BLOB_RETIRED_KEY)).items():
+            path = path.decode("utf-8")
+            entry = json.loads(raw)
+            if time.time() - entry["retired"] < grace_period:
+                continue
+            data_hash = entry["data_hash"]
+            async with self.lock(data_hash):
+                referenced = False
+                for hotkey, value in (await r.hgetall(data_hash)).items():
+                    try:
+                        metadata = await metadata_codec.loads(r, data_hash, hotkey, value)
+                    except Exception:
+                        continue
+                    if os.path.expanduser(metadata.get("filepath") or "") == path:
+                        referenced = True
+                        break
+                if not referenced and os.path.isfile(path):
+                    reclaimed += os.path.getsize(path)
+                    os.remove(path)
+                    bt.logging.trace(f"Deleted the old copy of blob {data_hash} at {path}")
+                await r.hdel(BLOB_RETIRED_KEY, path)
+        return reclaimed
+
+    async def release(
+        self, r: "aioredis.StrictRedis", data_hash, hotkey: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Drops the reference of a hotkey to a blob, deleting the file once nothing references it.
+
+        Args:
+            r (redis.Redis): The Redis connection instance.
+            data_hash: The data hash of the blob.
+            hotkey (str): The hotkey whose reference is dropped.
+
+        Returns:
+            dict: The metadata of the dropped reference, or None if the hotkey held none.
+        """
+        async with self.lock(data_hash):
+            metadata = await delete_chunk_metadata(r, str(data_hash), hotkey)
+            if metadata is None:
+                return None
+
+            filepath = os.path.expanduser(metadata.get("filepath") or "")
+            remaining = await r.hgetall(str(data_hash))
+            for other_hotkey, raw in remaining.items():
+                try:
+                    other = await metadata_codec.loads(r, data_hash, other_hotkey, raw)
+                except Exception:
+                    continue
+                if os.path.expanduser(other.get("filepath") or "") == filepath:
+                    bt.logging.trace(f"Blob {data_hash} still referenced by {other_hotkey}")
+                    return metadata
+
+            if filepath and os.path.isfile(filepath):
+                os.remove(filepath)
+                bt.logging.trace(f"Deleted blob {data_hash} at {filepath}")
+            if not remaining and self.packs is not None:
+                if await self.packs.delete(r, data_hash):
+                    bt.logging.trace(f"Deleted packed blob {data_hash}")
+            if not remaining and self.cache is not None:
+                self.cache.invalidate(data_hash)
+            if not remaining:
+                await r.zrem(ACCESS_INDEX_KEY, str(data_hash))
+            return metadata
+
+    async def relocate(self, r: "aioredis.StrictRedis", data_hash, root) -> int:
+        """
+        Moves the blob of a data hash to another data root, e.g. between storage tiers.
+
+        The blob is copied first, then every entry referencing it is repointed in one transaction,
+        and only then is the old file retired, so readers always find a complete blob, including
+        those that resolved the old file before the move.
+
+        Args:
+            r (redis.Redis): The Redis connection instance.
+            data_hash: The data hash of the blob.
+            root (DataRoot): The data root the blob is moved to.
+
+        Returns:
+            int: The number of bytes moved, 0 if the blob is not a file or already on the root.
+        """
+        async with self.lock(data_hash):
+            source = await self.find(r, data_hash)
+            if source is None or self.disks.root_of(source) is root:
+                return 0
+            size = os.path.getsize(source)
+            target = self.path(data_hash, root.blob_directory)
+            with self.disks.writing(root, size):
+                await self.io.run(copy_file_atomic, source, target, self.io.fsync)
+            # The target may be the retired copy of an earlier move, which is live again
+            await r.hdel(BLOB_RETIRED_KEY, target)
+
+            async with r.pipeline(transaction=True) as pipe:
+                while True:
+                    try:
+                        await pipe.watch(str(data_hash))
+                        updates = {}
+                        for hotkey, raw in (await pipe.hgetall(str(data_hash))).items():
+                            metadata = await metadata_codec.loads(r, data_hash, hotkey, raw)
+                            if os.path.expanduser(metadata.get("filepath") or "") == source:
+                                metadata["filepath"] = target
+                                updates[hotkey] = await metadata_codec.dumps(
+                                    r, data_hash, hotkey, metadata
+                                )
+                        pipe.multi()
+                        if updates:
+                            pipe.hset(str(data_hash), mapping=updates)
+                        await pipe.execute()
+                        break
+                    except WatchError:
+                        continue
+            await self.retire(r, data_hash, source)
+            return size
+
+    async def migrate(self, r: "aioredis.StrictRedis", data_hash) -> int:
+        """
+        Moves the blob of a data hash to its path in the current layout, on the data root it is
+        already on, and points every entry referencing the old file at the new one. Copies of the
+        same data stored per hotkey by the legacy layout are collapsed into a single blob. The
+        blob is hard linked to its new path where possible, and the old files are retired.
+
+        Returns:
+            int: The number of entries updated.
+        """
+        target = None
+        updated = 0
+        async with self.lock(data_hash):
+            for hotkey, raw in (await r.hgetall(str(data_hash))).items():
+                try:
+                    metadata = await metadata_codec.loads(r, data_hash, hotkey, raw)
+                except Exception as e:
+                    bt.logging.warning(f"Could not decode metadata of {data_hash}: {e}")
+                    continue
+                filepath = os.path.expanduser(metadata.get("filepath") or "")
+                if target is None:
+                    root = self.disks.root_of(filepath) or self.disks.primary
+                    target = self.path(data_hash, root.blob_directory)
+                if filepath == target:
+                    continue
+                if os.path.isfile(filepath):
+                    if not os.path.isfile(target):
+                        await self.io.run(
+                            copy_file_atomic, filepath, target, self.io.fsync, True
+                        )
+                    await self.retire(r, data_hash, filepath)
+                elif not os.path.isfile(target):
+                    bt.logging.trace(f"No file found for {data_hash} at {filepath}, skipping")
+                    continue
+                await update_chunk_filepath(r, str(data_hash), hotkey, target)
+                updated += 1
+        return updated
+
+
+async def migrate_blob_layout(
+    r: "aioredis.StrictRedis", blob_store: BlobStore, pause: float = 0.01
+) -> int:
+    """
+    Background migration of every blob in the index to the current layout of the blob store.
+
+    This walks the index like `storage.miner.migration.migrate_data_directory`, but moves the files
+    itself, one data hash at a time and under the blob lock, so it can run while the miner serves
+    requests. Requests for a blob that has been moved but not yet repointed still find it, as
+    `BlobStore.locate` falls back to the current layout.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        blob_store (BlobStore): The blob store whose layout the blobs are moved to.
+        pause (float): Seconds to sleep between data hashes, to limit the load on the disk.
+
+    Returns:
+        int: The number of entries updated.
+    """
+    bt.logging.info(f"Migrating blobs to the layout of {blob_store.blob_directory}")
+    updated = 0
+    async for key in r.scan_iter("*"):
+        if not is_chunk_key(key):
+            continue
+        try:
+            updated += await blob_store.migrate(r, key.decode("utf-8"))
+        except Exception as e:
+            bt.logging.error(f"Could not migrate blob {key}: {e}")
+        await asyncio.sleep(pause)
+    bt.logging.success(f"Blob layout migration complete, updated {updated} entries.")
+    return updated
+
+
+async def delete_retired_blobs(
+    r: "aioredis.StrictRedis",
+    blob_store: BlobStore,
+    grace_period: float = BLOB_RETIRE_GRACE_PERIOD,
+) -> int:
+    """
+    Background deletion of the old copies of the blobs moved by the blob store, see
+    `BlobStore.delete_retired`.
+
+    Returns:
+        int: The number of bytes reclaimed.
+    """
+    reclaimed = await blob_store.delete_retired(r, grace_period)
+    if reclaimed:
+        bt.logging.info(f"Deleted {reclaimed} bytes of moved blobs")
+    return reclaimed
+
+
+async def compact_packfiles(
+    r: "aioredis.StrictRedis", blob_store: BlobStore, max_live_ratio: float = 0.5
+) -> int:
+    """
+    Background compaction of the packfile segments of a blob store, see `PackStore.compact`.
+
+    Returns:
+        int: The number of bytes reclaimed.
+    """
+    if blob_store.packs is None:
+        return 0
+    reclaimed = await blob_store.packs.compact(r, blob_store.lock, max_live_ratio)
+    if reclaimed:
+        bt.logging.info(f"Packfile compaction reclaimed {reclaimed} bytes")
+    return reclaimed
+
+
+async def purge_expired_chunks(
+    r: "aioredis.StrictRedis",
+    blob_store: BlobStore,
+    batch_size: int = 1000,
+    now: Optional[float] = None,
+) -> int:
+    """
+    Deletes every chunk entry whose TTL has passed, together with its blob once no other hotkey
+    references it, and takes it out of the storage ledger.
+
+    Expired entries are read from the expiry index in batches of `batch_size`, so a purge costs
+    in proportion to what expires rather than to the size of the index. Index members left over
+    by entries deleted in the meantime are dropped.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        blob_store (BlobStore): The blob store holding the blobs of the entries.
+        batch_size (int): The number of entries read from the index per round trip.
+        now (float, optional): The current timestamp. Defaults to the time the purge starts.
+
+    Returns:
+        int: The number of entries purged.
+    """
+    now = now or time.time()
+    purged = failed = 0
+    while True:
+        expired = await get_expired_chunks(r, now, failed + batch_size)
+        expired = expired[failed:]
+        if not expired:
+            break
+        for chunk_hash, hotkey in expired:
+            try:
+                if await blob_store.release(r, chunk_hash, hotkey) is not None:
+                    purged += 1
+                else:
+                    await r.zrem(EXPIRY_INDEX_KEY, expiry_member(chunk_hash, hotkey))
+            except Exception as e:
+                # Left in the index and skipped, it is retried by the next purge
+                bt.logging.error(f"Could not purge {chunk_hash} for {hotkey}: {e}")
+                failed += 1
+        if len(expired) < batch_size:
+            break
+    if purged:
+        bt.logging.info(f"Purged {purged} expired chunk entries")
+    return purged
@@ -0,0 +1,142 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class BlobCache:
+    """
+    Bounded least recently used cache of blob contents, keyed by data hash.
+
+    Validators challenge and retrieve recently stored blobs over and over, and every request
+    reads the whole blob to compute its proof. Keeping the hottest blobs in memory saves these
+    reads, which dominate the latency of miners on spinning disks.
+
+    The cache holds at most `max_bytes` of data. Blobs larger than `max_blob_size` are never
+    admitted, so one huge blob cannot evict everything else. Blobs are content addressed, so an
+    entry only becomes stale when its blob is deleted, see `invalidate`.
+
+    The cache is thread safe: it is filled from the I/O threads and read from the event loops.
+
+    Attributes:
+        max_bytes (int): The memory budget of the cache in bytes.
+        max_blob_size (int): The largest blob admitted in bytes.
+        hits (int): The number of lookups served from the cache.
+        misses (int): The number of lookups that went to disk.
+        evictions (int): The number of blobs evicted to make room for others.
+    """
+
+    def __init__(self, max_bytes: int, max_blob_size: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_blob_size = min(max_blob_size or max_bytes, max_bytes)
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._blobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._blobs)
+
+    def __contains__(self, data_hash) -> bool:
+        return str(data_hash) in self._blobs
+
+    def admits(self, size: int) -> bool:
+        """
+        Returns whether a blob of `size` bytes may be cached.
+        """
+        return 0 < size <= self.max_blob_size
+
+    def get(self, data_hash) -> Optional[bytes]:
+        """
+        Returns the cached content of a blob and marks it as recently used, or None on a miss.
+        """
+        key = str(data_hash)
+        with self._lock:
+            data = self._blobs.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._blobs.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, data_hash, data: bytes) -> bool:
+        """
+        Caches the content of a blob, evicting the least recently used blobs to make room.
+
+        Returns:
+            bool: True if the blob was admitted.
+        """
+        if not self.admits(len(data)):
+            return False
+        key = str(data_hash)
+        data = bytes(data)
+        with self._lock:
+            previous = self._blobs.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            while self._blobs and self.size + len(data) > self.max_bytes:
+                _, evicted = self._blobs.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+            self._blobs[key] = data
+            self.size += len(data)
+        return True
+
+    def invalidate(self, data_hash) -> bool:
+        """
+        Drops a blob from the cache, e.g. once it is deleted from disk.
+
+        Returns:
+            bool: True if the blob was cached.
+        """
+        with self._lock:
+            data = self._blobs.pop(str(data_hash), None)
+            if data is None:
+                return False
+            self.size -= len(data)
+            return True
+
+    def clear(self):
+        with self._lock:
+            self._blobs.clear()
+            self.size = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the counters of the cache, for logging and monitoring.
+        """
+        with self._lock:
+            return {
+                "blobs": len(self._blobs),
+                "bytes": self.size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hit_rate,
+            }
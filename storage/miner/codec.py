@@ -0,0 +1,335 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import json
+import struct
+import hashlib
+from typing import Any, Dict, Optional, Tuple, Union
+from redis import asyncio as aioredis
+
+
+# Version byte of the binary metadata format. JSON entries always start with "{" (0x7b).
+METADATA_VERSION = 1
+
+# Redis hash mapping path template ids to base directories ("id:<n>") and back ("dir:<path>")
+PATH_TEMPLATES_KEY = "index:path_templates"
+
+DEFAULT_TTL = 60 * 60 * 24 * 30
+# The ttl is packed as an unsigned 32 bit integer
+MAX_TTL = 2**32 - 1
+PROOF_SIZE = 32
+
+# Metadata flags
+FLAG_PROOF = 0x01  # A 32 byte storage proof is appended to the entry
+LAYOUT_SHIFT = 1  # Bits 1-3 hold the path layout
+LAYOUT_MASK = 0x0E
+
+# Path layouts, how the filepath continues after the template directory. Only explicit paths store a suffix.
+LAYOUT_EXPLICIT = 0  # <template>/<suffix>
+LAYOUT_HOTKEY = 1  # <template>/<hotkey>/<chunk_hash>
+LAYOUT_HASH = 2  # <template>/<chunk_hash>
+# <template>/<shard>/.../<chunk_hash>, with 1 to 3 levels of shard directories, see `shard_directories`
+LAYOUT_SHARDED = {1: 3, 2: 4, 3: 5}
+
+# Number of hex characters of the hash naming each level of shard directories
+SHARD_WIDTH = 2
+
+
+def shard_directories(chunk_hash: str, levels: int) -> str:
+    """
+    Returns the shard directories of a chunk, e.g. "3f/a0" for two levels.
+
+    Shards are named after the leading hex digits of the chunk hash, so blobs spread evenly over
+    16 ** SHARD_WIDTH directories per level.
+    """
+    if chunk_hash.isdigit():
+        digest = format(int(chunk_hash), "064x")
+    else:
+        digest = hashlib.sha256(chunk_hash.encode("utf-8")).hexdigest()
+    return os.path.join(
+        *[digest[level * SHARD_WIDTH : (level + 1) * SHARD_WIDTH] for level in range(levels)]
+    )
+
+
+# Suffix of each implicit layout, most specific first since the first matching layout is used
+LAYOUT_SUFFIXES = {
+    LAYOUT_HOTKEY: lambda chunk_hash, hotkey: os.path.join(hotkey, chunk_hash),
+    **{
+        layout: lambda chunk_hash, hotkey, levels=levels: os.path.join(
+            shard_directories(chunk_hash, levels), chunk_hash
+        )
+        for levels, layout in sorted(LAYOUT_SHARDED.items(), reverse=True)
+    },
+    LAYOUT_HASH: lambda chunk_hash, hotkey: chunk_hash,
+}
+
+# version, flags, size, ttl, generated, seed length
+_HEADER = struct.Struct("<BBQIdH")
+# Offset of the little endian seed length in the header, the seed follows the header
+SEED_LENGTH_OFFSET = _HEADER.size - 2
+# template id, suffix length
+_PATH = struct.Struct("<HH")
+_TEMPLATE_ID = struct.Struct("<H")
+
+
+class PathTemplates:
+    """
+    Registry of the base directories that chunk filepaths are stored relative to.
+
+    Most filepaths share a handful of base directories, so entries only store the id of their
+    base directory. Ids are allocated in Redis and never reassigned, which lets every process
+    cache the mapping and only reload it when it meets an id it does not know yet. Id 0 is the
+    empty base, used for paths that are stored in full.
+    """
+
+    def __init__(self):
+        self.directories = {0: ""}
+        self.ids = {"": 0}
+
+    async def load(self, r: "aioredis.StrictRedis"):
+        """
+        Reloads the template table from Redis.
+        """
+        for field, value in (await r.hgetall(PATH_TEMPLATES_KEY)).items():
+            field = field.decode("utf-8")
+            if field.startswith("id:"):
+                template_id, directory = int(field[3:]), value.decode("utf-8")
+                self.directories[template_id] = directory
+                self.ids.setdefault(directory, template_id)
+
+    async def get_id(self, r: "aioredis.StrictRedis", directory: str) -> int:
+        """
+        Returns the id of a base directory, registering it if it is new.
+        """
+        if directory in self.ids:
+            return self.ids[directory]
+        existing = await r.hget(PATH_TEMPLATES_KEY, f"dir:{directory}")
+        if existing is None:
+            template_id = await r.hincrby(PATH_TEMPLATES_KEY, "next", 1)
+            # Publish the id before claiming the directory, so any reader that sees the claim
+            # can resolve it. A lost race leaves an unused id behind, which is harmless.
+            await r.hset(PATH_TEMPLATES_KEY, f"id:{template_id}", directory)
+            if not await r.hsetnx(PATH_TEMPLATES_KEY, f"dir:{directory}", template_id):
+                existing = await r.hget(PATH_TEMPLATES_KEY, f"dir:{directory}")
+        if existing is not None:
+            template_id = int(existing)
+        self.directories[template_id] = directory
+        self.ids[directory] = template_id
+        return template_id
+
+    async def get_directory(self, r: "aioredis.StrictRedis", template_id: int) -> str:
+        """
+        Returns the base directory of a template id.
+        """
+        if template_id not in self.directories:
+            await self.load(r)
+        return self.directories[template_id]
+
+
+def clamp_ttl(ttl: Optional[int]) -> int:
+    """
+    Returns the ttl to store for a chunk: the default if none is given, else `ttl` clamped to the
+    range of the binary format. A negative ttl is stored as 1 second, expiring the chunk, since 0
+    stands for the default.
+    """
+    if not ttl:
+        return DEFAULT_TTL
+    return min(max(int(ttl), 1), MAX_TTL)
+
+
+def _as_str(value: Union[bytes, str]) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+def split_filepath(filepath: str, chunk_hash: str, hotkey: str) -> Tuple[str, int, Optional[str]]:
+    """
+    Splits a filepath into a template directory, a path layout and the suffix stored in the entry.
+
+    Returns:
+        tuple: The template directory, the layout, and the suffix (None unless the layout is explicit).
+    """
+    if not filepath:
+        return "", LAYOUT_EXPLICIT, ""
+    for layout, suffix in LAYOUT_SUFFIXES.items():
+        suffix = suffix(chunk_hash, hotkey)
+        if filepath.endswith(os.sep + suffix):
+            return filepath[: -len(suffix) - 1], layout, None
+    directory, filename = os.path.split(filepath)
+    return directory, LAYOUT_EXPLICIT, filename
+
+
+def join_filepath(
+    directory: str, layout: int, suffix: Optional[str], chunk_hash: str, hotkey: str
+) -> str:
+    """
+    Rebuilds a filepath from its template directory, layout and suffix, the inverse of `split_filepath`.
+    """
+    if layout != LAYOUT_EXPLICIT:
+        suffix = LAYOUT_SUFFIXES[layout](chunk_hash, hotkey)
+    return os.path.join(directory, suffix) if directory else suffix
+
+
+def encode_metadata(
+    metadata: Dict[str, Any], template_id: int, layout: int, suffix: Optional[str] = None
+) -> bytes:
+    """
+    Packs chunk metadata into the binary format.
+
+    Layout (little endian): version (B), flags (B), size (Q), ttl (I), generated (d), seed length (H),
+    seed, template id (H), [suffix length (H), suffix], [32 byte proof].
+    The seed sits at a fixed offset and the proof at the end so either can be replaced in place.
+
+    Args:
+        metadata (dict): The metadata with filepath, size, seed, ttl, generated and optionally proof.
+        template_id (int): The id of the template directory of the filepath.
+        layout (int): The path layout, one of the LAYOUT_* constants.
+        suffix (str): The filepath relative to the template directory, for the explicit layout.
+
+    Returns:
+        bytes: The encoded metadata.
+    """
+    flags = layout << LAYOUT_SHIFT
+    proof = metadata.get("proof")
+    if proof is not None:
+        flags |= FLAG_PROOF
+    seed = str(metadata.get("seed", "")).encode("utf-8")
+    parts = [
+        _HEADER.pack(
+            METADATA_VERSION,
+            flags,
+            int(metadata.get("size", 0)),
+            clamp_ttl(metadata.get("ttl")),
+            float(metadata.get("generated", 0)),
+            len(seed),
+        ),
+        seed,
+    ]
+    if layout != LAYOUT_EXPLICIT:
+        parts.append(_TEMPLATE_ID.pack(template_id))
+    else:
+        suffix = suffix.encode("utf-8")
+        parts.append(_PATH.pack(template_id, len(suffix)))
+        parts.append(suffix)
+    if proof is not None:
+        parts.append(int(proof).to_bytes(PROOF_SIZE, "big"))
+    return b"".join(parts)
+
+
+def decode_metadata(raw: bytes) -> Tuple[Dict[str, Any], int, int, Optional[str]]:
+    """
+    Unpacks binary chunk metadata, the inverse of `encode_metadata`.
+
+    Returns:
+        tuple: The metadata without its filepath, the template id, the layout and the suffix
+               (None unless the layout is explicit).
+    """
+    version, flags, size, ttl, generated, seed_length = _HEADER.unpack_from(raw)
+    if version != METADATA_VERSION:
+        raise ValueError(f"Unsupported metadata version {version}")
+    offset = _HEADER.size
+    seed = bytes(raw[offset : offset + seed_length]).decode("utf-8")
+    offset += seed_length
+    layout = (flags & LAYOUT_MASK) >> LAYOUT_SHIFT
+    if layout != LAYOUT_EXPLICIT:
+        (template_id,) = _TEMPLATE_ID.unpack_from(raw, offset)
+        suffix = None
+        offset += _TEMPLATE_ID.size
+    else:
+        template_id, suffix_length = _PATH.unpack_from(raw, offset)
+        offset += _PATH.size
+        suffix = bytes(raw[offset : offset + suffix_length]).decode("utf-8")
+        offset += suffix_length
+    metadata = {"size": size, "seed": seed, "ttl": ttl, "generated": generated}
+    if flags & FLAG_PROOF:
+        metadata["proof"] = int.from_bytes(raw[offset : offset + PROOF_SIZE], "big")
+    return metadata, template_id, layout, suffix
+
+
+def is_binary_metadata(raw: Union[bytes, str]) -> bool:
+    """
+    Returns whether a stored metadata value uses the binary format rather than JSON.
+    """
+    return isinstance(raw, (bytes, bytearray)) and raw[:1] == bytes([METADATA_VERSION])
+
+
+def normalize_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Converts the stringified values of JSON metadata to their native types.
+    """
+    metadata["size"] = int(metadata.get("size", 0))
+    metadata["ttl"] = clamp_ttl(metadata.get("ttl"))
+    metadata["seed"] = metadata.get("seed", "")
+    metadata["generated"] = float(metadata.get("generated", 0))
+    return metadata
+
+
+class MetadataCodec:
+    """
+    Reads and writes the per hotkey chunk metadata stored in the miner's Redis index.
+
+    Entries are written in the compact binary format of `encode_metadata`, with the filepath
+    stored as a template directory and a path layout. Entries still in the JSON format are decoded transparently and
+    rewritten in the binary format the next time they are written, so the index migrates lazily.
+
+    Once `storage.miner.database.upgrade_schema` has converted every entry, `legacy` is cleared and
+    entries are decoded as binary without checking for JSON.
+
+    Attributes:
+        legacy (bool): Whether the index may still hold entries in a legacy format.
+    """
+
+    def __init__(self):
+        self.templates = PathTemplates()
+        self.legacy = True
+
+    async def dumps(
+        self,
+        r: "aioredis.StrictRedis",
+        chunk_hash: str,
+        hotkey: str,
+        metadata: Dict[str, Any],
+    ) -> bytes:
+        """
+        Encodes metadata for the entry of `hotkey` under `chunk_hash`.
+        """
+        directory, layout, suffix = split_filepath(
+            metadata.get("filepath") or "", _as_str(chunk_hash), _as_str(hotkey)
+        )
+        template_id = await self.templates.get_id(r, directory)
+        return encode_metadata(metadata, template_id, layout, suffix)
+
+    async def loads(
+        self,
+        r: "aioredis.StrictRedis",
+        chunk_hash: str,
+        hotkey: str,
+        raw: Union[bytes, str],
+    ) -> Dict[str, Any]:
+        """
+        Decodes a stored entry of `hotkey` under `chunk_hash`, in either format.
+        """
+        if self.legacy and not is_binary_metadata(raw):
+            return normalize_metadata(json.loads(raw))
+        metadata, template_id, layout, suffix = decode_metadata(raw)
+        directory = await self.templates.get_directory(r, template_id)
+        metadata["filepath"] = join_filepath(
+            directory, layout, suffix, _as_str(chunk_hash), _as_str(hotkey)
+        )
+        return metadata
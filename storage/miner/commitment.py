@@ -0,0 +1,335 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+import os
+import heapq
+import asyncio
+import itertools
+import threading
+import contextlib
+import multiprocessing
+import bittensor as bt
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from ..shared.ecc import (
+    ECCommitment,
+    FIXED_BASE_MIN_COMMITS,
+    POINT_ENCODING_LEGACY,
+    ecc_point_to_hex,
+    hash_stream,
+    hex_to_ecc_point,
+)
+from ..shared.merkle import (
+    MerkleTree,
+)
+from ..shared.utils import chunk_data
+from .utils import blob_size, commit_data_with_seed, open_blob
+
+
+def commit_chunk_batch(
+    g_hex: str,
+    h_hex: str,
+    curve: str,
+    seed,
+    filepath: str,
+    chunk_size: int,
+    start: int,
+    end: int,
+    precompute: bool = False,
+    encoding: int = POINT_ENCODING_LEGACY,
+) -> Tuple[int, List[Tuple[str, int]]]:
+    """
+    Commits a contiguous range of chunks of a stored blob. This is the entrypoint executed inside
+    the commitment worker processes, so it only receives picklable arguments: the worker maps the
+    blob itself and rebuilds the curve points locally.
+
+    Parameters:
+    - g_hex (str): The hex encoded base point of the commitment.
+    - h_hex (str): The hex encoded random point of the commitment.
+    - curve (str): The name of the elliptic curve, e.g. P-256.
+    - seed: The seed appended to every chunk before commitment.
+    - filepath (str or BlobRange): The location of the blob on disk.
+    - chunk_size (int): The size of each chunk in bytes.
+    - start (int): The index of the first chunk of this batch.
+    - end (int): The index one past the last chunk of this batch.
+    - precompute (bool): Whether to commit through the worker's cached fixed-base table for (g, h).
+    - encoding (int): The point encoding of the returned commitments.
+
+    Returns:
+    - tuple: The start index and a list of (commitment hex, randomness) pairs, one per chunk.
+    """
+    committer = ECCommitment(
+        hex_to_ecc_point(g_hex, curve),
+        hex_to_ecc_point(h_hex, curve),
+        precompute=precompute,
+    )
+    seed_bytes = str(seed).encode()
+    results = []
+    with open_blob(filepath) as blob:
+        for index in range(start, end):
+            chunk = blob[index * chunk_size : (index + 1) * chunk_size]
+            c, m_val, r = committer.commit_hashed(hash_stream((chunk, seed_bytes)))
+            chunk.release()
+            results.append((ecc_point_to_hex(c, encoding), r))
+    return start, results
+
+
+def build_merkle_tree(points: List[str]) -> MerkleTree:
+    """
+    Builds a Merkle tree whose leaves are the given commitment points in hex format.
+    """
+    merkle_tree = MerkleTree()
+    merkle_tree.add_leaf(points)
+    merkle_tree.make_tree()
+    return merkle_tree
+
+
+class PriorityGate:
+    """
+    Limits the number of commitment batches submitted to the worker pool at once, handing each
+    free slot to the waiting batch of highest priority. Batches beyond the free slots wait here
+    rather than in the FIFO queue of the pool, so the batches of a later, more important challenge
+    overtake those of a challenge already being committed.
+
+    Thread safe: slots are handed to waiters on the event loop they wait on.
+
+    Attributes:
+        free (int): The number of free slots.
+    """
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._waiters = []  # heap of (-priority, sequence, loop, future)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    async def acquire(self, priority: float = 0.0):
+        """
+        Waits for a free slot, which must be given back with `release`.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self.free > 0 and not self._waiters:
+                self.free -= 1
+                return
+            future = loop.create_future()
+            heapq.heappush(self._waiters, (-priority, next(self._sequence), loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over as the waiter was cancelled, pass it on
+                self.release()
+            raise
+
+    def release(self):
+        """
+        Gives a slot back, to the waiter of highest priority if any.
+        """
+        with self._lock:
+            while self._waiters:
+                _, _, loop, future = heapq.heappop(self._waiters)
+                if future.cancelled():
+                    continue
+                loop.call_soon_threadsafe(self._grant, future)
+                return
+            self.free += 1
+
+    def _grant(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+
+class CommitmentEngine:
+    """
+    Offloads the per-chunk elliptic curve commitments of a challenge to a persistent pool of
+    worker processes, keeping the miner's event loop free while the commitments are computed.
+
+    The chunks of the blob are split into contiguous batches which are spread over the workers.
+    Workers map the blob from disk themselves, so no chunk data is pickled between processes.
+    Batches are collected as they complete and slotted back into place, and the Merkle tree is
+    built from the resulting commitment points once every batch has returned. Batches are handed
+    to the workers by priority through a `PriorityGate`, so deprioritized challenges only use the
+    workers left over by the others.
+
+    Attributes:
+        max_workers (int): The number of worker processes in the pool.
+        batches_per_worker (int): How many batches each worker receives on average, which
+                                  evens out the load when some batches finish earlier.
+        min_batch_size (int): The smallest number of chunks sent to a worker in one batch.
+        metrics (MetricsRegistry): Where the time spent committing and building Merkle trees is
+                                   recorded, if given.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        batches_per_worker: int = 4,
+        min_batch_size: int = 8,
+        metrics=None,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.batches_per_worker = max(1, batches_per_worker)
+        self.min_batch_size = max(1, min_batch_size)
+        self.metrics = metrics
+        self.gate = PriorityGate(self.max_workers)
+        self.pool = self._create_pool()
+
+    def _time(self, phase: str):
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.time("miner_phase_seconds", handler="challenge", phase=phase)
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # Use spawn so workers do not inherit the state of the axon threads
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def split_batches(self, n_items: int) -> List[Tuple[int, int]]:
+        """
+        Splits `n_items` chunks into contiguous (start, end) ranges for the workers.
+        """
+        if n_items == 0:
+            return []
+        n_batches = self.max_workers * self.batches_per_worker
+        batch_size = max(self.min_batch_size, -(-n_items // n_batches))
+        return [
+            (start, min(start + batch_size, n_items))
+            for start in range(0, n_items, batch_size)
+        ]
+
+    async def commit_file_with_seed(
+        self,
+        g_hex: str,
+        h_hex: str,
+        curve: str,
+        filepath: str,
+        chunk_size: int,
+        n_chunks: int,
+        seed,
+        encoding: int = POINT_ENCODING_LEGACY,
+        priority: float = 0.0,
+    ):
+        """
+        Asynchronous, multi-process counterpart of `storage.miner.utils.commit_data_with_seed`,
+        operating on a blob stored on disk.
+
+        Parameters:
+        - g_hex (str): The hex encoded base point of the commitment.
+        - h_hex (str): The hex encoded random point of the commitment.
+        - curve (str): The name of the elliptic curve, e.g. P-256.
+        - filepath (str or BlobRange): The location of the blob on disk.
+        - chunk_size (int): The size of each chunk in bytes.
+        - n_chunks (int): The number of chunks expected to be committed.
+        - seed: A seed value that is combined with data chunks before commitment.
+        - encoding (int): The point encoding of the commitments, which are also the Merkle leaves.
+        - priority (float): The priority of the batches of this blob over those of other blobs.
+
+        Returns:
+        - randomness (list): A list of randomness values associated with each data chunk's commitment.
+        - points (list): A list of commitment points in hex format.
+        - merkle_tree (MerkleTree): A Merkle tree constructed from the commitment points.
+        """
+        loop = asyncio.get_running_loop()
+        file_size = blob_size(filepath)
+        n_items = -(-file_size // chunk_size)
+
+        randomness, points = [None] * n_chunks, [None] * n_chunks
+
+        # Each worker builds its own table, so only do it when every worker has enough chunks
+        precompute = n_items // self.max_workers >= FIXED_BASE_MIN_COMMITS
+
+        async def run_batch(start, end):
+            await self.gate.acquire(priority)
+            try:
+                return await loop.run_in_executor(
+                    self.pool,
+                    commit_chunk_batch,
+                    g_hex,
+                    h_hex,
+                    curve,
+                    seed,
+                    filepath,
+                    chunk_size,
+                    start,
+                    end,
+                    precompute,
+                    encoding,
+                )
+            finally:
+                self.gate.release()
+
+        try:
+            with self._time("commitment"):
+                futures = [
+                    asyncio.ensure_future(run_batch(start, end))
+                    for start, end in self.split_batches(n_items)
+                ]
+                for future in asyncio.as_completed(futures):
+                    start, results = await future
+                    for offset, (c_hex, r) in enumerate(results):
+                        randomness[start + offset] = r
+                        points[start + offset] = c_hex
+        except BrokenProcessPool as e:
+            bt.logging.error(
+                f"Commitment pool is broken ({e}), recreating it and committing in a thread."
+            )
+            self.pool = self._create_pool()
+            return await asyncio.to_thread(
+                self._commit_file_inline,
+                g_hex,
+                h_hex,
+                curve,
+                filepath,
+                chunk_size,
+                n_chunks,
+                seed,
+                encoding,
+            )
+
+        with self._time("merkle"):
+            merkle_tree = await asyncio.to_thread(build_merkle_tree, points[:n_items])
+        return randomness, points, merkle_tree
+
+    @staticmethod
+    def _commit_file_inline(g_hex, h_hex, curve, filepath, chunk_size, n_chunks, seed, encoding):
+        committer = ECCommitment(
+            hex_to_ecc_point(g_hex, curve),
+            hex_to_ecc_point(h_hex, curve),
+        )
+        with open_blob(filepath) as blob:
+            randomness, _, points, merkle_tree = commit_data_with_seed(
+                committer, chunk_data(blob, chunk_size), n_chunks, seed, encoding
+            )
+        return randomness, points, merkle_tree
+
+    def shutdown(self):
+        """
+        Stops the worker processes, cancelling any batches that have not started yet.
+        """
+        self.pool.shutdown(wait=False, cancel_futures=True)
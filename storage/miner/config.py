@@ -135,9 +135,256 @@ def add_args(cls, parser):
     parser.add_argument(
         "--miner.rate_limit_window",
         type=int,
-        help="Time window in blocks for rate limiting.",
+        help="Time window in seconds for rate limiting.",
         default=25,
     )
+    parser.add_argument(
+        "--miner.rate_limit_min_weight",
+        type=float,
+        help="Lowest rate limit multiplier, given to callers without stake.",
+        default=0.1,
+    )
+    parser.add_argument(
+        "--miner.rate_limit_max_weight",
+        type=float,
+        help="Highest rate limit multiplier, given to callers with many times the mean stake.",
+        default=10.0,
+    )
+    parser.add_argument(
+        "--miner.blob_shard_levels",
+        type=int,
+        choices=[0, 1, 2, 3],
+        help="Levels of hash prefix directories blobs are sharded into, 0 for a flat directory.",
+        default=2,
+    )
+    parser.add_argument(
+        "--miner.blob_migration_off",
+        action="store_true",
+        help="Do not move existing blobs to the current layout in the background.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.schema_upgrade_batch_size",
+        type=int,
+        help="Number of index keys upgraded to the current schema per round trip.",
+        default=1000,
+    )
+    parser.add_argument(
+        "--miner.ttl_purge_off",
+        action="store_true",
+        help="Do not delete chunks whose TTL has passed.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.ttl_purge_interval",
+        type=int,
+        help="Seconds between purges of the chunks whose TTL has passed.",
+        default=60,
+    )
+    parser.add_argument(
+        "--miner.ttl_purge_batch_size",
+        type=int,
+        help="Number of expired chunks read from the expiry index per round trip.",
+        default=1000,
+    )
+    parser.add_argument(
+        "--miner.scrub_off",
+        action="store_true",
+        help="Do not re-hash stored blobs in the background to find damaged ones.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.scrub_interval",
+        type=int,
+        help="Seconds between runs of the integrity scrubber.",
+        default=300,
+    )
+    parser.add_argument(
+        "--miner.scrub_keys_per_run",
+        type=int,
+        help="Number of index keys the integrity scrubber walks per run, resuming from there at the next run.",
+        default=10000,
+    )
+    parser.add_argument(
+        "--miner.scrub_rate",
+        type=int,
+        help="Bytes per second the integrity scrubber reads at most, 0 for no limit.",
+        default=16 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--miner.tiering_interval",
+        type=int,
+        help="Seconds between passes moving blobs between the fast and bulk data directories.",
+        default=600,
+    )
+    parser.add_argument(
+        "--miner.tiering_hot_threshold",
+        type=float,
+        help="Decayed access count from which a blob is promoted to a fast data directory.",
+        default=4.0,
+    )
+    parser.add_argument(
+        "--miner.tiering_cold_threshold",
+        type=float,
+        help="Decayed access count under which a blob is demoted from a fast data directory.",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--miner.tiering_min_age",
+        type=int,
+        help="Seconds a new blob stays in a fast data directory before it may be demoted.",
+        default=3600,
+    )
+    parser.add_argument(
+        "--miner.tiering_rate",
+        type=int,
+        help="Bytes per second moved between data directories at most, 0 for no limit.",
+        default=32 * 1024 * 1024,
+    )
+    parser.add_argument(
+        "--miner.tiering_max_moves",
+        type=int,
+        help="Maximum number of blobs moved between data directories per pass.",
+        default=1000,
+    )
+    parser.add_argument(
+        "--miner.tiering_decay",
+        type=float,
+        help="Factor the access counts are multiplied by after every tiering pass.",
+        default=0.5,
+    )
+    parser.add_argument(
+        "--miner.metrics_host",
+        type=str,
+        help="Address the metrics endpoint listens on.",
+        default="127.0.0.1",
+    )
+    parser.add_argument(
+        "--miner.metrics_port",
+        type=int,
+        help="Port of the HTTP endpoint serving the miner metrics at /metrics, 0 to disable it.",
+        default=0,
+    )
+    parser.add_argument(
+        "--miner.metrics_snapshot_path",
+        type=str,
+        help="File the metrics snapshot is written to, metrics.json in the miner directory by default.",
+        default="",
+    )
+    parser.add_argument(
+        "--miner.metrics_snapshot_interval",
+        type=float,
+        help="Seconds between metrics snapshots written to disk, 0 to disable them.",
+        default=60,
+    )
+    parser.add_argument(
+        "--miner.blob_cache_size",
+        type=int,
+        help="Memory budget in bytes of the cache of recently used blobs, 0 to disable it.",
+        default=256 * 2**20,
+    )
+    parser.add_argument(
+        "--miner.blob_cache_max_blob_size",
+        type=int,
+        help="Largest blob, in bytes, kept in the blob cache.",
+        default=16 * 2**20,
+    )
+    parser.add_argument(
+        "--miner.io_threads",
+        type=int,
+        help="Number of threads running the disk reads and writes of requests.",
+        default=4,
+    )
+    parser.add_argument(
+        "--miner.io_queue_depth",
+        type=int,
+        help="Maximum number of disk operations queued or running at once.",
+        default=64,
+    )
+    parser.add_argument(
+        "--miner.fsync",
+        action="store_true",
+        help="Flush stored blobs to disk before acknowledging a store request.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.fsync_interval",
+        type=float,
+        help="Seconds to wait for other writes before flushing them to disk as a group.",
+        default=0.005,
+    )
+    parser.add_argument(
+        "--miner.packfile",
+        action="store_true",
+        help="Append small blobs to packfile segments instead of storing each in its own file.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.packfile_max_blob_size",
+        type=int,
+        help="Largest blob, in bytes, stored in packfile segments.",
+        default=2**20,
+    )
+    parser.add_argument(
+        "--miner.packfile_segment_size",
+        type=int,
+        help="Size in bytes after which a packfile segment is sealed.",
+        default=256 * 2**20,
+    )
+    parser.add_argument(
+        "--miner.packfile_compaction_interval",
+        type=int,
+        help="Seconds between compactions of the packfile segments.",
+        default=60 * 60,
+    )
+    parser.add_argument(
+        "--miner.commitment_workers",
+        type=int,
+        help="Number of worker processes used to compute challenge commitments. Defaults to the number of cores.",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.cpu_workers",
+        type=int,
+        help="Number of threads hashing and committing request data, highest stake first. Defaults to the number of cores.",
+        default=None,
+    )
+    parser.add_argument(
+        "--miner.cpu_queue_size",
+        type=int,
+        help="Maximum number of requests waiting for a CPU worker.",
+        default=1024,
+    )
+    parser.add_argument(
+        "--miner.default_request_timeout",
+        type=float,
+        help="Seconds a validator waits for a response when the request does not say.",
+        default=30,
+    )
+    parser.add_argument(
+        "--miner.deadline_margin",
+        type=float,
+        help="Seconds kept to send a response back before the validator's timeout; work that cannot finish earlier is dropped.",
+        default=1.0,
+    )
+    parser.add_argument(
+        "--miner.admission_off",
+        action="store_true",
+        help="Run every challenge instead of admitting them by estimated CPU cost.",
+        default=False,
+    )
+    parser.add_argument(
+        "--miner.admission_window",
+        type=float,
+        help="Seconds over which the CPU consumed by each validator is accounted against its stake share.",
+        default=60.0,
+    )
+    parser.add_argument(
+        "--miner.commit_cost",
+        type=float,
+        help="Initial estimate of the CPU seconds of one chunk commitment, refined from measurements.",
+        default=0.005,
+    )
 
     parser.add_argument(
         "--database.host", default="localhost", help="The host of the redis database."
@@ -159,6 +406,26 @@ def add_args(cls, parser):
         default="~/.data",
         help="The directory to store data in.",
     )
+    parser.add_argument(
+        "--database.extra_directories",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Data directories on other disks new blobs are spread over, together with --database.directory.",
+    )
+    parser.add_argument(
+        "--database.fast_directories",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Data directories on fast disks (SSD) holding new and frequently accessed blobs, moved to the other directories once cold.",
+    )
+    parser.add_argument(
+        "--database.min_free_space",
+        type=int,
+        default=256 * 1024 * 1024,
+        help="Bytes kept free on every data directory's disk, no new blobs are placed on a disk below it.",
+    )
     parser.add_argument(
         "--database.redis_password",
         type=str,
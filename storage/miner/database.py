@@ -20,10 +20,226 @@ import os
 import json
 import time
 import bittensor as bt
-from typing import Optional, Dict, Any, Union, List
+from typing import Optional, Dict, Any, Union, List, Tuple
 from redis import asyncio as aioredis
+from redis.exceptions import WatchError
 from traceback import print_exception
 
+from .packfile import PACK_INDEX_KEY, decode_location
+from .codec import (
+    FLAG_PROOF,
+    METADATA_VERSION,
+    PROOF_SIZE,
+    SEED_LENGTH_OFFSET,
+    MetadataCodec,
+    clamp_ttl,
+    is_binary_metadata,
+    normalize_metadata,
+)
+
+
+# Redis hash holding the storage ledger: total and per validator hotkey byte and object counts, and the
+# bytes and number of distinct blobs on disk ("disk_bytes", "blobs"), which are shared between hotkeys
+STORAGE_LEDGER_KEY = "ledger:storage"
+
+# Set once the storage ledger has been rebuilt from the index by `reconcile_storage_ledger`. Until then
+# the ledger only holds the changes made since the miner was upgraded, and is not trusted.
+STORAGE_LEDGER_RECONCILED_KEY = "ledger:reconciled"
+
+# Sorted set of "<chunk hash>:<hotkey>" entries scored by the timestamp at which they expire,
+# so expired entries are found without scanning and decoding the whole index
+EXPIRY_INDEX_KEY = "expiry:index"
+
+# Set once every entry stored before the expiry index existed has been added to it
+EXPIRY_INDEXED_KEY = "expiry:indexed"
+
+# Sorted set of data hashes scored by their decayed number of challenges and retrieves, see
+# `storage.miner.tiering`
+ACCESS_INDEX_KEY = "tier:access"
+
+# Version of the schema every entry of the index is known to be in, set by `upgrade_schema`
+SCHEMA_VERSION_KEY = "schema:version"
+
+# Progress of a running schema upgrade: scan cursor, keys scanned and entries converted
+SCHEMA_UPGRADE_KEY = "schema:upgrade"
+
+# 1: pre 1.5.3 fields per chunk, 2: JSON entry per hotkey, 3: binary entry per hotkey
+SCHEMA_VERSION = 3
+
+# Encodes the per hotkey chunk metadata, shared by every function of this module
+metadata_codec = MetadataCodec()
+
+# Replaces the seed of a binary entry in place and drops its (now stale) proof, see `encode_metadata`.
+# Lua strings are 1-indexed, so byte i of the entry is string.byte(value, i + 1).
+_ROTATE_SEED_LUA = """
+local function rotate_seed(value, seed)
+    if string.byte(value, 1) ~= {version} then
+        return nil
+    end
+    local flags = string.byte(value, 2)
+    local seed_length = string.byte(value, {seed_length_offset} + 1) + 256 * string.byte(value, {seed_length_offset} + 2)
+    local tail_end = #value
+    if flags % 2 == {flag_proof} then
+        flags = flags - {flag_proof}
+        tail_end = tail_end - {proof_size}
+    end
+    return string.sub(value, 1, 1) .. string.char(flags)
+        .. string.sub(value, 3, {seed_length_offset})
+        .. string.char(#seed % 256, math.floor(#seed / 256)) .. seed
+        .. string.sub(value, {seed_length_offset} + 3 + seed_length, tail_end)
+end
+""".format(
+    version=METADATA_VERSION,
+    flag_proof=FLAG_PROOF,
+    proof_size=PROOF_SIZE,
+    seed_length_offset=SEED_LENGTH_OFFSET,
+)
+
+# KEYS: chunk hash. ARGV: hotkey, new seed.
+# Returns the entry as it was before the update, or nil if there is none.
+# JSON entries are returned untouched, the caller rewrites them through the codec.
+ROTATE_SEED_SCRIPT = _ROTATE_SEED_LUA + """
+local current = redis.call("HGET", KEYS[1], ARGV[1])
+if current then
+    local rotated = rotate_seed(current, ARGV[2])
+    if rotated then
+        redis.call("HSET", KEYS[1], ARGV[1], rotated)
+    end
+end
+return current
+"""
+
+# KEYS: chunk hash, storage ledger, expiry index. ARGV: hotkey, new seed, encoded new entry, size,
+# expiry index member, expiration timestamp.
+# Rotates the seed of an existing entry like ROTATE_SEED_SCRIPT, or stores the new entry, accounts
+# for it in the ledger and indexes its expiration. Returns the previous entry, or nil if the entry
+# was created.
+UPSERT_SCRIPT = _ROTATE_SEED_LUA + """
+local current = redis.call("HGET", KEYS[1], ARGV[1])
+if current then
+    local rotated = rotate_seed(current, ARGV[2])
+    if rotated then
+        redis.call("HSET", KEYS[1], ARGV[1], rotated)
+    end
+    return current
+end
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    redis.call("HINCRBY", KEYS[2], "disk_bytes", ARGV[4])
+    redis.call("HINCRBY", KEYS[2], "blobs", 1)
+end
+redis.call("HSET", KEYS[1], ARGV[1], ARGV[3])
+redis.call("HINCRBY", KEYS[2], "bytes", ARGV[4])
+redis.call("HINCRBY", KEYS[2], "bytes:" .. ARGV[1], ARGV[4])
+redis.call("HINCRBY", KEYS[2], "objects", 1)
+redis.call("HINCRBY", KEYS[2], "objects:" .. ARGV[1], 1)
+redis.call("ZADD", KEYS[3], ARGV[6], ARGV[5])
+return nil
+"""
+
+# Registered scripts, by source, reused for every client
+_scripts = {}
+
+
+async def run_script(r: "aioredis.StrictRedis", source: str, keys: List, args: List):
+    """
+    Runs a Lua script on the server with EVALSHA, loading it on first use.
+    """
+    if source not in _scripts:
+        _scripts[source] = r.register_script(source)
+    return await _scripts[source](keys=keys, args=args, client=r)
+
+
+def is_chunk_key(key: Union[str, bytes]) -> bool:
+    """
+    Returns whether a Redis key is a chunk metadata key (a decimal data hash), as opposed to
+    bookkeeping keys such as the storage ledger.
+    """
+    if isinstance(key, bytes):
+        key = key.decode("utf-8", errors="ignore")
+    return key.isdigit()
+
+
+def _queue_ledger_update(pipe, hotkey: str, bytes_delta: int, objects_delta: int):
+    """
+    Queues the storage ledger increments for one hotkey on a transaction pipeline.
+    """
+    if bytes_delta:
+        pipe.hincrby(STORAGE_LEDGER_KEY, "bytes", bytes_delta)
+        pipe.hincrby(STORAGE_LEDGER_KEY, f"bytes:{hotkey}", bytes_delta)
+    if objects_delta:
+        pipe.hincrby(STORAGE_LEDGER_KEY, "objects", objects_delta)
+        pipe.hincrby(STORAGE_LEDGER_KEY, f"objects:{hotkey}", objects_delta)
+
+
+def _queue_disk_update(pipe, bytes_delta: int, blobs_delta: int):
+    """
+    Queues the storage ledger increments for the blobs on disk on a transaction pipeline.
+    """
+    if bytes_delta:
+        pipe.hincrby(STORAGE_LEDGER_KEY, "disk_bytes", bytes_delta)
+    if blobs_delta:
+        pipe.hincrby(STORAGE_LEDGER_KEY, "blobs", blobs_delta)
+
+
+def expiry_member(chunk_hash: Union[str, bytes], hotkey: Union[str, bytes]) -> str:
+    """
+    Returns the member of the expiry index for the entry of a hotkey.
+    """
+    if isinstance(chunk_hash, bytes):
+        chunk_hash = chunk_hash.decode("utf-8")
+    if isinstance(hotkey, bytes):
+        hotkey = hotkey.decode("utf-8")
+    return f"{chunk_hash}:{hotkey}"
+
+
+def parse_expiry_member(member: Union[str, bytes]) -> Tuple[str, str]:
+    """
+    Returns the chunk hash and hotkey of an expiry index member.
+    """
+    if isinstance(member, bytes):
+        member = member.decode("utf-8")
+    chunk_hash, _, hotkey = member.partition(":")
+    return chunk_hash, hotkey
+
+
+def expiration_time(metadata: Dict[str, Any]) -> float:
+    """
+    Returns the timestamp at which a chunk entry expires, `ttl` seconds after it was generated.
+    """
+    return float(metadata["generated"]) + int(metadata["ttl"])
+
+
+def parse_storage_ledger(raw: Dict[bytes, bytes]) -> Dict[str, Any]:
+    """
+    Parses the raw storage ledger hash into a dictionary.
+
+    Args:
+        raw (dict): The result of `hgetall` on the storage ledger key.
+
+    Returns:
+        dict: The total "bytes" and "objects", the "disk_bytes" and "blobs" on disk, and a "hotkeys"
+              dictionary mapping each validator hotkey to its own "bytes" and "objects" counts.
+    """
+    ledger = {"bytes": 0, "objects": 0, "disk_bytes": 0, "blobs": 0, "hotkeys": {}}
+    for field, value in raw.items():
+        field = field.decode("utf-8") if isinstance(field, bytes) else field
+        counter, _, hotkey = field.partition(":")
+        if counter not in ledger or counter == "hotkeys":
+            continue
+        if hotkey:
+            ledger["hotkeys"].setdefault(hotkey, {"bytes": 0, "objects": 0})
+            ledger["hotkeys"][hotkey][counter] = int(value)
+        else:
+            ledger[counter] = int(value)
+    return ledger
+
+
+async def get_storage_ledger(r: "aioredis.Strictredis") -> Dict[str, Any]:
+    """
+    Retrieves the storage ledger, see `parse_storage_ledger` for the format.
+    """
+    return parse_storage_ledger(await r.hgetall(STORAGE_LEDGER_KEY))
+
 
 async def store_chunk_metadata(
     r: "aioredis.Strictredis",
@@ -45,21 +261,247 @@ async def store_chunk_metadata(
         seed (str): The seed associated with the chunk.
         ttl (int, optional): The time-to-live for the chunk. Defaults to 30 days.
 
-    This function stores the filepath, size (as a string), seed, and ttl for the given chunk hash.
+    This function stores the filepath, size, seed, and ttl for the given chunk hash.
     """
 
     # Ensure that all data are in the correct format
     metadata = {
         "filepath": filepath,
-        "size": str(size),  # Convert size to string
+        "size": int(size),
         "seed": seed,  # Store seed directly
-        "ttl": ttl or 60 * 60 * 24 * 30,  # Default to 30 days if not provided
+        "ttl": clamp_ttl(ttl),  # Default to 30 days if not provided
         "generated": time.time(),
     }
-    metadata_str = json.dumps(metadata)
+    encoded = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
 
-    # Use hmset (or hset which is its modern equivalent) to store the metadata dict
-    await r.hset(chunk_hash, hotkey, metadata_str)
+    # Store the metadata dict and account for it in the storage ledger in one transaction
+    async with r.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(chunk_hash)
+                new_blob = not await pipe.exists(chunk_hash)
+                previous = await pipe.hget(chunk_hash, hotkey)
+                if previous is None:
+                    bytes_delta, objects_delta = int(size), 1
+                else:
+                    previous = await metadata_codec.loads(r, chunk_hash, hotkey, previous)
+                    previous_size = previous["size"]
+                    bytes_delta, objects_delta = int(size) - previous_size, 0
+                pipe.multi()
+                pipe.hset(chunk_hash, hotkey, encoded)
+                pipe.zadd(
+                    EXPIRY_INDEX_KEY,
+                    {expiry_member(chunk_hash, hotkey): expiration_time(metadata)},
+                )
+                _queue_ledger_update(pipe, hotkey, bytes_delta, objects_delta)
+                if new_blob:
+                    _queue_disk_update(pipe, int(size), 1)
+                await pipe.execute()
+                break
+            except WatchError:
+                continue
+
+
+async def delete_chunk_metadata(
+    r: "aioredis.Strictredis", chunk_hash: str, hotkey: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Deletes the metadata of a chunk for one hotkey and removes it from the storage ledger and the
+    expiry index. When this was the last hotkey referencing the chunk, its blob is removed from the
+    ledger as well.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        chunk_hash (str): The unique hash identifying the chunk.
+        hotkey (str): The hotkey whose entry is deleted.
+
+    Returns:
+        dict: The deleted metadata, or None if there was no entry for this hotkey.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(chunk_hash)
+                metadata = await pipe.hget(chunk_hash, hotkey)
+                if metadata is None:
+                    return None
+                metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata)
+                last_reference = await pipe.hlen(chunk_hash) == 1
+                pipe.multi()
+                pipe.hdel(chunk_hash, hotkey)
+                pipe.zrem(EXPIRY_INDEX_KEY, expiry_member(chunk_hash, hotkey))
+                _queue_ledger_update(pipe, hotkey, -metadata["size"], -1)
+                if last_reference:
+                    _queue_disk_update(pipe, -metadata["size"], -1)
+                await pipe.execute()
+                return metadata
+            except WatchError:
+                continue
+
+
+async def _correct_entry(
+    r: "aioredis.StrictRedis", chunk_hash, hotkey: str, raw: bytes, metadata: Dict[str, Any]
+):
+    """
+    Rewrites the entry of a hotkey with `metadata`, unless it changed since it was read as `raw`.
+    """
+    encoded = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
+    async with r.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(chunk_hash)
+            if await pipe.hget(chunk_hash, hotkey) != raw:
+                return
+            pipe.multi()
+            pipe.hset(chunk_hash, hotkey, encoded)
+            await pipe.execute()
+        except WatchError:
+            # Updated concurrently, the new entry carries its own size
+            pass
+
+
+async def reconcile_storage_ledger(r: "aioredis.Strictredis") -> Dict[str, Any]:
+    """
+    Rebuilds the storage ledger from the chunk index and the files on disk, and marks it as
+    reconciled so it is trusted from then on.
+
+    Every (chunk, hotkey) entry whose file, or packfile range, exists is counted with its size on
+    disk, and the metadata size is corrected when it disagrees. Blobs referenced by several entries
+    are counted once in the blobs on disk. This walks the whole keyspace and stats every file.
+    It runs once in the background on the first start of a miner, see `bootstrap_storage_ledger`,
+    and can be run again with `scripts/reconcile_storage_ledger.py`. Entries stored or deleted while
+    the walk runs may leave a small drift, which the next reconcile corrects.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+
+    Returns:
+        dict: The rebuilt ledger, see `parse_storage_ledger` for the format.
+    """
+    counters = {"bytes": 0, "objects": 0, "disk_bytes": 0, "blobs": 0}
+    counted_files = set()
+    async for key in r.scan_iter("*"):
+        if not is_chunk_key(key):
+            continue
+        try:
+            entries = await r.hgetall(key)
+            packed = await r.hget(PACK_INDEX_KEY, key)
+        except Exception as e:
+            bt.logging.error(f"Could not read metadata for {key}: {e}")
+            continue
+        for hotkey, raw in entries.items():
+            try:
+                hotkey = hotkey.decode("utf-8")
+                metadata = await metadata_codec.loads(r, key, hotkey, raw)
+                filepath = os.path.expanduser(metadata.get("filepath") or "")
+                if os.path.isfile(filepath):
+                    size = os.path.getsize(filepath)
+                elif packed is not None:
+                    size = decode_location(packed)[2]
+                    filepath = f"{PACK_INDEX_KEY}:{key.decode('utf-8')}"
+                else:
+                    bt.logging.trace(f"No file for {key} and hotkey {hotkey}")
+                    continue
+            except Exception:
+                # Legacy flat entries are skipped, convert them first
+                continue
+            if filepath not in counted_files:
+                counted_files.add(filepath)
+                counters["disk_bytes"] += size
+                counters["blobs"] += 1
+            if metadata["size"] != size:
+                metadata["size"] = size
+                await _correct_entry(r, key, hotkey, raw, metadata)
+            for counter, value in (("bytes", size), ("objects", 1)):
+                counters[counter] += value
+                counters[f"{counter}:{hotkey}"] = (
+                    counters.get(f"{counter}:{hotkey}", 0) + value
+                )
+
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.delete(STORAGE_LEDGER_KEY)
+        pipe.hset(STORAGE_LEDGER_KEY, mapping=counters)
+        pipe.set(STORAGE_LEDGER_RECONCILED_KEY, int(time.time()))
+        await pipe.execute()
+
+    return parse_storage_ledger(counters)
+
+
+async def bootstrap_storage_ledger(r: "aioredis.StrictRedis") -> Optional[Dict[str, Any]]:
+    """
+    Background task building the storage ledger on the first start of a miner which stored data
+    before the ledger existed. The ledger is only incremented by stores and deletes, so until it is
+    rebuilt from the index it misses everything stored earlier.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+
+    Returns:
+        dict: The rebuilt ledger, or None if it had already been reconciled.
+    """
+    if await r.exists(STORAGE_LEDGER_RECONCILED_KEY):
+        return None
+    bt.logging.info("Building the storage ledger from the index and the data on disk...")
+    ledger = await reconcile_storage_ledger(r)
+    bt.logging.success(
+        f"Storage ledger built: {ledger['objects']} objects, {ledger['blobs']} blobs taking "
+        f"{ledger['disk_bytes']} bytes on disk"
+    )
+    return ledger
+
+
+async def get_expired_chunks(
+    r: "aioredis.Strictredis", now: Optional[float] = None, count: int = 1000
+) -> List[Tuple[str, str]]:
+    """
+    Returns up to `count` chunk entries whose expiration time has passed, oldest first.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        now (float, optional): The current timestamp. Defaults to the current time.
+        count (int): The maximum number of entries returned.
+
+    Returns:
+        list: (chunk hash, hotkey) pairs of the expired entries.
+    """
+    members = await r.zrangebyscore(
+        EXPIRY_INDEX_KEY, "-inf", now or time.time(), start=0, num=count
+    )
+    return [parse_expiry_member(member) for member in members]
+
+
+async def index_chunk_expiry(r: "aioredis.Strictredis", batch_size: int = 1000) -> int:
+    """
+    Adds every chunk entry stored before the expiry index existed to it. This walks the whole
+    keyspace once, after which the marker key is set and later calls return immediately.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        batch_size (int): The number of chunk keys indexed per round trip.
+
+    Returns:
+        int: The number of entries added to the index.
+    """
+    if await r.exists(EXPIRY_INDEXED_KEY):
+        return 0
+
+    added = 0
+    expirations = {}
+    async for key in r.scan_iter("*", count=batch_size):
+        if not is_chunk_key(key):
+            continue
+        for hotkey, raw in (await r.hgetall(key)).items():
+            try:
+                metadata = await metadata_codec.loads(r, key, hotkey, raw)
+                expirations[expiry_member(key, hotkey)] = expiration_time(metadata)
+            except Exception as e:
+                bt.logging.trace(f"Could not index the expiration of {key}: {e}")
+        if len(expirations) >= batch_size:
+            added += await r.zadd(EXPIRY_INDEX_KEY, expirations, nx=True)
+            expirations = {}
+    if expirations:
+        added += await r.zadd(EXPIRY_INDEX_KEY, expirations, nx=True)
+    await r.set(EXPIRY_INDEXED_KEY, int(time.time()))
+    return added
 
 
 async def convert_to_new_format(
@@ -85,15 +527,20 @@ async def convert_to_new_format(
         bt.logging.trace(f"Key not found in metadata {old_md}. New format.")
         return
     new_md = {k.decode("utf-8"): v.decode("utf-8") for k, v in old_md.items()}
+    await r.delete(chunk_hash)
     if hotkey is not None:
         if hotkey != old_hotkey:
             # Save both separately for safety/reverse compatibility
-            await r.hset(chunk_hash, old_hotkey, json.dumps(new_md))
+            await r.hset(
+                chunk_hash,
+                old_hotkey,
+                await metadata_codec.dumps(r, chunk_hash, old_hotkey, new_md),
+            )
     else:
         hotkey = old_hotkey
-    new_md = json.dumps(new_md)
-    await r.delete(chunk_hash)
-    await r.hset(chunk_hash, hotkey, new_md)
+    await r.hset(
+        chunk_hash, hotkey, await metadata_codec.dumps(r, chunk_hash, hotkey, new_md)
+    )
 
 
 async def store_or_update_chunk_metadata(
@@ -116,18 +563,69 @@ async def store_or_update_chunk_metadata(
         seed (str): The seed associated with the chunk.
         ttl (int, optional): The time-to-live for the chunk. Defaults to 30 days.
 
-    This function checks if the chunk hash already exists in the database. If it does,
-    it updates the existing entry with the new seed information. If not, it stores the new metadata.
+    This function stores the metadata if there is no entry for this hotkey yet, or else updates the seed of the
+    existing entry, in a single round trip to the server. The expiration of an existing entry is unchanged.
+
+    Entries in the pre 1.5.3 format are not converted here, run `scripts/redis/schema_migration/01_migrate.py`.
+    """
+    metadata = {
+        "filepath": filepath,
+        "size": int(size),
+        "seed": seed,
+        "ttl": clamp_ttl(ttl),
+        "generated": time.time(),
+    }
+    encoded = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
+    previous = await run_script(
+        r,
+        UPSERT_SCRIPT,
+        keys=[chunk_hash, STORAGE_LEDGER_KEY, EXPIRY_INDEX_KEY],
+        args=[
+            hotkey,
+            str(seed),
+            encoded,
+            int(size),
+            expiry_member(chunk_hash, hotkey),
+            expiration_time(metadata),
+        ],
+    )
+    if previous is not None and metadata_codec.legacy and not is_binary_metadata(previous):
+        # JSON entry, rewrite it through the codec
+        await update_seed_info(r, chunk_hash, hotkey, seed)
+
+
+async def rotate_chunk_seed(
+    r: "aioredis.Strictredis", chunk_hash: str, hotkey: str, seed: str
+) -> Optional[Dict[str, Any]]:
     """
-    if await r.exists(chunk_hash):
-        if not await r.hget(chunk_hash, hotkey):
-            # It exists in old format only, convert to new format and delete old key
-            await convert_to_new_format(r, chunk_hash)
-        # Update the existing entry with new seed information
+    Replaces the seed of a chunk and returns its metadata from before the update, in one round trip.
+
+    This is `get_chunk_metadata` followed by `update_seed_info`, executed atomically on the server.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        chunk_hash (str): The unique hash identifying the chunk.
+        hotkey (str): The caller hotkey value to be updated.
+        seed (str): The new seed value.
+
+    Returns:
+        dict: The previous metadata, including the previous seed and its precomputed proof if any,
+              or None if there is no entry for this hotkey.
+    """
+    previous = await run_script(
+        r, ROTATE_SEED_SCRIPT, keys=[chunk_hash], args=[hotkey, str(seed)]
+    )
+    if previous is None:
+        return None
+    try:
+        metadata = await metadata_codec.loads(r, chunk_hash, hotkey, previous)
+    except Exception as e:
+        bt.logging.error(f"Error decoding metadata for {chunk_hash}: {e}")
+        return None
+    if metadata_codec.legacy and not is_binary_metadata(previous):
+        # JSON entry, rewrite it through the codec
         await update_seed_info(r, chunk_hash, hotkey, seed)
-    else:
-        # Add new entry in new format
-        await store_chunk_metadata(r, chunk_hash, filepath, hotkey, size, seed, ttl)
+    return metadata
 
 
 async def update_seed_info(
@@ -145,9 +643,6 @@ async def update_seed_info(
     This function updates the seed information for the specified chunk hash.
     """
     try:
-        # Check if we are legacy and convert if necessary
-        if await is_old_version(r, chunk_hash, hotkey):
-            await convert_to_new_format(r, chunk_hash, hotkey)
         # Grab the meta dict
         metadata = await r.hget(chunk_hash, hotkey)
         # Store the metadata if it does not exist for some reason
@@ -161,17 +656,91 @@ async def update_seed_info(
             }
         else:
             # Convert to dict
-            metadata = json.loads(metadata)
-        # Update the seed value
+            metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata)
+        # Update the seed value, a proof computed for the previous seed is now stale
         metadata["seed"] = seed
-        # Convert back to string
-        metadata = json.dumps(metadata)
+        metadata.pop("proof", None)
+        # Encode it again, which also migrates JSON entries to the binary format
+        metadata = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
         # Store the updated metadata
         await r.hset(chunk_hash, hotkey, metadata)
     except BaseException as e:
         print_exception(e)
 
 
+async def update_proof_info(
+    r: "aioredis.Strictredis", chunk_hash: str, hotkey: str, seed: str, proof: int
+) -> bool:
+    """
+    Stores a precomputed storage proof, hash(data + seed), alongside the chunk metadata.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        chunk_hash (str): The unique hash identifying the chunk.
+        hotkey (str): The caller hotkey the proof belongs to.
+        seed (str): The seed the proof was computed with.
+        proof (int): The proof value, as returned by `hash_data`.
+
+    Returns:
+        bool: True if the proof was stored, False if the seed changed in the meantime.
+
+    The metadata is watched while it is updated, so a proof is never stored next to a seed
+    that a concurrent challenge or retrieve has already replaced.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        try:
+            await pipe.watch(chunk_hash)
+            metadata = await pipe.hget(chunk_hash, hotkey)
+            if metadata is None:
+                return False
+            metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata)
+            if metadata.get("seed") != seed:
+                return False
+            metadata["proof"] = proof
+            encoded = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
+            pipe.multi()
+            pipe.hset(chunk_hash, hotkey, encoded)
+            await pipe.execute()
+        except WatchError:
+            return False
+    return True
+
+
+async def update_chunk_filepath(
+    r: "aioredis.Strictredis", chunk_hash: str, hotkey: str, filepath: str
+) -> bool:
+    """
+    Points the metadata of a chunk at a new filepath, e.g. after its file was moved.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        chunk_hash (str): The unique hash identifying the chunk.
+        hotkey (str): The hotkey whose entry is updated.
+        filepath (str): The new filepath.
+
+    Returns:
+        bool: True if the entry was updated, False if there is no entry for this hotkey.
+
+    The entry is watched while it is rewritten, so a concurrent seed update is never lost.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(chunk_hash)
+                metadata = await pipe.hget(chunk_hash, hotkey)
+                if metadata is None:
+                    return False
+                metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata)
+                metadata["filepath"] = filepath
+                encoded = await metadata_codec.dumps(r, chunk_hash, hotkey, metadata)
+                pipe.multi()
+                pipe.hset(chunk_hash, hotkey, encoded)
+                await pipe.execute()
+                return True
+            except WatchError:
+                continue
+
+
 async def is_old_version(
     r: "aioredis.Strictredis", chunk_hash: str, hotkey: str = None
 ) -> bool:
@@ -195,25 +764,18 @@ async def get_chunk_metadata(
     Args:
         r (redis.Redis): The Redis connection instance.
         chunk_hash (str): The unique hash identifying the chunk.
+        hotkey (str): The hotkey associated with the chunk.
 
     Returns:
         dict: A dictionary containing the chunk's metadata, including filepath, size, and seed.
               Size is converted to an integer, and seed is decoded from bytes to a string.
     """
 
-    # Legacy support for old format (convert to new format if necessary)
-    if await r.hgetall(chunk_hash) and not await r.hget(chunk_hash, hotkey):
-        await convert_to_new_format(r, chunk_hash, hotkey)
-
     metadata = await r.hget(chunk_hash, hotkey)
     if metadata:
-        # New key structure as of 1.5.3
+        # New key structure as of 1.5.3, binary or JSON encoded
         try:
-            metadata = json.loads(metadata)
-            metadata["size"] = int(metadata.get("size", 0))
-            metadata["ttl"] = int(metadata.get("ttl", 60 * 60 * 24 * 30))
-            metadata["seed"] = metadata.get("seed", "")
-            metadata["generated"] = float(metadata.get("generated", 0))
+            metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata)
         except json.JSONDecodeError as e:
             bt.logging.error(f"Error decoding metadata for {chunk_hash}: {e}")
             metadata = None
@@ -221,15 +783,8 @@ async def get_chunk_metadata(
             bt.logging.error(f"Error getting metadata for {chunk_hash}: {e}")
             metadata = None
     else:
-        # attempt to fetch via old key structure for reverse compatibility < 1.5.3
-        metadata = await r.hgetall(chunk_hash)
-        if metadata:
-            try:
-                metadata = {k.decode("utf-8"): v.decode("utf-8") for k, v in metadata.items()}
-                metadata["size"] = int(metadata.get("size", 0))
-            except Exception as e:
-                bt.logging.error(f"Error getting metadata for {chunk_hash}: {e}")
-                metadata = None
+        # Entries in the pre 1.5.3 format are converted by scripts/redis/schema_migration/01_migrate.py
+        metadata = None
     return metadata
 
 
@@ -264,6 +819,8 @@ async def safe_remove_all_old_keys(r):
         r (redis.Redis): The Redis connection instance.
     """
     async for key in r.scan_iter("*"):
+        if not is_chunk_key(key):
+            continue
         try:
             await safe_remove_old_keys(r, key)
         except Exception as e:
@@ -277,39 +834,138 @@ async def convert_all_to_hotkey_format(r: "aioredis.Strictredis"):
     Args:
         r (redis.Redis): The Redis connection instance.
     """
-    async for key in r.scan_iter("*"):
-        try:
-            if await is_old_version(r, key):
-                await convert_to_new_format(r, key)
-        except Exception as e:
-            bt.logging.error(f"Error converting {key} with error: {e}")
+    await upgrade_schema(r)
 
 
-async def get_total_storage_used(r: "aioredis.Strictredis") -> int:
+async def get_schema_version(r: "aioredis.Strictredis") -> int:
     """
-    Calculates the total storage used by all chunks in the Redis database.
+    Returns the schema version recorded in the index, and turns the legacy format checks of the
+    metadata codec off when every entry is known to be up to date.
+    """
+    version = int(await r.get(SCHEMA_VERSION_KEY) or 0)
+    metadata_codec.legacy = version < SCHEMA_VERSION
+    return version
+
+
+async def _rewrite_legacy_entries(r: "aioredis.Strictredis", chunk_hash) -> int:
+    """
+    Rewrites the JSON entries of a chunk in the binary format, watching the chunk so a concurrent
+    seed update is never lost.
+
+    Returns:
+        int: The number of entries rewritten.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(chunk_hash)
+                rewritten = {}
+                for hotkey, raw in (await pipe.hgetall(chunk_hash)).items():
+                    if is_binary_metadata(raw):
+                        continue
+                    metadata = normalize_metadata(json.loads(raw))
+                    rewritten[hotkey] = await metadata_codec.dumps(
+                        r, chunk_hash, hotkey, metadata
+                    )
+                if not rewritten:
+                    await pipe.reset()
+                    return 0
+                pipe.multi()
+                pipe.hset(chunk_hash, mapping=rewritten)
+                await pipe.execute()
+                return len(rewritten)
+            except WatchError:
+                continue
+
+
+async def upgrade_schema(r: "aioredis.Strictredis", batch_size: int = 1000) -> int:
+    """
+    Background upgrade of every entry of the index to the current schema: chunks still in the pre
+    1.5.3 format get an entry per hotkey, and JSON entries are rewritten in the binary format.
+
+    The keyspace is walked in batches of `batch_size` keys, each read in one pipelined round trip,
+    and the progress is checkpointed in Redis so an interrupted upgrade resumes where it stopped.
+    Once the walk completes, the schema version is recorded and the legacy format checks of the
+    hot path are turned off, here and at every later start.
 
     Args:
         r (redis.Redis): The Redis connection instance.
+        batch_size (int): The number of keys scanned per round trip.
 
     Returns:
-        int: The total size of all chunks stored in the database.
+        int: The number of entries converted by this call.
     """
-    total_size = 0
-    async for key in r.scan_iter("*"):
-        try:
-            if await is_old_version(r, key):
-                size = await r.hget(key, b"size")
-            else:
-                metadata_dict = await r.hgetall(key)
-                first_key = list(metadata_dict)[0]
-                metadata = json.loads(metadata_dict[first_key])
-                size = metadata.get("size", 0)
-        except Exception as e:
-            size = 0
-        if size:
-            total_size += int(size)
-    return total_size
+    if await get_schema_version(r) >= SCHEMA_VERSION:
+        return 0
+
+    progress = {
+        key.decode("utf-8"): int(value)
+        for key, value in (await r.hgetall(SCHEMA_UPGRADE_KEY)).items()
+    }
+    cursor = progress.get("cursor", 0)
+    scanned = progress.get("scanned", 0)
+    converted = progress.get("converted", 0)
+    total = await r.dbsize()
+    bt.logging.info(f"Upgrading the index to schema version {SCHEMA_VERSION}")
+
+    converted_now = 0
+    while True:
+        cursor, keys = await r.scan(cursor, count=batch_size)
+        keys = [key for key in keys if is_chunk_key(key)]
+        async with r.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.hgetall(key)
+            results = await pipe.execute()
+        for key, fields in zip(keys, results):
+            try:
+                if b"hotkey" in fields:
+                    await convert_to_new_format(r, key)
+                    converted_now += 1
+                elif any(not is_binary_metadata(raw) for raw in fields.values()):
+                    converted_now += await _rewrite_legacy_entries(r, key)
+            except Exception as e:
+                bt.logging.error(f"Error converting {key} with error: {e}")
+        scanned += len(keys)
+        await r.hset(
+            SCHEMA_UPGRADE_KEY,
+            mapping={
+                "cursor": cursor,
+                "scanned": scanned,
+                "converted": converted + converted_now,
+            },
+        )
+        bt.logging.debug(
+            f"Schema upgrade: {scanned} of ~{total} keys scanned, "
+            f"{converted + converted_now} entries converted"
+        )
+        if cursor == 0:
+            break
+
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.set(SCHEMA_VERSION_KEY, SCHEMA_VERSION)
+        pipe.delete(SCHEMA_UPGRADE_KEY)
+        await pipe.execute()
+    metadata_codec.legacy = False
+    bt.logging.success(
+        f"Schema upgrade complete: {scanned} keys scanned, {converted + converted_now} entries converted"
+    )
+    return converted_now
+
+
+async def get_total_storage_used(r: "aioredis.Strictredis") -> Optional[int]:
+    """
+    Returns the total storage used by all chunks, as recorded in the storage ledger.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+
+    Returns:
+        int: The total size on disk of all chunks stored in the database, counting blobs shared
+             between hotkeys once, or None if the ledger has not been reconciled yet.
+    """
+    if not await r.exists(STORAGE_LEDGER_RECONCILED_KEY):
+        return None
+    return (await get_storage_ledger(r))["disk_bytes"]
 
 
 async def get_filepath(r: "aioredis.StrictRedis", chunk_hash: str, hotkey: str) -> str:
@@ -328,80 +984,7 @@ async def get_filepath(r: "aioredis.StrictRedis", chunk_hash: str, hotkey: str)
     filepath = ""
     metadata_str = await r.hget(chunk_hash, hotkey)
     if metadata_str is not None:
-        metadata = json.loads(metadata_str)
+        metadata = await metadata_codec.loads(r, chunk_hash, hotkey, metadata_str)
         filepath = metadata.get("filepath")
     return filepath
 
-
-async def migrate_data_directory(
-    r: "aioredis.Strictredis", new_base_directory: str, return_failures: bool = False
-) -> Optional[List[str]]:
-    try:
-        async for key in r.scan_iter("*"):
-            if await is_old_version(key):
-                filepath = await r.hget(key, b"filepath")
-                filepath = filepath.decode("utf-8")
-            else:
-                hotkey = (await r.hkeys(key))[0]
-                metadata = json.loads(await r.hget(key, hotkey))
-                filepath = metadata.get("filepath")
-            old_base_directory = os.path.dirname(filepath)
-            break
-    except Exception as e:
-        bt.logging.error(f"Error getting old base directory: {e}")
-        return
-
-    new_base_directory = os.path.expanduser(new_base_directory)
-    bt.logging.info(
-        f"Migrating filepaths for all hashes in Redis index from old base {old_base_directory} to new {new_base_directory}"
-    )
-
-    if not os.path.exists(new_base_directory):
-        bt.logging.info(
-            f"New base directory {new_base_directory} does not exist. Creating..."
-        )
-        os.makedirs(new_base_directory)
-
-    failed_filepaths = []
-    async for key in r.scan_iter("*"):
-        # In case we still have laggards, convert to the new format
-        if await is_old_version(key):
-            await convert_to_new_format(r, key)
-
-        async for hotkey in await r.hkeys(key):
-            metadata = json.loads(await r.hget(key, hotkey))
-            filepath = metadata.get("filepath")
-
-            if filepath:
-                data_hash = key.decode("utf-8")
-                new_filepath = os.path.join(new_base_directory, data_hash)
-
-                if not os.path.isfile(new_filepath):
-                    bt.logging.trace(
-                        f"Data does not exist in new path {new_filepath}. Skipping..."
-                    )
-                    if (
-                        new_filepath not in failed_filepaths
-                    ):  # don't double add filepaths for different hotkeys
-                        failed_filepaths.append(new_filepath)
-                    continue
-
-                # update metadata and restore as hash key
-                metadata["filepath"] = new_filepath
-                await r.hset(key, hotkey, json.dumps(metadata))
-
-    if len(failed_filepaths):
-        if not os.path.exists("migration_log"):
-            os.makedirs("migration_log")
-        with open("migration_log/failed_filepaths.json", "w") as f:
-            json.dump(failed_filepaths, f)
-        bt.logging.error(
-            f"Failed to migrate {len(failed_filepaths)} files. These were skipped and may need to be migrated manually."
-        )
-        bt.logging.error(
-            f"Please see {os.path.abspath('logs/failed_migration_filepaths.json')} for a complete list of failed filepaths."
-        )
-    else:
-        bt.logging.success("Successfully migrated all filepaths.")
-
-    return failed_filepaths if return_failures else None
@@ -0,0 +1,220 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import errno
+import random
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+
+# Subdirectory of every data root holding the content addressed blobs, see `storage.miner.blobstore`
+BLOB_DIRECTORY = "blobs"
+
+
+class DataRoot:
+    """
+    A data directory on one of the miner's disks, with its last measured free space.
+
+    Attributes:
+        directory (str): The data directory.
+        blob_directory (str): The directory holding the blobs placed on this root.
+        device (int): The id of the filesystem holding the directory.
+        total_bytes (int): The size of the filesystem.
+        free_bytes (int): The free space of the filesystem, less the blobs written since it was measured.
+        pending (int): The number of blob writes in flight.
+        placed (int): The number of blobs placed on this root.
+        fast (bool): Whether the root is on the fast tier (SSD) holding the hot blobs.
+    """
+
+    def __init__(self, directory: str, fast: bool = False):
+        self.fast = fast
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.blob_directory = os.path.join(self.directory, BLOB_DIRECTORY)
+        os.makedirs(self.blob_directory, exist_ok=True)
+        self.device = os.stat(self.directory).st_dev
+        self.total_bytes = 0
+        self.free_bytes = 0
+        self.pending = 0
+        self.placed = 0
+        self.measure()
+
+    def measure(self):
+        total, _, free = shutil.disk_usage(self.directory)
+        self.total_bytes, self.free_bytes = total, free
+
+    def contains(self, filepath: str) -> bool:
+        """
+        Returns whether a path is under this data root.
+        """
+        filepath = os.path.abspath(os.path.expanduser(filepath))
+        return filepath.startswith(self.directory + os.sep)
+
+
+class DiskSet:
+    """
+    The data roots of a miner spread over several disks (JBOD), and the placement of new blobs.
+
+    Each new blob goes to a root picked at random with a probability proportional to the free space
+    of its disk, beyond the `min_free_bytes` kept free, divided by the number of writes already in
+    flight to it. Disks fill up evenly, and a slow or busy disk gets fewer writes, so the miner
+    gets the aggregate capacity and bandwidth of its disks without RAID. Reads never depend on the
+    placement: the path of a blob is recorded in its metadata.
+
+    Free space is measured every `refresh_interval` seconds and decremented by the size of the
+    blobs placed in between. The set is thread safe.
+
+    Roots in `fast_directories` form a fast tier: new blobs are placed there while it has room, and
+    `storage.miner.tiering` moves the blobs between the tiers as they get hot or cold.
+
+    Attributes:
+        roots (list): The data roots, the first being the primary one holding the packfiles and
+                      the blobs of the legacy layouts.
+        min_free_bytes (int): The free space kept on every disk.
+        refresh_interval (float): Seconds between measurements of the free space.
+    """
+
+    def __init__(
+        self,
+        directories: List[str],
+        min_free_bytes: int = 0,
+        refresh_interval: float = 10.0,
+        fast_directories: List[str] = (),
+    ):
+        if not directories:
+            raise ValueError("At least one data directory is required")
+        self.roots = []
+        for directory, fast in [(d, False) for d in directories] + [
+            (d, True) for d in fast_directories
+        ]:
+            root = DataRoot(directory, fast)
+            if all(root.directory != other.directory for other in self.roots):
+                self.roots.append(root)
+        self.min_free_bytes = min_free_bytes
+        self.refresh_interval = refresh_interval
+        self._measured = time.monotonic()
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self) -> DataRoot:
+        return self.roots[0]
+
+    @property
+    def tiered(self) -> bool:
+        """
+        Whether the roots are split between a fast and a bulk tier.
+        """
+        return len({root.fast for root in self.roots}) == 2
+
+    def tier(self, fast: bool) -> List[DataRoot]:
+        return [root for root in self.roots if root.fast == fast]
+
+    def refresh(self, force: bool = False):
+        """
+        Measures the free space of the disks, if it was last measured `refresh_interval` ago.
+        """
+        now = time.monotonic()
+        if not force and now - self._measured < self.refresh_interval:
+            return
+        self._measured = now
+        for root in self.roots:
+            try:
+                root.measure()
+            except OSError:
+                # Unmounted or failed disk, never place blobs on it until it is back
+                root.free_bytes = 0
+
+    def root_of(self, filepath: str) -> Optional[DataRoot]:
+        """
+        Returns the data root holding a path, or None if it is outside all of them.
+        """
+        return next((root for root in self.roots if root.contains(filepath)), None)
+
+    def choose(self, size: int, fast: Optional[bool] = True, fallback: bool = True) -> DataRoot:
+        """
+        Picks the data root a new blob of `size` bytes is placed on.
+
+        Args:
+            size (int): The size of the blob.
+            fast (bool, optional): The tier to place the blob on, None for any.
+            fallback (bool): Whether to place the blob on the other tier when this one is full.
+
+        Raises:
+            OSError: If no disk has room for the blob.
+        """
+        with self._lock:
+            self.refresh()
+            candidates = self.roots
+            if fast is not None and self.tiered:
+                candidates = self.tier(fast)
+            for roots in (candidates, self.roots if fallback else []):
+                weights = [
+                    max(0, root.free_bytes - self.min_free_bytes - size) / (1 + root.pending)
+                    for root in roots
+                ]
+                if any(weights):
+                    return random.choices(roots, weights)[0]
+            raise OSError(errno.ENOSPC, f"No data directory has {size} bytes free")
+
+    @contextmanager
+    def writing(self, root: DataRoot, size: int):
+        """
+        Accounts for a blob of `size` bytes being written to a data root.
+        """
+        with self._lock:
+            root.pending += 1
+        try:
+            yield root
+        finally:
+            with self._lock:
+                root.pending -= 1
+                root.placed += 1
+                root.free_bytes -= size
+
+    def usage(self) -> Dict[str, int]:
+        """
+        Returns the total and free space of the disks, counting disks shared by roots once.
+        """
+        with self._lock:
+            self.refresh()
+            disks = {root.device: root for root in self.roots}
+            return {
+                "total_bytes": sum(root.total_bytes for root in disks.values()),
+                "free_bytes": sum(root.free_bytes for root in disks.values()),
+            }
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Returns the directory, total and free space, writes in flight and blobs placed of every root.
+        """
+        with self._lock:
+            return [
+                {
+                    "directory": root.directory,
+                    "total_bytes": root.total_bytes,
+                    "free_bytes": root.free_bytes,
+                    "pending": root.pending,
+                    "placed": root.placed,
+                    "fast": root.fast,
+                }
+                for root in self.roots
+            ]
@@ -0,0 +1,288 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import json
+import time
+import bisect
+import threading
+import bittensor as bt
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+from redis import asyncio as aioredis
+
+from .blobio import write_file_atomic
+
+
+# Upper bounds in seconds of the latency histogram buckets, from 1ms to 1 minute
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+# Content type of the Prometheus text exposition format
+EXPOSITION_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _label_key(labels: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: Tuple[Tuple[str, str], ...], **extra) -> str:
+    pairs = list(key) + [(name, str(value)) for name, value in extra.items()]
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class Histogram:
+    """
+    Cumulative histogram of observed values, such as latencies, over fixed bucket bounds.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets, in increasing order.
+        counts (list): The number of observations per bucket, the last one past every bound.
+        sum (float): The sum of the observed values.
+        count (int): The number of observations.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile of the observed values, as the upper bound of the bucket holding it.
+        """
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms describing the work of the miner, keyed by name and labels.
+
+    Handlers time their phases with `time`, e.g. the Redis lookup, disk read, hashing, commitment,
+    Merkle tree and encoding of a challenge, so the latency of each phase can be told apart under
+    real load. Gauges of state owned by other components, such as queue depths, cache hit rates
+    and disk usage, are registered as callbacks read on every collection.
+
+    The registry is rendered in the Prometheus text exposition format by `render`, for the
+    `MetricsServer` endpoint, and as a JSON friendly dict by `snapshot`. It is thread safe.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}  # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: Histogram}
+        self._gauges = {}  # name -> callback returning a value or a {label key: value} dict
+        self._help = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, help: str):
+        self._help[name] = help
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """
+        Increments a counter.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """
+        Adds an observation to a histogram.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(self.buckets)
+            series[key].observe(value)
+
+    @contextmanager
+    def time(self, name: str, **labels):
+        """
+        Observes the seconds spent in the block in a histogram, whether it raises or not.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def gauge(self, name: str, callback: Callable[[], Any], label: Optional[str] = None):
+        """
+        Registers a gauge read from `callback` at every collection. With a `label`, the callback
+        returns a dict of values keyed by the value of that label.
+        """
+        with self._lock:
+            self._gauges[name] = (callback, label)
+
+    def _collect_gauges(self) -> Dict[str, Dict[Tuple, float]]:
+        with self._lock:
+            gauges = dict(self._gauges)
+        collected = {}
+        for name, (callback, label) in gauges.items():
+            try:
+                value = callback()
+            except Exception as e:
+                bt.logging.trace(f"Could not collect gauge {name}: {e}")
+                continue
+            if label is None:
+                collected[name] = {(): float(value)}
+            else:
+                collected[name] = {
+                    _label_key({label: key}): float(v) for key, v in value.items()
+                }
+        return collected
+
+    def render(self) -> str:
+        """
+        Returns every metric in the Prometheus text exposition format.
+        """
+        gauges = self._collect_gauges()
+        lines = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", gauges)):
+                for name, series in sorted(metrics.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in series.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, le=bound)} {cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns every metric as a JSON serializable dict, histograms summarized by their count,
+        sum and estimated median, 90th and 99th percentiles.
+        """
+        gauges = self._collect_gauges()
+
+        def labelled(key):
+            return ",".join(f"{name}={value}" for name, value in key)
+
+        with self._lock:
+            return {
+                "time": time.time(),
+                "counters": {
+                    name: {labelled(key): value for key, value in series.items()}
+                    for name, series in self._counters.items()
+                },
+                "gauges": {
+                    name: {labelled(key): value for key, value in series.items()}
+                    for name, series in gauges.items()
+                },
+                "histograms": {
+                    name: {
+                        labelled(key): {
+                            "count": histogram.count,
+                            "sum": histogram.sum,
+                            "p50": histogram.quantile(0.5),
+                            "p90": histogram.quantile(0.9),
+                            "p99": histogram.quantile(0.99),
+                        }
+                        for key, histogram in series.items()
+                    }
+                    for name, series in self._histograms.items()
+                },
+            }
+
+
+class MetricsServer:
+    """
+    Serves the metrics of a registry over HTTP at /metrics, on a daemon thread.
+
+    Attributes:
+        registry (MetricsRegistry): The metrics served.
+        host (str): The address listened on, local only by default.
+        port (int): The port listened on.
+    """
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9100):
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", EXPOSITION_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = threading.Thread(
+            target=self.server.serve_forever, name="miner-metrics", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+        bt.logging.info(f"Serving metrics at http://{self.host}:{self.port}/metrics")
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+async def write_metrics_snapshot(r: "aioredis.StrictRedis", registry: MetricsRegistry, path: str):
+    """
+    Background task writing the snapshot of a registry to a JSON file, atomically so readers
+    never see a partial snapshot.
+    """
+    write_file_atomic(path, json.dumps(registry.snapshot(), indent=2).encode())
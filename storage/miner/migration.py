@@ -0,0 +1,299 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import json
+import shutil
+import asyncio
+import bittensor as bt
+from typing import Dict, List, Optional, Tuple
+from redis import asyncio as aioredis
+from redis.exceptions import WatchError
+
+from .blobio import BlobIO
+from .blobstore import BLOB_DIRECTORY
+from .database import (
+    convert_to_new_format,
+    is_chunk_key,
+    metadata_codec,
+    update_chunk_filepath,
+)
+from .packfile import PACK_DIRECTORY, PACK_INDEX_KEY
+
+
+# Redis hash holding the checkpoint of a data directory migration: scan cursor, source and target
+MIGRATION_STATE_KEY = "migration:state"
+
+# Where the data hashes whose blobs could not be found are listed after a migration
+MIGRATION_LOG_PATH = os.path.join("migration_log", "failed_filepaths.json")
+
+
+def infer_base_directory(filepath: str, hotkey: Optional[str] = None) -> str:
+    """
+    Returns the data directory a blob path was stored under, for the blob layout
+    (<base>/blobs/...), the per hotkey layout (<base>/<hotkey>/<hash>) and the flat one (<base>/<hash>).
+    """
+    filepath = os.path.expanduser(filepath)
+    marker = os.sep + BLOB_DIRECTORY + os.sep
+    if marker in filepath:
+        return filepath[: filepath.rindex(marker)]
+    directory = os.path.dirname(filepath)
+    if hotkey is not None and os.path.basename(directory) == hotkey:
+        return os.path.dirname(directory)
+    return directory
+
+
+def rebase_path(filepath: str, old_base_directory: str, new_base_directory: str) -> str:
+    """
+    Maps a blob path under the old data directory to the same relative path under the new one.
+    Paths outside the old data directory are moved to the root of the new one.
+    """
+    filepath = os.path.expanduser(filepath)
+    relative = os.path.relpath(filepath, old_base_directory)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(filepath)
+    return os.path.join(new_base_directory, relative)
+
+
+def move_blob(source: str, target: str) -> bool:
+    """
+    Moves a blob to its new path, unless it is already there, e.g. copied by rsync beforehand.
+    Blocking, meant to run on the I/O threads.
+
+    Returns:
+        bool: Whether the blob is at its new path.
+    """
+    if os.path.isfile(target):
+        return True
+    if not os.path.isfile(source):
+        return False
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.move(source, target)
+    return True
+
+
+async def _load_entries(r: "aioredis.StrictRedis", keys: List[bytes]) -> Dict[bytes, Dict[bytes, dict]]:
+    """
+    Reads and decodes the entries of a batch of chunk keys in one round trip, converting the
+    laggards still in the format used before 1.5.3 first.
+    """
+    async with r.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.hgetall(key)
+        results = await pipe.execute()
+
+    entries = {}
+    for key, fields in zip(keys, results):
+        if b"hotkey" in fields:
+            await convert_to_new_format(r, key)
+            fields = await r.hgetall(key)
+        decoded = {}
+        for hotkey, raw in fields.items():
+            try:
+                decoded[hotkey] = await metadata_codec.loads(r, key, hotkey, raw)
+            except Exception as e:
+                bt.logging.warning(f"Could not decode metadata of {key} for {hotkey}: {e}")
+        entries[key] = decoded
+    return entries
+
+
+async def _migrate_batch(
+    r: "aioredis.StrictRedis",
+    io: BlobIO,
+    keys: List[bytes],
+    old_base_directory: str,
+    new_base_directory: str,
+) -> Tuple[int, List[str]]:
+    """
+    Moves the blobs of a batch of chunk keys concurrently and repoints their entries in a single
+    transaction. If an entry changes meanwhile, e.g. its seed is rotated, the entries are
+    repointed one by one instead so the change is kept.
+
+    Returns:
+        tuple: The number of entries updated and the paths of the blobs that were not found.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        await pipe.watch(*keys)
+        entries = await _load_entries(r, keys)
+        async with r.pipeline(transaction=False) as check:
+            for key in keys:
+                check.hexists(PACK_INDEX_KEY, key)
+            packed = dict(zip(keys, await check.execute()))
+
+        # Blobs are shared between hotkeys, move each file once
+        moves = {}
+        for key, decoded in entries.items():
+            for metadata in decoded.values():
+                filepath = metadata.get("filepath")
+                if filepath:
+                    source = os.path.expanduser(filepath)
+                    moves[source] = rebase_path(source, old_base_directory, new_base_directory)
+        sources = list(moves)
+        moved = dict(
+            zip(
+                sources,
+                await asyncio.gather(
+                    *(io.run(move_blob, source, moves[source]) for source in sources)
+                ),
+            )
+        )
+
+        updates, failed = {}, []
+        for key, decoded in entries.items():
+            for hotkey, metadata in decoded.items():
+                source = os.path.expanduser(metadata.get("filepath") or "")
+                if source not in moves:
+                    continue
+                # Packed blobs are read from their segment, only their recorded path changes
+                if not moved[source] and not packed[key]:
+                    if moves[source] not in failed:
+                        failed.append(moves[source])
+                    continue
+                metadata["filepath"] = moves[source]
+                updates.setdefault(key, {})[hotkey] = await metadata_codec.dumps(
+                    r, key, hotkey, metadata
+                )
+
+        try:
+            pipe.multi()
+            for key, mapping in updates.items():
+                pipe.hset(key, mapping=mapping)
+            await pipe.execute()
+        except WatchError:
+            for key, mapping in updates.items():
+                for hotkey in mapping:
+                    await update_chunk_filepath(
+                        r, key, hotkey, entries[key][hotkey]["filepath"]
+                    )
+    return sum(len(mapping) for mapping in updates.values()), failed
+
+
+async def _move_packfiles(io: BlobIO, old_base_directory: str, new_base_directory: str):
+    old_packs = os.path.join(old_base_directory, BLOB_DIRECTORY, PACK_DIRECTORY)
+    if not os.path.isdir(old_packs):
+        return
+    new_packs = os.path.join(new_base_directory, BLOB_DIRECTORY, PACK_DIRECTORY)
+    await asyncio.gather(
+        *(
+            io.run(move_blob, os.path.join(old_packs, name), os.path.join(new_packs, name))
+            for name in os.listdir(old_packs)
+        )
+    )
+
+
+async def migrate_data_directory(
+    r: "aioredis.StrictRedis",
+    new_base_directory: str,
+    return_failures: bool = False,
+    old_base_directory: Optional[str] = None,
+    batch_size: int = 1000,
+    concurrency: int = 16,
+) -> Optional[List[str]]:
+    """
+    Moves the blobs of the miner to a new data directory and repoints their entries in the index.
+
+    Blobs keep their path relative to the data directory. Those already present in the new
+    directory, e.g. copied there by rsync, are not moved again. The index is walked with SCAN in
+    batches of `batch_size` keys, each read and updated in a few pipelined round trips while its
+    blobs are moved by up to `concurrency` threads. The scan cursor is checkpointed in Redis after
+    every batch, so an interrupted migration to the same directory resumes where it stopped.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        new_base_directory (str): The new data directory.
+        return_failures (bool): Whether to return the paths of the blobs that were not found.
+        old_base_directory (str, optional): The current data directory. Inferred from the first
+                                            blob path of the index when not given.
+        batch_size (int): The number of keys scanned per batch.
+        concurrency (int): The maximum number of files moved at once.
+
+    Returns:
+        list: The paths of the blobs that were not found, if `return_failures` is set.
+    """
+    new_base_directory = os.path.abspath(os.path.expanduser(new_base_directory))
+    state = {
+        key.decode("utf-8"): value.decode("utf-8")
+        for key, value in (await r.hgetall(MIGRATION_STATE_KEY)).items()
+    }
+    if state.get("target") != new_base_directory:
+        state = {"cursor": "0", "target": new_base_directory}
+    elif old_base_directory is None:
+        old_base_directory = state.get("source")
+
+    if old_base_directory is None:
+        async for key in r.scan_iter("*", count=batch_size):
+            if not is_chunk_key(key):
+                continue
+            for hotkey, metadata in (await _load_entries(r, [key]))[key].items():
+                if metadata.get("filepath"):
+                    old_base_directory = infer_base_directory(
+                        metadata["filepath"], hotkey.decode("utf-8")
+                    )
+                    break
+            if old_base_directory is not None:
+                break
+    if old_base_directory is None:
+        bt.logging.error("Could not find the old base directory, nothing to migrate.")
+        return [] if return_failures else None
+    old_base_directory = os.path.abspath(os.path.expanduser(old_base_directory))
+
+    bt.logging.info(
+        f"Migrating filepaths for all hashes in Redis index from old base {old_base_directory} to new {new_base_directory}"
+    )
+    os.makedirs(new_base_directory, exist_ok=True)
+    await r.hset(
+        MIGRATION_STATE_KEY,
+        mapping={**state, "source": old_base_directory},
+    )
+
+    io = BlobIO(max_workers=concurrency, max_pending=2 * concurrency)
+    cursor, updated, failed_filepaths = int(state["cursor"]), 0, []
+    try:
+        await _move_packfiles(io, old_base_directory, new_base_directory)
+        while True:
+            cursor, keys = await r.scan(cursor, count=batch_size)
+            keys = [key for key in keys if is_chunk_key(key)]
+            if keys:
+                count, failed = await _migrate_batch(
+                    r, io, keys, old_base_directory, new_base_directory
+                )
+                updated += count
+                failed_filepaths.extend(failed)
+            await r.hset(MIGRATION_STATE_KEY, "cursor", cursor)
+            if cursor == 0:
+                break
+        await r.delete(MIGRATION_STATE_KEY)
+    finally:
+        io.shutdown()
+
+    bt.logging.info(f"Updated {updated} entries.")
+    if len(failed_filepaths):
+        os.makedirs(os.path.dirname(MIGRATION_LOG_PATH), exist_ok=True)
+        with open(MIGRATION_LOG_PATH, "w") as f:
+            json.dump(failed_filepaths, f)
+        bt.logging.error(
+            f"Failed to migrate {len(failed_filepaths)} files. These were skipped and may need to be migrated manually."
+        )
+        bt.logging.error(
+            f"Please see {os.path.abspath(MIGRATION_LOG_PATH)} for a complete list of failed filepaths."
+        )
+    else:
+        bt.logging.success("Successfully migrated all filepaths.")
+
+    return failed_filepaths if return_failures else None
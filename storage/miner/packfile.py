@@ -0,0 +1,272 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import struct
+import threading
+import bittensor as bt
+from typing import Callable, Dict, NamedTuple, Optional
+from redis import asyncio as aioredis
+
+from .blobio import BlobIO, fsync_directory
+
+# Redis hash mapping data hashes to their location in a segment, see `encode_location`
+PACK_INDEX_KEY = "pack:index"
+# Redis hash mapping segment ids to the number of live bytes they hold
+PACK_LIVE_KEY = "pack:live"
+# Redis hash mapping the ids of compacted segments to the time they were retired
+PACK_RETIRED_KEY = "pack:retired"
+# Redis counter allocating segment ids
+PACK_NEXT_SEGMENT_KEY = "pack:next_segment"
+
+# Subdirectory of the blob directory holding the segments
+PACK_DIRECTORY = "packs"
+
+# segment id, offset, length
+_LOCATION = struct.Struct("<IQQ")
+
+
+class BlobRange(NamedTuple):
+    """
+    A blob stored as a byte range of a larger file, such as a packfile segment.
+    """
+
+    path: str
+    offset: int
+    length: int
+
+
+def encode_location(segment_id: int, offset: int, length: int) -> bytes:
+    return _LOCATION.pack(segment_id, offset, length)
+
+
+def decode_location(raw: bytes):
+    return _LOCATION.unpack(raw)
+
+
+class PackStore:
+    """
+    Append-only packfile storage for small blobs.
+
+    Instead of one file per blob, small blobs are appended to segment files of up to `segment_size`
+    bytes, and their (segment, offset, length) is recorded in the PACK_INDEX_KEY hash, keyed by
+    data hash like the blob store. Each process appends to a segment of its own, allocated when it
+    writes its first blob, and seals it once it is full. Sealed segments are never written again.
+
+    Segments are written on the `BlobIO` threads, and with its `fsync` every blob is flushed to disk
+    before `put` returns, like the blobs stored in files of their own.
+
+    Deleting a blob only drops it from the index and from the live byte count of its segment.
+    `compact` rewrites the remaining blobs of sealed segments that are mostly garbage into the
+    active segment and retires the old segments, which are deleted after a grace period so that
+    readers that already resolved a location in them can finish.
+
+    Attributes:
+        directory (str): The directory holding the segment files.
+        segment_size (int): The size after which a segment is sealed.
+        max_blob_size (int): The largest blob stored in segments, larger blobs get their own file.
+        io (BlobIO): The thread pool the segments are written on.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        segment_size: int = 256 * 2**20,
+        max_blob_size: int = 2**20,
+        io: Optional[BlobIO] = None,
+    ):
+        self.directory = os.path.join(os.path.expanduser(directory), PACK_DIRECTORY)
+        self.segment_size = segment_size
+        self.max_blob_size = max_blob_size
+        self.io = io or BlobIO()
+        os.makedirs(self.directory, exist_ok=True)
+        self.active_segment: Optional[int] = None
+        self.active_file = None
+        self._write_lock = threading.Lock()
+
+    def accepts(self, size: int) -> bool:
+        """
+        Returns whether a blob of `size` bytes is stored in segments.
+        """
+        return size <= self.max_blob_size
+
+    def segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.directory, f"{segment_id:08d}.pack")
+
+    def _full(self) -> bool:
+        return self.active_file is None or self.active_file.tell() >= self.segment_size
+
+    async def _ensure_segment(self, r: "aioredis.StrictRedis"):
+        if not self._full():
+            return
+        segment_id = await r.incr(PACK_NEXT_SEGMENT_KEY)
+        with self._write_lock:
+            # Another put may have rolled the segment over while the id was allocated, the id
+            # is then left unused rather than opening a segment that would stay empty
+            if not self._full():
+                return
+            if self.active_file is not None:
+                self.active_file.close()
+                bt.logging.debug(f"Sealed segment {self.active_segment}")
+            self.active_segment = segment_id
+            self.active_file = open(self.segment_path(segment_id), "ab")
+            if self.io.fsync:
+                fsync_directory(self.directory)
+
+    def _append(self, data) -> tuple:
+        with self._write_lock:
+            offset = self.active_file.tell()
+            self.active_file.write(data)
+            self.active_file.flush()
+            if self.io.fsync:
+                os.fsync(self.active_file.fileno())
+            return self.active_segment, offset
+
+    async def get(self, r: "aioredis.StrictRedis", data_hash) -> Optional[BlobRange]:
+        """
+        Returns the location of a packed blob, or None if it is not packed.
+        """
+        raw = await r.hget(PACK_INDEX_KEY, str(data_hash))
+        if raw is None:
+            return None
+        segment_id, offset, length = decode_location(raw)
+        return BlobRange(self.segment_path(segment_id), offset, length)
+
+    async def put(self, r: "aioredis.StrictRedis", data_hash, data) -> BlobRange:
+        """
+        Appends a blob to the active segment, unless it is already packed.
+
+        Returns:
+            BlobRange: The location of the blob.
+        """
+        existing = await self.get(r, data_hash)
+        if existing is not None:
+            return existing
+        await self._ensure_segment(r)
+        segment_id, offset = await self.io.run(self._append, data)
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hset(PACK_INDEX_KEY, str(data_hash), encode_location(segment_id, offset, len(data)))
+            pipe.hincrby(PACK_LIVE_KEY, segment_id, len(data))
+            await pipe.execute()
+        return BlobRange(self.segment_path(segment_id), offset, len(data))
+
+    async def delete(self, r: "aioredis.StrictRedis", data_hash) -> bool:
+        """
+        Drops a blob from the index. Its bytes are reclaimed when its segment is compacted.
+
+        Returns:
+            bool: True if the blob was packed.
+        """
+        raw = await r.hget(PACK_INDEX_KEY, str(data_hash))
+        if raw is None:
+            return False
+        segment_id, _, length = decode_location(raw)
+        async with r.pipeline(transaction=True) as pipe:
+            pipe.hdel(PACK_INDEX_KEY, str(data_hash))
+            pipe.hincrby(PACK_LIVE_KEY, segment_id, -length)
+            await pipe.execute()
+        return True
+
+    def _read(self, location: BlobRange) -> bytes:
+        with open(location.path, "rb") as file:
+            file.seek(location.offset)
+            return file.read(location.length)
+
+    async def compact(
+        self,
+        r: "aioredis.StrictRedis",
+        lock: Callable,
+        max_live_ratio: float = 0.5,
+        grace_period: float = 300,
+    ) -> int:
+        """
+        Reclaims the space of deleted blobs from sealed segments.
+
+        Args:
+            r (redis.Redis): The Redis connection instance.
+            lock (Callable): Returns the async lock of a data hash, held while a blob is moved.
+            max_live_ratio (float): Segments whose live bytes are at most this fraction of their size are compacted.
+            grace_period (float): Seconds a retired segment is kept before it is deleted.
+
+        Returns:
+            int: The number of bytes reclaimed.
+        """
+        reclaimed = self._delete_retired(await r.hgetall(PACK_RETIRED_KEY), grace_period)
+        for segment_id in reclaimed:
+            await r.hdel(PACK_RETIRED_KEY, segment_id)
+        reclaimed_bytes = sum(reclaimed.values())
+
+        live = {int(k): int(v) for k, v in (await r.hgetall(PACK_LIVE_KEY)).items()}
+        candidates = []
+        for segment_id, live_bytes in live.items():
+            path = self.segment_path(segment_id)
+            if segment_id == self.active_segment or not os.path.isfile(path):
+                continue
+            if live_bytes <= max_live_ratio * os.path.getsize(path):
+                candidates.append(segment_id)
+        if not candidates:
+            return reclaimed_bytes
+
+        bt.logging.info(f"Compacting packfile segments {candidates}")
+        candidates = set(candidates)
+        async for data_hash, raw in r.hscan_iter(PACK_INDEX_KEY):
+            segment_id, offset, length = decode_location(raw)
+            if segment_id not in candidates:
+                continue
+            async with lock(data_hash.decode("utf-8")):
+                # The blob may have been deleted since the scan
+                if await r.hget(PACK_INDEX_KEY, data_hash) != raw:
+                    continue
+                data = await self.io.run(
+                    self._read, BlobRange(self.segment_path(segment_id), offset, length)
+                )
+                await self._ensure_segment(r)
+                new_segment, new_offset = await self.io.run(self._append, data)
+                async with r.pipeline(transaction=True) as pipe:
+                    pipe.hset(PACK_INDEX_KEY, data_hash, encode_location(new_segment, new_offset, length))
+                    pipe.hincrby(PACK_LIVE_KEY, segment_id, -length)
+                    pipe.hincrby(PACK_LIVE_KEY, new_segment, length)
+                    await pipe.execute()
+
+        now = time.time()
+        async with r.pipeline(transaction=True) as pipe:
+            for segment_id in candidates:
+                pipe.hdel(PACK_LIVE_KEY, segment_id)
+                pipe.hset(PACK_RETIRED_KEY, segment_id, now)
+            await pipe.execute()
+        return reclaimed_bytes
+
+    def _delete_retired(self, retired: Dict[bytes, bytes], grace_period: float) -> Dict[int, int]:
+        deleted = {}
+        for segment_id, retired_at in retired.items():
+            if time.time() - float(retired_at) < grace_period:
+                continue
+            path = self.segment_path(int(segment_id))
+            size = os.path.getsize(path) if os.path.isfile(path) else 0
+            if size:
+                os.remove(path)
+            deleted[int(segment_id)] = size
+        return deleted
+
+    def close(self):
+        with self._write_lock:
+            if self.active_file is not None:
+                self.active_file.close()
+                self.active_file = None
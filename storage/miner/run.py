@@ -82,6 +82,11 @@ def run(self):
             update_storage_stats(self)
             bt.logging.debug("Storage statistics updated...")
 
+            # --- Resync the metagraph and refresh the stake weighted rate limits.
+            self.metagraph.sync(subtensor=self.subtensor)
+            self.update_rate_limit_weights()
+            bt.logging.debug("Rate limit weights updated...")
+
         if self.should_exit:
             return True
 
@@ -0,0 +1,257 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import bittensor as bt
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+
+# Weight of each request type in the priority of its work, multiplied by the caller's stake.
+# Challenges are timed and scored the most strictly, so they go first.
+REQUEST_TYPE_WEIGHTS = {"challenge": 2.0, "retrieve": 1.0, "store": 1.0}
+
+# Smoothing factor of the moving averages of the wait and run times
+EWMA_ALPHA = 0.1
+
+# Number of completed items of a request type before its run time estimate is used to drop work
+MIN_RUN_TIME_SAMPLES = 3
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised for work dropped because it could not finish before the deadline of its request.
+    """
+
+
+class _WorkStats:
+    def __init__(self):
+        self.completed = 0
+        self.dropped = 0
+        self.wait_time = 0.0  # moving average, seconds
+        self.max_wait_time = 0.0
+        self.run_time = 0.0  # moving average, seconds
+
+    def record(self, wait_time: float, run_time: float):
+        if self.completed == 0:
+            self.wait_time, self.run_time = wait_time, run_time
+        else:
+            self.wait_time += EWMA_ALPHA * (wait_time - self.wait_time)
+            self.run_time += EWMA_ALPHA * (run_time - self.run_time)
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.completed += 1
+
+    def estimated_run_time(self) -> float:
+        """
+        Returns the moving average run time, or 0 while too few items completed to trust it.
+        """
+        return self.run_time if self.completed >= MIN_RUN_TIME_SAMPLES else 0.0
+
+    def drop_on_estimate(self):
+        """
+        Counts work dropped because of the run time estimate. Dropped work never reports a run
+        time, so the estimate is decayed instead: otherwise one slow sample could keep every later
+        item of the request type dropped, with nothing to bring the estimate back down.
+        """
+        self.dropped += 1
+        self.run_time *= 1 - EWMA_ALPHA
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "completed": self.completed,
+            "dropped": self.dropped,
+            "wait_time": self.wait_time,
+            "max_wait_time": self.max_wait_time,
+            "run_time": self.run_time,
+        }
+
+
+class WorkScheduler:
+    """
+    Runs the CPU heavy work of the miner's request handlers (hashing, elliptic curve commitments)
+    on a fixed pool of worker threads, highest priority first.
+
+    The priority of a piece of work is the stake of the calling validator times the weight of the
+    request type, see REQUEST_TYPE_WEIGHTS, so under load the requests that matter most for the
+    miner's score are served first. Work also carries the deadline of its request, derived from the
+    validator's timeout: when a worker picks up work that cannot finish in time anymore, given the
+    moving average run time of its request type, it is dropped with `DeadlineExceeded` instead of
+    burning CPU on a response nobody will read.
+
+    Queue depth, wait and run times, and drops are tracked per request type, see `stats`.
+    Submissions are thread safe, so work can come from any event loop.
+
+    Attributes:
+        max_workers (int): The number of worker threads.
+        max_queue_size (int): The number of queued items beyond which new work is rejected.
+    """
+
+    def __init__(self, max_workers: int = 4, max_queue_size: int = 1024):
+        self.max_workers = max(1, max_workers)
+        self.max_queue_size = max_queue_size
+        self._queue = []  # heap of (-priority, sequence, item)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._stats = {}
+        self._running = True
+        self._workers = [
+            threading.Thread(
+                target=self._work, name=f"storage-cpu-{i}", daemon=True
+            )
+            for i in range(self.max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _stats_for(self, kind: str) -> _WorkStats:
+        if kind not in self._stats:
+            self._stats[kind] = _WorkStats()
+        return self._stats[kind]
+
+    def priority(self, kind: str, stake: float) -> float:
+        """
+        Returns the priority of work of request type `kind` for a caller with `stake`.
+        """
+        # Unstaked callers still get a small priority, ordered by request type
+        return REQUEST_TYPE_WEIGHTS.get(kind, 1.0) * (max(stake, 0.0) + 1.0)
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        kind: str = "default",
+        stake: float = 0.0,
+        deadline: Optional[float] = None,
+    ) -> Future:
+        """
+        Queues a blocking function.
+
+        Args:
+            fn (Callable): The function to run.
+            *args: Its arguments.
+            kind (str): The request type the work belongs to.
+            stake (float): The stake of the calling validator.
+            deadline (float, optional): The `time.monotonic()` time by which the work must be done.
+
+        Returns:
+            concurrent.futures.Future: Resolved with the result of `fn`, or failed with
+            `DeadlineExceeded` if the work was dropped.
+        """
+        future = Future()
+        item = (fn, args, kind, deadline, time.monotonic(), future)
+        with self._condition:
+            if not self._running:
+                raise RuntimeError("Work scheduler is stopped")
+            if len(self._queue) >= self.max_queue_size:
+                self._stats_for(kind).dropped += 1
+                future.set_exception(DeadlineExceeded("Work queue is full"))
+                return future
+            heapq.heappush(
+                self._queue, (-self.priority(kind, stake), next(self._sequence), item)
+            )
+            self._condition.notify()
+        return future
+
+    async def run(
+        self,
+        fn: Callable,
+        *args,
+        kind: str = "default",
+        stake: float = 0.0,
+        deadline: Optional[float] = None,
+    ) -> Any:
+        """
+        Runs a blocking function on the workers and waits for its result, see `submit`.
+
+        Raises:
+            DeadlineExceeded: If the work was dropped.
+        """
+        return await asyncio.wrap_future(
+            self.submit(fn, *args, kind=kind, stake=stake, deadline=deadline)
+        )
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                _, _, item = heapq.heappop(self._queue)
+            fn, args, kind, deadline, submitted, future = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+            with self._condition:
+                stats = self._stats_for(kind)
+                late = deadline is not None and started > deadline
+                expired = late or (
+                    deadline is not None and started + stats.estimated_run_time() > deadline
+                )
+                if late:
+                    stats.dropped += 1
+                elif expired:
+                    stats.drop_on_estimate()
+            if expired:
+                future.set_exception(
+                    DeadlineExceeded(
+                        f"{kind} work waited {started - submitted:.2f}s and cannot finish before its deadline"
+                    )
+                )
+                continue
+
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            with self._condition:
+                stats.record(started - submitted, time.monotonic() - started)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the queue depth and, per request type, the number of completed and dropped items,
+        the moving average and maximum wait times and the moving average run time in seconds.
+        """
+        with self._condition:
+            return {
+                "queue_depth": len(self._queue),
+                "types": {kind: stats.as_dict() for kind, stats in self._stats.items()},
+            }
+
+    def shutdown(self):
+        """
+        Stops the workers once the queued work is done.
+        """
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+        bt.logging.debug("Work scheduler stopped")
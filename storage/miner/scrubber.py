@@ -0,0 +1,242 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import json
+import time
+import shutil
+import asyncio
+import bittensor as bt
+from typing import Any, Dict, Optional, Tuple, Union
+from redis import asyncio as aioredis
+
+from .blobio import write_file_atomic
+from .blobstore import BlobStore
+from .database import is_chunk_key, metadata_codec
+from .packfile import BlobRange
+from .utils import hash_blob, open_blob
+
+
+# Cursor of the keyspace scan of the scrubber, kept between passes and restarts
+SCRUB_CURSOR_KEY = "scrub:cursor"
+
+# Running counters of the scrubber: passes, checked, damaged, bytes and the last pass time
+SCRUB_STATS_KEY = "scrub:stats"
+
+# Report of the damaged blobs found, data hash -> JSON with the reason, hotkeys and time
+SCRUB_DAMAGED_KEY = "scrub:damaged"
+
+# Subdirectory of the data directory damaged blobs are moved to
+QUARANTINE_DIRECTORY = "quarantine"
+
+
+class ByteRateLimiter:
+    """
+    Token bucket limiting the number of bytes read per second by a background task.
+
+    Attributes:
+        rate (float): The number of bytes allowed per second, 0 for no limit.
+        burst (float): The number of bytes that may be read at once after an idle period.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self._available = self.burst
+        self._last = time.monotonic()
+
+    async def throttle(self, nbytes: int):
+        """
+        Accounts for `nbytes` bytes read, sleeping until the rate allows them.
+        """
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self._available = min(self.burst, self._available + (now - self._last) * self.rate)
+        self._last = now
+        self._available -= nbytes
+        if self._available < 0:
+            await asyncio.sleep(-self._available / self.rate)
+
+
+def check_blob(data_hash, location: Union[str, BlobRange]) -> Optional[str]:
+    """
+    Checks a stored blob against its data hash. Blocking, meant to run on the I/O threads.
+
+    The size recorded in the metadata is not compared: entries stored by older miners hold
+    `sys.getsizeof` of the data rather than its length, and a truncated blob fails the hash anyway.
+
+    Returns:
+        str: Why the blob is damaged, or None if it is intact.
+    """
+    try:
+        if str(hash_blob(location)) != str(data_hash):
+            return "hash mismatch"
+    except OSError as e:
+        return f"unreadable: {e}"
+    return None
+
+
+def quarantine_blob(blob_store: BlobStore, data_hash, location: Union[str, BlobRange]) -> Optional[str]:
+    """
+    Moves a damaged blob out of the blob layout into the quarantine directory, for inspection.
+    Packed blobs are copied out of their segment. Must be called holding the lock of the data hash.
+
+    Returns:
+        str: The path of the quarantined copy, or None if nothing could be saved.
+    """
+    target = os.path.join(blob_store.directory, QUARANTINE_DIRECTORY, str(data_hash))
+    try:
+        if isinstance(location, BlobRange):
+            with open_blob(location) as view:
+                return write_file_atomic(target, view)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(location, target)
+        return target
+    except OSError as e:
+        bt.logging.warning(f"Could not quarantine blob {data_hash}: {e}")
+        return None
+
+
+async def scrub_blob(
+    r: "aioredis.StrictRedis", blob_store: BlobStore, data_hash: str
+) -> Tuple[int, Optional[Dict[str, Any]]]:
+    """
+    Re-hashes every distinct blob the entries of a data hash point at. A blob which is missing or
+    damaged is quarantined, and the entries pointing at it are dropped and recorded in the damage
+    report. Entries pointing at another, intact copy are kept, e.g. the per hotkey copies of the
+    legacy layout which the blob layout migration has not collapsed yet.
+
+    Returns:
+        tuple: The number of bytes read, and the report of the dropped entries or None if every
+               blob is intact.
+    """
+    entries = {}
+    for hotkey, raw in (await r.hgetall(data_hash)).items():
+        try:
+            entries[hotkey.decode("utf-8")] = await metadata_codec.loads(r, data_hash, hotkey, raw)
+        except Exception as e:
+            bt.logging.trace(f"Could not decode metadata of {data_hash}: {e}")
+    if not entries:
+        return 0, None
+
+    nbytes = 0
+    reasons, quarantined = {}, []
+    async with blob_store.lock(data_hash):
+        locations = {}
+        for hotkey, metadata in entries.items():
+            location = await blob_store.resolve(r, data_hash, hotkey, metadata.get("filepath"))
+            locations.setdefault(location, []).append(hotkey)
+
+        for location, hotkeys in locations.items():
+            if location is None:
+                reason = "missing"
+            else:
+                nbytes += location.length if isinstance(location, BlobRange) else _file_size(location)
+                reason = await blob_store.io.run(check_blob, data_hash, location)
+                if reason is None:
+                    continue
+                target = quarantine_blob(blob_store, data_hash, location)
+                if target is not None:
+                    quarantined.append(target)
+            for hotkey in hotkeys:
+                reasons[hotkey] = reason
+
+    if not reasons:
+        return nbytes, None
+    for hotkey in reasons:
+        await blob_store.release(r, data_hash, hotkey)
+
+    report = {
+        "reasons": reasons,
+        "hotkeys": list(reasons),
+        "quarantined": quarantined,
+        "time": int(time.time()),
+    }
+    await r.hset(SCRUB_DAMAGED_KEY, data_hash, json.dumps(report))
+    bt.logging.warning(f"Scrubber removed damaged blob {data_hash}: {report}")
+    return nbytes, report
+
+
+def _file_size(filepath: str) -> int:
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+async def scrub_blobs(
+    r: "aioredis.StrictRedis",
+    blob_store: BlobStore,
+    bytes_per_second: float = 0,
+    batch_size: int = 100,
+    max_keys: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Background integrity scrub of the blobs in the index, so damaged data is found and removed
+    before a validator challenges it.
+
+    The keyspace is walked with SCAN and the cursor is saved after every batch, so the scrub
+    resumes where it stopped after a restart; once the walk wraps around, the next call starts a
+    new pass. Blobs are hashed on the I/O threads, reading at most `bytes_per_second` on average.
+
+    Args:
+        r (redis.Redis): The Redis connection instance.
+        blob_store (BlobStore): The blob store holding the blobs.
+        bytes_per_second (float): The limit of the read rate, 0 for no limit.
+        batch_size (int): The number of keys scanned per round trip.
+        max_keys (int, optional): Stop after this many keys, resuming from there at the next call.
+
+    Returns:
+        dict: The number of blobs checked, found damaged, and bytes read by this call.
+    """
+    limiter = ByteRateLimiter(bytes_per_second)
+    stats = {"checked": 0, "damaged": 0, "bytes": 0}
+    cursor = int(await r.get(SCRUB_CURSOR_KEY) or 0)
+    scanned = 0
+    while True:
+        cursor, keys = await r.scan(cursor, count=batch_size)
+        for key in keys:
+            if not is_chunk_key(key):
+                continue
+            data_hash = key.decode("utf-8") if isinstance(key, bytes) else key
+            try:
+                nbytes, report = await scrub_blob(r, blob_store, data_hash)
+                stats["checked"] += 1
+                stats["damaged"] += report is not None
+                stats["bytes"] += nbytes
+                await limiter.throttle(nbytes)
+            except Exception as e:
+                bt.logging.error(f"Could not scrub blob {data_hash}: {e}")
+        scanned += len(keys)
+        await r.set(SCRUB_CURSOR_KEY, cursor)
+        if cursor == 0 or (max_keys is not None and scanned >= max_keys):
+            break
+
+    async with r.pipeline(transaction=True) as pipe:
+        for name, value in stats.items():
+            pipe.hincrby(SCRUB_STATS_KEY, name, value)
+        if cursor == 0:
+            pipe.hincrby(SCRUB_STATS_KEY, "passes", 1)
+            pipe.hset(SCRUB_STATS_KEY, "last_pass", int(time.time()))
+        await pipe.execute()
+    bt.logging.info(
+        f"Scrubbed {stats['checked']} blobs, {stats['damaged']} damaged, {stats['bytes']} bytes read"
+    )
+    return stats
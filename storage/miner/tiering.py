@@ -0,0 +1,194 @@
+# The MIT License (MIT)
+# Copyright © 2023 Yuma Rao
+# Copyright © 2023 philanthrope
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+# documentation files (the “Software”), to deal in the Software without restriction, including without limitation
+# the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+# and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in all copies or substantial portions of
+# the Software.
+
+# THE SOFTWARE IS PROVIDED “AS IS”, WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO
+# THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL
+# THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
+# DEALINGS IN THE SOFTWARE.
+
+
+import os
+import time
+import threading
+import bittensor as bt
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from redis import asyncio as aioredis
+
+from .blobstore import BlobStore
+from .database import ACCESS_INDEX_KEY, is_chunk_key
+from .scrubber import ByteRateLimiter
+
+
+class AccessTracker:
+    """
+    Counts the challenges and retrieves of every blob in memory, until they are flushed to the
+    access index in Redis by `flush_access_counts`, so requests pay no extra round trip.
+
+    The tracker is thread safe: it is filled by the axon handlers and drained by the background worker.
+    """
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, data_hash):
+        """
+        Counts one access to the blob of a data hash.
+        """
+        with self._lock:
+            self._counts[str(data_hash)] += 1
+
+    def drain(self) -> Dict[str, int]:
+        """
+        Returns the counts recorded since the last call and resets them.
+        """
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+
+async def flush_access_counts(r: "aioredis.StrictRedis", tracker: AccessTracker) -> int:
+    """
+    Adds the access counts recorded by a tracker to the access index, in one round trip.
+
+    Returns:
+        int: The number of blobs whose count was updated.
+    """
+    counts = tracker.drain()
+    if not counts:
+        return 0
+    async with r.pipeline(transaction=False) as pipe:
+        for data_hash, count in counts.items():
+            pipe.zincrby(ACCESS_INDEX_KEY, count, data_hash)
+        await pipe.execute()
+    return len(counts)
+
+
+async def decay_access_counts(r: "aioredis.StrictRedis", factor: float, min_score: float = 0.01):
+    """
+    Multiplies every access count by `factor`, so the index reflects recent accesses, and drops
+    the blobs whose count decayed below `min_score`.
+    """
+    async with r.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(ACCESS_INDEX_KEY, {ACCESS_INDEX_KEY: factor})
+        pipe.zremrangebyscore(ACCESS_INDEX_KEY, "-inf", f"({min_score}")
+        await pipe.execute()
+
+
+def list_blobs(blob_directory: str, min_age: float = 0) -> List[Tuple[str, int]]:
+    """
+    Lists the blobs under a blob directory last written more than `min_age` seconds ago.
+    Blocking, meant to run on the I/O threads.
+
+    Returns:
+        list: (data hash, size) pairs.
+    """
+    now = time.time()
+    blobs = []
+    for dirpath, _, filenames in os.walk(blob_directory):
+        for filename in filenames:
+            if not is_chunk_key(filename):
+                continue
+            try:
+                stat = os.stat(os.path.join(dirpath, filename))
+            except OSError:
+                continue
+            if now - stat.st_mtime >= min_age:
+                blobs.append((filename, stat.st_size))
+    return blobs
+
+
+async def rebalance_tiers(
+    r: "aioredis.StrictRedis",
+    blob_store: BlobStore,
+    tracker: AccessTracker,
+    hot_threshold: float = 4,
+    cold_threshold: float = 1,
+    min_age: float = 3600,
+    bytes_per_second: float = 0,
+    max_moves: int = 1000,
+    decay: float = 0.5,
+) -> Dict[str, int]:
+    """
+    Background pass moving the blobs of the miner between its fast and bulk data roots.
+
+    Blobs on the fast tier whose decayed access count is below `cold_threshold` are demoted to the
+    bulk tier first, making room for the blobs of the bulk tier whose count reached
+    `hot_threshold`, hottest first, as long as the fast tier has room. Blobs written less than
+    `min_age` seconds ago are never demoted, new blobs land on the fast tier before they were ever
+    accessed. Moves copy at most `bytes_per_second` on average and `max_moves` blobs per pass, and
+    repoint the entries of a blob atomically, see `BlobStore.relocate`. The access counts decay by
+    `decay` after every pass.
+
+    Returns:
+        dict: The number of blobs promoted and demoted, and the bytes moved.
+    """
+    stats = {"promoted": 0, "demoted": 0, "bytes": 0}
+    await flush_access_counts(r, tracker)
+    disks = blob_store.disks
+    if not disks.tiered:
+        return stats
+    limiter = ByteRateLimiter(bytes_per_second)
+    moves = 0
+
+    async def move(data_hash: str, size: int, fast: bool) -> Optional[int]:
+        nonlocal moves
+        try:
+            root = disks.choose(size, fast=fast, fallback=False)
+            moved = await blob_store.relocate(r, data_hash, root)
+        except OSError as e:
+            tier = "fast" if fast else "bulk"
+            bt.logging.debug(f"Could not move blob {data_hash} to the {tier} tier: {e}")
+            return None
+        if moved:
+            moves += 1
+            stats["bytes"] += moved
+            stats["promoted" if fast else "demoted"] += 1
+            await limiter.throttle(moved)
+        return moved
+
+    for root in disks.tier(fast=True):
+        blobs = await blob_store.io.run(list_blobs, root.blob_directory, min_age)
+        for start in range(0, len(blobs), 1000):
+            batch = blobs[start : start + 1000]
+            async with r.pipeline(transaction=False) as pipe:
+                for data_hash, _ in batch:
+                    pipe.zscore(ACCESS_INDEX_KEY, data_hash)
+                scores = await pipe.execute()
+            for (data_hash, size), score in zip(batch, scores):
+                if moves >= max_moves:
+                    break
+                if (score or 0) < cold_threshold:
+                    await move(data_hash, size, fast=False)
+
+    hot = await r.zrevrangebyscore(
+        ACCESS_INDEX_KEY, "+inf", hot_threshold, start=0, num=max_moves
+    )
+    for data_hash in hot:
+        if moves >= max_moves:
+            break
+        data_hash = data_hash.decode("utf-8")
+        location = await blob_store.find(r, data_hash)
+        root = disks.root_of(location) if location else None
+        if root is not None and not root.fast:
+            if await move(data_hash, os.path.getsize(location), fast=True) is None:
+                # The fast tier is full
+                break
+
+    await decay_access_counts(r, decay)
+    bt.logging.info(
+        f"Tiering moved {stats['bytes']} bytes: {stats['promoted']} blobs promoted, "
+        f"{stats['demoted']} demoted"
+    )
+    return stats
@@ -18,26 +18,35 @@
 
 import os
 import json
+import mmap
 import time
 import shutil
 import storage
 import wandb
 import copy
 import asyncio
+import threading
 import multiprocessing
 import bittensor as bt
-from collections import deque
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 
 from ..shared.ecc import (
+    ECCommitment,
     ecc_point_to_hex,
-    hash_data,
+    hash_file,
+    hash_stream,
+    FIXED_BASE_MIN_COMMITS,
+    POINT_ENCODING_LEGACY,
 )
 from ..shared.merkle import (
     MerkleTree,
 )
+from .database import STORAGE_LEDGER_KEY, STORAGE_LEDGER_RECONCILED_KEY, update_proof_info
+from .packfile import BlobRange
 
 
-def commit_data_with_seed(committer, data_chunks, n_chunks, seed):
+def commit_data_with_seed(committer, data_chunks, n_chunks, seed, encoding=POINT_ENCODING_LEGACY):
     """
     Commits chunks of data with a seed using a Merkle tree structure to create a proof of
     integrity for each chunk. This function is used in environments where the integrity
@@ -48,6 +57,7 @@ def commit_data_with_seed(committer, data_chunks, n_chunks, seed):
     - data_chunks (list): A list of data chunks to be committed.
     - n_chunks (int): The number of chunks expected to be committed.
     - seed: A seed value that is combined with data chunks before commitment.
+    - encoding (int, optional): The point encoding of the commitments; defaults to the legacy form.
 
     Returns:
     - randomness (list): A list of randomness values associated with each data chunk's commitment.
@@ -56,15 +66,20 @@ def commit_data_with_seed(committer, data_chunks, n_chunks, seed):
     - merkle_tree (MerkleTree): A Merkle tree constructed from the commitment points.
 
     This function handles the conversion of commitment points to hex format and adds them to the
-    Merkle tree. The completed tree represents the combined commitments.
+    Merkle tree. The completed tree represents the combined commitments. When enough chunks share
+    the committer's (g, h), the commitments are computed from a precomputed fixed-base table.
     """
+    if committer.table is None and n_chunks >= FIXED_BASE_MIN_COMMITS:
+        committer = ECCommitment(committer.g, committer.h, precompute=True)
+
     merkle_tree = MerkleTree()
 
     # Commit each chunk of data
+    seed = str(seed).encode()
     randomness, chunks, points = [None] * n_chunks, [None] * n_chunks, [None] * n_chunks
     for index, chunk in enumerate(data_chunks):
-        c, m_val, r = committer.commit(chunk + str(seed).encode())
-        c_hex = ecc_point_to_hex(c)
+        c, m_val, r = committer.commit_hashed(hash_stream((chunk, seed)))
+        c_hex = ecc_point_to_hex(c, encoding)
         randomness[index] = r
         chunks[index] = chunk
         points[index] = c_hex
@@ -117,6 +132,50 @@ def load_from_filesystem(filepath):
     return data
 
 
+@contextmanager
+def open_blob(filepath):
+    """
+    Memory-maps a stored blob read-only and yields a memoryview over it.
+
+    Parameters:
+    - filepath (str or BlobRange): The path to the file to be mapped, or the byte range of a
+      packfile segment holding the blob.
+
+    Yields:
+    - memoryview: A zero-copy view of the file contents. Slicing it (e.g. with `chunk_data`)
+      does not copy either, and it can be hashed or base64 encoded directly.
+
+    Unlike `load_from_filesystem`, the data is never copied into a fresh bytes object: pages are
+    read from the page cache on demand and shared between concurrent requests for the same blob.
+    Views must not be used after the context exits.
+    """
+    blob_range = filepath if isinstance(filepath, BlobRange) else None
+    if blob_range is not None:
+        filepath = blob_range.path
+    with open(os.path.expanduser(filepath), "rb") as file:
+        try:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            yield memoryview(b"")
+            return
+
+    view = memoryview(mapped)
+    blob_view = view
+    if blob_range is not None:
+        blob_view = view[blob_range.offset : blob_range.offset + blob_range.length]
+    try:
+        yield blob_view
+    finally:
+        blob_view.release()
+        view.release()
+        try:
+            mapped.close()
+        except BufferError:
+            # Slices of the view are still referenced, the map is closed once they are collected
+            pass
+
+
 def compute_subsequent_commitment(data, previous_seed, new_seed, verbose=False):
     """
     Computes a new commitment based on provided data and a change from an old seed to a new seed.
@@ -124,7 +183,7 @@ def compute_subsequent_commitment(data, previous_seed, new_seed, verbose=False):
     altering the underlying data.
 
     Parameters:
-    - data: The original data for which the commitment is being updated.
+    - data (bytes | memoryview): The original data for which the commitment is being updated.
     - previous_seed: The seed used in the previous commitment.
     - new_seed: The seed to be used for the new commitment.
     - verbose (bool): If True, additional debug information will be printed. Defaults to False.
@@ -140,8 +199,77 @@ def compute_subsequent_commitment(data, previous_seed, new_seed, verbose=False):
         bt.logging.debug("type of data     :", type(data))
         bt.logging.debug("type of prev_seed:", type(previous_seed))
         bt.logging.debug("type of new_seed :", type(new_seed))
-    proof = hash_data(data + previous_seed)
-    return hash_data(str(proof).encode("utf-8") + new_seed), proof
+    proof = hash_stream((data, previous_seed))
+    return compute_commitment_from_proof(proof, new_seed)
+
+
+def compute_commitment_from_proof(proof, new_seed):
+    """
+    Computes the next commitment from an already known proof, hash(data + previous_seed).
+
+    Parameters:
+    - proof (int): The proof of the old commitment.
+    - new_seed (bytes): The seed to be used for the new commitment.
+
+    Returns:
+    - A tuple containing the new commitment and the proof of the old commitment, as returned
+      by `compute_subsequent_commitment`.
+    """
+    return hash_stream((str(proof).encode("utf-8"), new_seed)), proof
+
+
+def blob_size(filepath) -> int:
+    """
+    Returns the size of a stored blob, given its path or its BlobRange.
+    """
+    if isinstance(filepath, BlobRange):
+        return filepath.length
+    return os.path.getsize(os.path.expanduser(filepath))
+
+
+def hash_blob(filepath, *suffixes) -> int:
+    """
+    Computes the `hash_data` integer of a stored blob followed by optional suffixes (e.g. a seed),
+    given its path or its BlobRange.
+    """
+    if not isinstance(filepath, BlobRange):
+        return hash_file(filepath, *suffixes)
+    with open_blob(filepath) as view:
+        return hash_stream((view, *suffixes))
+
+
+def read_segment(view, offset: int, length: int, hasher=None) -> bytes:
+    """
+    Copies `length` bytes of a blob view starting at `offset`, e.g. to send them over the network,
+    feeding them to an optional `DataHasher` on the way. Blocking on the first access to pages
+    that are not in memory yet, meant to run on the I/O threads.
+    """
+    segment = view[offset : offset + length]
+    try:
+        if hasher is not None:
+            hasher.update(segment)
+        return bytes(segment)
+    finally:
+        segment.release()
+
+
+async def precompute_storage_proof(r, chunk_hash, hotkey, filepath, seed):
+    """
+    Hashes a stored blob with its current seed off the event loop and stores the result with
+    the chunk metadata, so the next challenge or retrieve does not have to hash the whole blob.
+
+    Parameters:
+    - r (redis.Redis): The Redis connection instance.
+    - chunk_hash (str): The unique hash identifying the chunk.
+    - hotkey (str): The caller hotkey the seed belongs to.
+    - filepath (str or BlobRange): The location of the blob on disk.
+    - seed (str): The seed just written for this chunk and hotkey.
+
+    Returns:
+    - bool: True if the proof was stored, False if the seed changed in the meantime.
+    """
+    proof = await asyncio.to_thread(hash_blob, filepath, str(seed).encode())
+    return await update_proof_info(r, chunk_hash, hotkey, str(seed), proof)
 
 
 def init_wandb(self, reinit=False):
@@ -265,14 +393,57 @@ def update_storage_stats(self):
     This function updates the miner's storage statistics, including the free disk space, current storage usage,
     and percent disk usage. It's useful for understanding the storage capacity and usage of the system where
     the miner is running.
+
+    The storage usage is read from the storage ledger through the miner's blocking Redis client. Until the
+    ledger has been reconciled with the index, see `bootstrap_storage_ledger`, the data directory is walked instead.
     """
 
-    self.free_memory = get_free_disk_space(self.config.database.directory)
+    self.free_memory = self.blob_store.disks.usage()["free_bytes"]
     bt.logging.info(f"Free memory: {self.free_memory} bytes")
-    self.current_storage_usage = get_directory_size(self.config.database.directory)
+    for disk in self.blob_store.disks.stats():
+        bt.logging.info(
+            f"Data directory {disk['directory']}: {disk['free_bytes']} of {disk['total_bytes']} bytes free, "
+            f"{disk['placed']} blobs placed, {disk['pending']} writes in flight"
+        )
+    reconciled = self.sync_database.exists(STORAGE_LEDGER_RECONCILED_KEY)
+    ledger_bytes = self.sync_database.hget(STORAGE_LEDGER_KEY, "disk_bytes")
+    if reconciled and ledger_bytes is not None:
+        self.current_storage_usage = int(ledger_bytes)
+    else:
+        bt.logging.warning(
+            "Storage ledger not built yet, walking the data directory."
+        )
+        self.current_storage_usage = sum(
+            get_directory_size(root.directory) for root in self.blob_store.disks.roots
+        )
     bt.logging.info(f"Miner storage usage: {self.current_storage_usage} bytes")
     self.percent_disk_usage = self.current_storage_usage / (self.free_memory + self.current_storage_usage)
     bt.logging.info(f"Miner % disk usage : {100 * self.percent_disk_usage:.3f}%")
+    scheduler_stats = self.scheduler.stats()
+    bt.logging.info(f"Work queue depth: {scheduler_stats['queue_depth']}")
+    for kind, stats in scheduler_stats["types"].items():
+        bt.logging.info(
+            f"{kind} work: {stats['completed']} done, {stats['dropped']} dropped, "
+            f"wait {stats['wait_time']:.3f}s (max {stats['max_wait_time']:.3f}s), "
+            f"run {stats['run_time']:.3f}s"
+        )
+    admission_stats = self.admission.stats()
+    bt.logging.info(
+        f"Challenge admission: {admission_stats['decisions']}, "
+        f"outstanding {admission_stats['outstanding']:.3f}s, "
+        f"commit cost {1000 * admission_stats['commit_cost']:.3f}ms"
+    )
+    for hotkey, stats in admission_stats["validators"].items():
+        bt.logging.debug(
+            f"{hotkey}: consumed {stats['consumed']:.3f}s of {stats['budget']:.3f}s CPU"
+        )
+    if self.blob_store.cache is not None:
+        stats = self.blob_store.cache.stats()
+        bt.logging.info(
+            f"Blob cache: {stats['blobs']} blobs, {stats['bytes']} bytes, "
+            f"hit rate {100 * stats['hit_rate']:.1f}% ({stats['hits']} hits, "
+            f"{stats['misses']} misses, {stats['evictions']} evictions)"
+        )
 
 
 def load_request_log(request_log_path: str) -> dict:
@@ -299,43 +470,91 @@ def load_request_log(request_log_path: str) -> dict:
     return request_log
 
 
-def log_request(synapse: "bt.Synapse", request_log: dict):
+def log_request(synapse: "bt.Synapse", request_log: dict, max_entries: int = 1000):
     """
     Log the request and store the timestamp of each request.
 
     Args:
         synapse (bt.Synapse): The synapse object with the request details.
         request_log (dict): The dictionary to log request timestamps.
+        max_entries (int): The number of most recent requests kept per caller.
 
     The function logs the time of each request in the request log and the request type.
+    Only the `max_entries` most recent requests of each caller are kept.
     """
     current_time = time.time()
     caller = synapse.dendrite.hotkey
-    if caller not in request_log:
-        request_log[caller] = []
+    entries = request_log.get(caller)
+    if not isinstance(entries, deque) or entries.maxlen != max_entries:
+        entries = request_log[caller] = deque(entries or (), maxlen=max_entries)
 
-    request_log[caller].append((synapse.name, current_time))
+    entries.append((synapse.name, current_time))
     return request_log
 
 
+def compute_stake_weights(hotkeys, stakes, min_weight: float = 0.1, max_weight: float = 10.0) -> dict:
+    """
+    Computes the rate limit weight of every hotkey from its stake.
+
+    Parameters:
+    - hotkeys (list): The hotkeys of the metagraph.
+    - stakes (list): The stake of each hotkey.
+    - min_weight (float): The weight of hotkeys without stake, and the lowest weight given out.
+    - max_weight (float): The highest weight given out.
+
+    Returns:
+    - dict: The weight of each hotkey, its stake relative to the mean stake of the staked hotkeys,
+      clipped to [min_weight, max_weight].
+    """
+    staked = [float(stake) for stake in stakes if stake > 0]
+    mean_stake = sum(staked) / len(staked) if staked else 0.0
+    weights = {}
+    for hotkey, stake in zip(hotkeys, stakes):
+        weight = float(stake) / mean_stake if mean_stake else 1.0
+        weights[hotkey] = min(max_weight, max(min_weight, weight))
+    return weights
+
+
 class RateLimiter:
-    def __init__(self, max_requests, time_window):
+    """
+    Per caller token bucket rate limiter.
+
+    Every caller has a bucket of up to `max_requests * weight` tokens, refilled continuously at
+    `max_requests * weight / time_window` tokens per second, and each request takes one token.
+    Buckets are created on first use and updated lazily when the caller makes a request, so a
+    check is O(1). At most `max_callers` buckets are kept, evicting the least recently seen caller.
+
+    Attributes:
+        max_requests (int): The number of requests a caller of weight 1 can make per time window.
+        time_window (float): The time window in seconds.
+        max_callers (int): The maximum number of buckets kept in memory.
+    """
+
+    def __init__(self, max_requests, time_window, max_callers: int = 1024):
         self.max_requests = max_requests
         self.time_window = time_window
-        self.requests = deque()
-
-    def is_allowed(self, caller):
-        current_time = time.time()
-        while (
-            self.requests
-            and current_time - self.requests[0]["timestamp"] > self.time_window
-        ):
-            self.requests.popleft()
-
-        if len(self.requests) < self.max_requests:
-            self.requests.append({"caller": caller, "timestamp": current_time})
-            return True
-        else:
+        self.max_callers = max_callers
+        self.buckets = OrderedDict()  # caller -> [tokens, last refill time]
+        self.lock = threading.Lock()
+
+    def is_allowed(self, caller, weight: float = 1.0) -> bool:
+        capacity = self.max_requests * weight
+        current_time = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(caller)
+            if bucket is None:
+                bucket = self.buckets[caller] = [capacity, current_time]
+                if len(self.buckets) > self.max_callers:
+                    self.buckets.popitem(last=False)
+            else:
+                self.buckets.move_to_end(caller)
+                elapsed = current_time - bucket[1]
+                bucket[0] = min(capacity, bucket[0] + elapsed * capacity / self.time_window)
+                bucket[1] = current_time
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
             return False
 
 
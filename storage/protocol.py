@@ -16,6 +16,8 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import json
+import struct
 import typing
 import pydantic
 import bittensor as bt
@@ -34,6 +36,9 @@ class Store(bt.Synapse):
     seed: typing.Union[
         str, int, bytes
     ]  # random seed (bytes stored as hex) for the commitment
+    point_encoding: typing.Optional[
+        int
+    ] = None  # newest point encoding understood by the validator, see storage.shared.ecc
 
     # Return signature of received data
     randomness: typing.Optional[int] = None
@@ -100,10 +105,13 @@ class Challenge(bt.Synapse):
     h: str  # random point (hex string representation)
     curve: str
     seed: typing.Union[str, int]  # random seed for the commitment
+    point_encoding: typing.Optional[
+        int
+    ] = None  # newest point encoding understood by the validator, see storage.shared.ecc
 
     # Returns
     # - commitment hash (hex string) hash( hash( data + prev_seed ) + seed )
-    # - commitment (point represented as hex string)
+    # - commitment (point represented as hex string, in the negotiated point encoding)
     # - data chunk (base64 encoded string of bytes)
     # - random value (int)
     # - merkle proof (List[Dict[<left|right>, hex strings])
@@ -184,6 +192,112 @@ class Retrieve(bt.Synapse):
         )
 
 
+# Frames of a RetrieveStream response: the frame kind and the payload length, then the payload
+STREAM_FRAME_HEADER = struct.Struct("<BI")
+STREAM_FRAME_DATA = 0  # the raw bytes of the next segment of the blob
+STREAM_FRAME_TRAILER = 1  # JSON commitment hash and proof (or error), ends the stream
+STREAM_SEGMENT_SIZE = 2**20  # bytes of the blob per data frame
+
+
+def encode_stream_frame(kind: int, payload: bytes) -> bytes:
+    """
+    Frames a payload of a RetrieveStream response.
+    """
+    return STREAM_FRAME_HEADER.pack(kind, len(payload)) + payload
+
+
+class RetrieveStream(bt.StreamingSynapse):
+    """
+    Streaming variant of `Retrieve`. The miner sends the raw blob in framed segments of at most
+    STREAM_SEGMENT_SIZE bytes instead of one base64 field, followed by a trailer frame carrying the
+    commitment hash and proof, so neither side holds encoded copies of the whole blob in memory.
+
+    Iterating the dendrite response yields the segments as they arrive (see
+    `storage.validator.verify.verify_retrieve_stream` on the validator side), and the trailer
+    fields are set on the synapse once the stream ends.
+    """
+
+    # Where to find the data
+    data_hash: str  # Miner storage lookup key
+    seed: str  # New random seed to hash the data with
+
+    # Proof sent in the trailer of the stream
+    size: typing.Optional[int] = None  # bytes of data streamed by the miner
+    commitment_hash: typing.Optional[str] = None
+    commitment_proof: typing.Optional[str] = None
+    error: typing.Optional[str] = None  # set by the miner instead of the proof on failure
+
+    required_hash_fields: typing.List[str] = pydantic.Field(
+        ["data_hash", "seed"],
+        title="Required Hash Fields",
+        description="A list of required fields for the hash.",
+        allow_mutation=False,
+    )
+
+    async def process_streaming_response(self, response):
+        """
+        Parses the frames of the response body, yielding the data segments and setting the
+        trailer fields. A stream cut before its trailer leaves them unset.
+        """
+        reader = response.content
+        while True:
+            try:
+                header = await reader.readexactly(STREAM_FRAME_HEADER.size)
+                kind, length = STREAM_FRAME_HEADER.unpack(header)
+                payload = await reader.readexactly(length)
+            except Exception as e:
+                bt.logging.debug(f"RetrieveStream for {self.data_hash[:12]} cut short: {e}")
+                return
+            if kind == STREAM_FRAME_DATA:
+                yield payload
+            elif kind == STREAM_FRAME_TRAILER:
+                trailer = json.loads(payload)
+                self.size = trailer.get("size")
+                self.commitment_hash = trailer.get("commitment_hash")
+                self.commitment_proof = trailer.get("commitment_proof")
+                self.error = trailer.get("error")
+                return
+
+    def extract_response_json(self, response) -> dict:
+        headers = {
+            k.decode("utf-8"): v.decode("utf-8")
+            for k, v in response.__dict__["_raw_headers"]
+        }
+
+        def extract_info(prefix):
+            return {
+                key.split("_")[-1]: value
+                for key, value in headers.items()
+                if key.startswith(prefix)
+            }
+
+        return {
+            "name": headers.get("name", ""),
+            "timeout": float(headers.get("timeout", 0)),
+            "total_size": int(headers.get("total_size", 0)),
+            "header_size": int(headers.get("header_size", 0)),
+            "dendrite": extract_info("bt_header_dendrite"),
+            "axon": extract_info("bt_header_axon"),
+            "data_hash": self.data_hash,
+            "seed": self.seed,
+            "size": self.size,
+            "commitment_hash": self.commitment_hash,
+            "commitment_proof": self.commitment_proof,
+            "error": self.error,
+        }
+
+    def __str__(self):
+        return (
+            f"RetrieveStream(data_hash={str(self.data_hash[:12])}, "
+            f"seed={str(self.seed[:12])}, "
+            f"size={self.size}, "
+            f"commitment_hash={str(self.commitment_hash)[:12]}, "
+            f"commitment_proof={str(self.commitment_proof)[:12]})"
+            f"axon={self.axon.dict()}, "
+            f"dendrite={self.dendrite.dict()}"
+        )
+
+
 class RetrieveUser(bt.Synapse):
     # Where to find the data
     data_hash: str  # Miner storage lookup key
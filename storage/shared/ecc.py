@@ -16,10 +16,37 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER
 # DEALINGS IN THE SOFTWARE.
 
+import os
+import copy
 import binascii
+import functools
 import hashlib
+import threading
+from collections import OrderedDict
 from Crypto.Random import random
 from Crypto.PublicKey import ECC
+from Crypto.Math.Numbers import Integer
+
+
+# Window width (in bits) of the precomputed fixed-base tables
+FIXED_BASE_WINDOW_BITS = 4
+# Widest scalar the tables cover: 256-bit hashes and randomness drawn from [1, 2**256]
+FIXED_BASE_SCALAR_BITS = 257
+# Number of (g, h) tables kept per process, each one is roughly 10MB
+FIXED_BASE_CACHE_SIZE = 4
+# Number of commitments sharing (g, h) above which building a table pays off
+FIXED_BASE_MIN_COMMITS = 256
+
+# Versions of the wire encoding of curve points, negotiated through `point_encoding` in the synapses
+POINT_ENCODING_LEGACY = 0  # hexlified decimal "x,y" string
+POINT_ENCODING_COMPRESSED = 1  # hex of the compressed SEC1 encoding, 33 bytes on P-256
+# Newest point encoding understood by this release
+POINT_ENCODING_VERSION = POINT_ENCODING_COMPRESSED
+# Number of decoded points kept per process, the (g, h) of a challenge are decoded several times
+POINT_CACHE_SIZE = 4096
+
+_fixed_base_tables = OrderedDict()
+_fixed_base_lock = threading.Lock()
 
 
 def hash_data(data):
@@ -30,7 +57,7 @@ def hash_data(data):
     strings and then encoding to bytes before hashing.
 
     Parameters:
-    - data (bytes | bytearray | object): Data to be hashed.
+    - data (bytes | bytearray | memoryview | object): Data to be hashed.
 
     Returns:
     - int: Integer representation of the SHA3-256 hash of the input data.
@@ -38,11 +65,91 @@ def hash_data(data):
     Raises:
     - TypeError: If the hashing operation encounters an incompatible data type.
     """
-    if not isinstance(data, (bytes, bytearray)):
+    if not isinstance(data, (bytes, bytearray, memoryview)):
         data_str = str(data)
         data = data_str.encode()
-    h = hashlib.sha3_256(data).hexdigest()
-    return int(h, 16)
+    return int.from_bytes(hashlib.sha3_256(data).digest(), "big")
+
+
+class DataHasher:
+    """
+    Incremental SHA3-256 hasher producing the same integer representation as `hash_data`.
+
+    Data can be fed piecewise from buffers, iterables of buffers or files, so proofs over large
+    blobs followed by a seed never need the `data + seed` concatenation in memory.
+
+    Methods:
+        update(data): Feeds a bytes-like object (or any object, encoded like `hash_data` does).
+        update_iterable(parts): Feeds every element of an iterable in order.
+        update_file(filepath): Feeds the contents of a file, read in fixed size blocks.
+        intdigest(): Returns the integer representation of the hash of everything fed so far.
+
+    Example:
+        >>> DataHasher(data).update(seed).intdigest() == hash_data(data + seed)
+        True
+    """
+
+    def __init__(self, data=None):
+        self._hash = hashlib.sha3_256()
+        if data is not None:
+            self.update(data)
+
+    def update(self, data):
+        if not isinstance(data, (bytes, bytearray, memoryview)):
+            data = str(data).encode()
+        self._hash.update(data)
+        return self
+
+    def update_iterable(self, parts):
+        for part in parts:
+            self.update(part)
+        return self
+
+    def update_file(self, filepath, block_size=1024 * 1024):
+        buffer = bytearray(block_size)
+        view = memoryview(buffer)
+        with open(os.path.expanduser(filepath), "rb") as file:
+            while True:
+                n_read = file.readinto(buffer)
+                if not n_read:
+                    break
+                self._hash.update(view[:n_read])
+        return self
+
+    def copy(self):
+        hasher = DataHasher()
+        hasher._hash = self._hash.copy()
+        return hasher
+
+    def intdigest(self):
+        return int.from_bytes(self._hash.digest(), "big")
+
+
+def hash_stream(parts):
+    """
+    Compute the `hash_data` integer of the concatenation of `parts` without concatenating them.
+
+    Parameters:
+    - parts (iterable): Bytes-like objects (or objects hashed like `hash_data` does) to be hashed in order.
+
+    Returns:
+    - int: Integer representation of the SHA3-256 hash, equal to `hash_data(b"".join(parts))`.
+    """
+    return DataHasher().update_iterable(parts).intdigest()
+
+
+def hash_file(filepath, *suffixes):
+    """
+    Compute the `hash_data` integer of a file's contents followed by optional suffixes (e.g. a seed).
+
+    Parameters:
+    - filepath (str): The path of the file to hash.
+    - *suffixes (bytes): Data hashed after the file contents.
+
+    Returns:
+    - int: Integer representation of the SHA3-256 hash, equal to `hash_data(file_contents + b"".join(suffixes))`.
+    """
+    return DataHasher().update_file(filepath).update_iterable(suffixes).intdigest()
 
 
 def setup_CRS(curve="P-256"):
@@ -67,7 +174,38 @@ def setup_CRS(curve="P-256"):
     return g, h
 
 
-def ecc_point_to_hex(point):
+def point_encoding(hex_str):
+    """
+    Detect the encoding of a hex encoded elliptic curve point.
+
+    Compressed SEC1 points start with the 02 or 03 prefix byte, while the legacy "x,y" form starts
+    with the hex of an ASCII digit, so the two encodings never collide.
+
+    Parameters:
+    - hex_str (str): The hex string representing an elliptic curve point.
+
+    Returns:
+    - int: POINT_ENCODING_COMPRESSED or POINT_ENCODING_LEGACY.
+    """
+    if hex_str[:2] in ("02", "03"):
+        return POINT_ENCODING_COMPRESSED
+    return POINT_ENCODING_LEGACY
+
+
+def negotiate_point_encoding(requested):
+    """
+    Pick the newest point encoding understood by both the requester and this release.
+
+    Parameters:
+    - requested (int): The newest encoding understood by the requester, None for old requesters.
+
+    Returns:
+    - int: The encoding to answer with.
+    """
+    return max(POINT_ENCODING_LEGACY, min(requested or POINT_ENCODING_LEGACY, POINT_ENCODING_VERSION))
+
+
+def ecc_point_to_hex(point, encoding=POINT_ENCODING_LEGACY):
     """
     Convert an elliptic curve point to a hexadecimal string.
 
@@ -76,6 +214,8 @@ def ecc_point_to_hex(point):
 
     Parameters:
     - point (ECC.EccPoint): An ECC point to convert.
+    - encoding (int, optional): The point encoding to use; defaults to the legacy "x,y" form, which
+      every peer understands. The compressed SEC1 form is about four times smaller.
 
     Returns:
     - str: Hexadecimal string representing the elliptic curve point.
@@ -83,7 +223,11 @@ def ecc_point_to_hex(point):
     Raises:
     - AttributeError: If the input is not a valid ECC point with accessible x and y coordinates.
     """
-    point_str = "{},{}".format(point.x, point.y)
+    x, y = point.xy
+    if encoding >= POINT_ENCODING_COMPRESSED:
+        prefix = "03" if int(y) & 1 else "02"
+        return prefix + format(int(x), "0{}x".format(2 * point.size_in_bytes()))
+    point_str = "{},{}".format(x, y)
     return binascii.hexlify(point_str.encode()).decode()
 
 
@@ -92,6 +236,8 @@ def hex_to_ecc_point(hex_str, curve):
     Convert a hexadecimal string back into an elliptic curve point.
 
     This function is typically used to deserialize an ECC point that has been transmitted or stored as a hex string.
+    Both the legacy and the compressed encodings are accepted. Decoded points are cached per process,
+    so repeated parses of the same point only cost a copy.
 
     Parameters:
     - hex_str (str): The hex string representing an elliptic curve point.
@@ -103,11 +249,191 @@ def hex_to_ecc_point(hex_str, curve):
     Raises:
     - ValueError: If the hex string is not properly formatted or does not represent a valid point on the specified curve.
     """
+    return clone_point(_decode_point(hex_str, curve))
+
+
+@functools.lru_cache(maxsize=POINT_CACHE_SIZE)
+def _decode_point(hex_str, curve):
+    if point_encoding(hex_str) == POINT_ENCODING_COMPRESSED:
+        return _decompress_point(bytes.fromhex(hex_str), curve)
     point_str = binascii.unhexlify(hex_str).decode()
     x, y = map(int, point_str.split(","))
     return ECC.EccPoint(x, y, curve=curve)
 
 
+def _decompress_point(data, curve):
+    params = ECC._curves[curve]
+    p = params.p
+    if len(data) != 1 + (params.modulus_bits + 7) // 8:
+        raise ValueError("Invalid length of compressed point")
+    if int(p) % 4 != 3:
+        return ECC.import_key(data, curve_name=curve).pointQ
+
+    # y^2 = x^3 - 3x + b on the NIST curves, whose square roots are a single exponentiation
+    x = Integer.from_bytes(data[1:])
+    y = pow((x * x * x - x * 3 + params.b) % p, (p + 1) >> 2, p)
+    if y.is_odd() != bool(data[0] & 1):
+        y = p - y
+    # Raises ValueError when x is not on the curve, as y^2 then differs from the right hand side
+    return ECC.EccPoint(x, y, curve=curve)
+
+
+def clone_point(point):
+    """
+    Return an independent copy of an elliptic curve point.
+
+    `ECC.EccPoint.copy` round-trips through the affine coordinates and re-validates the point,
+    which costs about as much as a point multiplication. Cloning the native point directly is
+    two orders of magnitude cheaper.
+
+    Parameters:
+    - point (ECC.EccPoint): The point to copy.
+
+    Returns:
+    - ECC.EccPoint: A new point equal to the input which can be modified in place.
+    """
+    return copy.copy(point).set(point)
+
+
+def mul_add(g, m, h, r):
+    """
+    Compute g*m + h*r without a precomputed table.
+
+    Both products are computed in place on cloned points, which avoids the three affine
+    round-trips made by the `*` and `+` operators of `ECC.EccPoint`.
+
+    Parameters:
+    - g (ECC.EccPoint): The first base point.
+    - m (int): The scalar for the first base point.
+    - h (ECC.EccPoint): The second base point.
+    - r (int): The scalar for the second base point.
+
+    Returns:
+    - ECC.EccPoint: The point g*m + h*r.
+    """
+    c = clone_point(g)
+    c *= m
+    c2 = clone_point(h)
+    c2 *= r
+    c += c2
+    return c
+
+
+class FixedBaseTable:
+    """
+    Precomputed joint window table for simultaneous two-base scalar multiplication (Shamir's trick)
+    with fixed base points g and h.
+
+    For each window i the table holds every combination a*2^(w*i)*g + b*2^(w*i)*h with a, b < 2^w,
+    so g*m + h*r is obtained with a single point addition per window and no doubling at all.
+
+    Attributes:
+        g (ECC.EccPoint): The first base point.
+        h (ECC.EccPoint): The second base point.
+        window_bits (int): The width of each window, in bits.
+        scalar_bits (int): The widest scalar supported by the table.
+        windows (list): One list of 2^(2w) points per window, the zero entry is None.
+    """
+
+    def __init__(
+        self,
+        g,
+        h,
+        window_bits=FIXED_BASE_WINDOW_BITS,
+        scalar_bits=FIXED_BASE_SCALAR_BITS,
+    ):
+        self.g = g
+        self.h = h
+        self.window_bits = window_bits
+        self.scalar_bits = scalar_bits
+        self.windows = []
+
+        width = 1 << window_bits
+        base_g = clone_point(g)
+        base_h = clone_point(h)
+        for _ in range(-(-scalar_bits // window_bits)):
+            window = [None] * (width * width)
+            for a in range(width):
+                for b in range(width):
+                    if b > 0:
+                        previous = window[(a << window_bits) | (b - 1)]
+                        point = clone_point(base_h)
+                        if previous is not None:
+                            point += previous
+                    elif a > 0:
+                        previous = window[(a - 1) << window_bits]
+                        point = clone_point(base_g)
+                        if previous is not None:
+                            point += previous
+                    else:
+                        continue
+                    window[(a << window_bits) | b] = point
+            self.windows.append(window)
+
+            for _ in range(window_bits):
+                base_g.double()
+                base_h.double()
+
+    def mul_add(self, m, r):
+        """
+        Compute g*m + h*r from the table.
+
+        Parameters:
+        - m (int): The scalar for g.
+        - r (int): The scalar for h.
+
+        Returns:
+        - ECC.EccPoint: The point g*m + h*r, or None if a scalar is too wide for the table.
+        """
+        if m < 0 or r < 0 or max(m, r).bit_length() > self.scalar_bits:
+            return None
+
+        bits = self.window_bits
+        mask = (1 << bits) - 1
+        c = None
+        for window in self.windows:
+            index = ((m & mask) << bits) | (r & mask)
+            m >>= bits
+            r >>= bits
+            if index:
+                if c is None:
+                    c = clone_point(window[index])
+                else:
+                    c += window[index]
+
+        if c is None:
+            return self.g.point_at_infinity()
+        return c
+
+
+def get_fixed_base_table(g, h):
+    """
+    Fetch the precomputed table for (g, h) from the process-wide LRU cache, building it on a miss.
+
+    Parameters:
+    - g (ECC.EccPoint): The first base point.
+    - h (ECC.EccPoint): The second base point.
+
+    Returns:
+    - FixedBaseTable: The table for (g, h).
+    """
+    key = tuple(int(v) for v in g.xy + h.xy)
+    with _fixed_base_lock:
+        table = _fixed_base_tables.get(key)
+        if table is not None:
+            _fixed_base_tables.move_to_end(key)
+            return table
+
+    table = FixedBaseTable(g, h)
+
+    with _fixed_base_lock:
+        _fixed_base_tables[key] = table
+        _fixed_base_tables.move_to_end(key)
+        while len(_fixed_base_tables) > FIXED_BASE_CACHE_SIZE:
+            _fixed_base_tables.popitem(last=False)
+    return table
+
+
 class ECCommitment:
     """
     Elliptic Curve based commitment scheme allowing one to commit to a chosen value while keeping it hidden to others.
@@ -116,17 +442,34 @@ class ECCommitment:
         g (ECC.EccPoint): The base point of the elliptic curve used as part of the commitment.
         h (ECC.EccPoint): Another random point on the elliptic curve used as part of the commitment.
 
+        table (FixedBaseTable | None): Precomputed table for (g, h), used when `precompute` is set.
+
     Methods:
         commit(m): Accepts a message, hashes it, and produces a commitment to the hashed message.
+        commit_hashed(m_val): Produces a commitment to a message that has already been hashed.
         open(c, m_val, r): Accepts a commitment, a hashed message, and a random value to verify the commitment.
 
+    Set `precompute` when many commitments share the same (g, h), e.g. every chunk of a challenge.
+    The table is cached per process, so later committers for the same points reuse it.
+
     The `commit` method will print the commitment process, and the `open` method will print the verification process.
     """
 
-    def __init__(self, g, h, verbose=False):
+    def __init__(self, g, h, verbose=False, precompute=False):
         self.g = g  # Base point of the curve
         self.h = h  # Another random point on the curve
         self.verbose = verbose
+        self.table = get_fixed_base_table(g, h) if precompute else None
+
+    def _mul_add(self, m_val, r):
+        """
+        Compute g*m_val + h*r, through the precomputed table when available.
+        """
+        if self.table is not None:
+            c = self.table.mul_add(m_val, r)
+            if c is not None:
+                return c
+        return mul_add(self.g, m_val, self.h, r)
 
     def commit(self, m):  # AKA Seal.
         """
@@ -148,13 +491,28 @@ class ECCommitment:
         - Exception: If the commitment calculation fails.
         """
         m_val = hash_data(m)  # Compute hash of the data
+        if self.verbose:
+            print(f"Committing: Data = {m}")
+        return self.commit_hashed(m_val)
+
+    def commit_hashed(self, m_val):
+        """
+        Create a cryptographic commitment to an already hashed message.
+
+        This lets callers hash the message incrementally (e.g. with `hash_stream`) instead of
+        building it in memory first.
+
+        Parameters:
+        - m_val (int): The integer value of the hashed message, as returned by `hash_data`.
+
+        Returns:
+        - tuple: A 3-tuple (commitment, hashed message value, random number used in the commitment).
+        """
         r = random.randint(1, 2**256)
-        c1 = self.g.__mul__(m_val)
-        c2 = self.h.__mul__(r)
-        c = c1.__add__(c2)
+        c = self._mul_add(m_val, r)
         if self.verbose:
             print(
-                f"Committing: Data = {m}\nHashed Value = {m_val}\nRandom Value = {r}\nComputed Commitment = {c}\n"
+                f"Hashed Value = {m_val}\nRandom Value = {r}\nComputed Commitment = {c}\n"
             )
         return c, m_val, r
 
@@ -179,9 +537,7 @@ class ECCommitment:
         Raises:
         - Exception: If the verification calculation fails.
         """
-        c1 = self.g.__mul__(m_val)
-        c2 = self.h.__mul__(r)
-        computed_c = c1.__add__(c2)
+        computed_c = self._mul_add(m_val, r)
         if self.verbose:
             print(
                 f"\nOpening: Hashed Value = {m_val}\nRandom Value = {r}\nRecomputed Commitment = {computed_c}\nOriginal Commitment = {c}"
@@ -93,11 +93,12 @@ def chunk_data(data: bytes, chunksize: int) -> List[bytes]:
     Generator function that chunks the given data into pieces of a specified size.
 
     Args:
-        data (bytes): The binary data to be chunked.
+        data (bytes | memoryview): The binary data to be chunked. Chunks of a memoryview are
+            views themselves, so no data is copied.
         chunksize (int): The size of each chunk in bytes.
 
     Yields:
-        bytes: A chunk of the data with the size equal to 'chunksize' or the remaining size of data.
+        bytes | memoryview: A chunk of the data with the size equal to 'chunksize' or the remaining size of data.
 
     Raises:
         ValueError: If 'chunksize' is less than or equal to 0.
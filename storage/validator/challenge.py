@@ -29,8 +29,13 @@ from Crypto.Random import get_random_bytes, random
 from storage import protocol
 from storage.constants import CHALLENGE_FAILURE_REWARD
 from storage.validator.event import EventSchema
-from storage.shared.ecc import setup_CRS, ecc_point_to_hex
-from storage.validator.utils import get_random_chunksize, get_available_query_miners
+from storage.shared.ecc import setup_CRS, ecc_point_to_hex, POINT_ENCODING_VERSION
+from storage.validator.utils import (
+    get_random_chunksize,
+    get_available_query_miners,
+    get_point_encoding,
+    record_point_encoding,
+)
 from storage.validator.verify import verify_challenge_with_seed
 from storage.validator.reward import apply_reward_scores
 from storage.validator.database import (
@@ -105,15 +110,17 @@ async def handle_challenge(self, uid: int) -> typing.Tuple[bool, protocol.Challe
 
     # Setup new Common-Reference-String for this challenge
     g, h = setup_CRS()
+    encoding = get_point_encoding(self, [hotkey])
 
     synapse = protocol.Challenge(
         challenge_hash=data_hash,
         chunk_size=chunk_size,
-        g=ecc_point_to_hex(g),
-        h=ecc_point_to_hex(h),
+        g=ecc_point_to_hex(g, encoding),
+        h=ecc_point_to_hex(h, encoding),
         curve="P-256",
         challenge_index=random.choice(range(num_chunks)),
         seed=get_random_bytes(32).hex(),
+        point_encoding=POINT_ENCODING_VERSION,
     )
 
     axon = self.metagraph.axons[uid]
@@ -127,6 +134,7 @@ async def handle_challenge(self, uid: int) -> typing.Tuple[bool, protocol.Challe
     verified = verify_challenge_with_seed(response[0], synapse.seed)
 
     if verified:
+        record_point_encoding(self, hotkey, response[0])
         data["prev_seed"] = synapse.seed
         await update_metadata_for_data_hash(hotkey, data_hash, data, self.database)
 
@@ -186,6 +186,12 @@ def add_args(cls, parser):
         help="How many async calls to limit concurrently.",
         default=256,
     )
+    parser.add_argument(
+        "--neuron.stream_retrieve",
+        action="store_true",
+        help="Retrieve data from miners with the streaming RetrieveStream protocol.",
+        default=False,
+    )
     parser.add_argument(
         "--neuron.checkpoint_block_length",
         type=int,
@@ -31,7 +31,7 @@ from storage import protocol
 from storage.constants import RETRIEVAL_FAILURE_REWARD
 from storage.shared.ecc import hash_data
 from storage.validator.event import EventSchema
-from storage.validator.verify import verify_retrieve_with_seed
+from storage.validator.verify import verify_retrieve_with_seed, verify_retrieve_stream
 from storage.validator.reward import apply_reward_scores
 from storage.validator.database import (
     get_metadata_for_hotkey,
@@ -46,7 +46,7 @@ from storage.validator.network import ping_uids, ping_and_retry_uids
 from storage.validator.reward import create_reward_vector
 
 
-async def handle_retrieve(self, uid):
+async def handle_retrieve(self, uid, keep_data=False):
     bt.logging.trace(f"handle_retrieve uid: {uid}")
     hotkey = self.metagraph.hotkeys[uid]
     keys = await self.database.hkeys(f"hotkey:{hotkey}")
@@ -58,7 +58,7 @@ async def handle_retrieve(self, uid):
             f"handle_retrieve() No data found for uid: {uid} | hotkey: {hotkey}"
         )
         # Create a dummy response to send back
-        return None, ""
+        return None, "", None, None
 
     data_hash = random.choice(keys).decode("utf-8")
     bt.logging.trace(f"handle_retrieve() data_hash: {data_hash}")
@@ -68,16 +68,33 @@ async def handle_retrieve(self, uid):
     )
     axon = self.metagraph.axons[uid]
 
-    synapse = protocol.Retrieve(
-        data_hash=data_hash,
-        seed=get_random_bytes(32).hex(),
-    )
-    response = await self.dendrite(
-        [axon],
-        synapse,
-        deserialize=False,
-        timeout=60,
-    )
+    retrieved_data = None
+    if self.config.neuron.stream_retrieve:
+        # The streamed data is verified as it arrives and only kept when asked for
+        synapse = protocol.RetrieveStream(
+            data_hash=data_hash,
+            seed=get_random_bytes(32).hex(),
+        )
+        response, verified, segments = await stream_retrieve(
+            self, axon, data_hash, synapse.seed, keep_data=keep_data
+        )
+        if response is None:
+            response = synapse
+            response.error = "No complete stream received"
+        if verified and keep_data:
+            retrieved_data = b"".join(segments)
+        response = [response]
+    else:
+        synapse = protocol.Retrieve(
+            data_hash=data_hash,
+            seed=get_random_bytes(32).hex(),
+        )
+        response = await self.dendrite(
+            [axon],
+            synapse,
+            deserialize=False,
+            timeout=60,
+        )
 
     try:
         bt.logging.trace(f"Fetching AES payload from UID: {uid}")
@@ -98,7 +115,47 @@ async def handle_retrieve(self, uid):
             f"Failed to retrieve data from UID {uid} | hotkey {hotkey} with error: {e}"
         )
 
-    return response[0], data_hash, synapse.seed
+    return response[0], data_hash, synapse.seed, retrieved_data
+
+
+async def stream_retrieve(
+    self, axon, data_hash: str, seed: str, max_size: int = None, keep_data: bool = False
+):
+    """
+    Retrieves data from one miner with the streaming RetrieveStream protocol, verifying it
+    incrementally with `verify_retrieve_stream`.
+
+    Parameters:
+        axon: The axon of the miner to query.
+        data_hash (str): The hash of the data to be retrieved.
+        seed (str): The new seed sent to the miner.
+        max_size (int, optional): The largest number of bytes accepted.
+        keep_data (bool): Whether to return the received segments.
+
+    Returns:
+        tuple: The final RetrieveStream synapse (None if the stream failed), whether it was verified,
+        and the list of data segments if `keep_data` is set.
+    """
+    synapse = protocol.RetrieveStream(data_hash=data_hash, seed=seed)
+    try:
+        responses = await self.dendrite(
+            [axon],
+            synapse,
+            deserialize=False,
+            timeout=60,
+            streaming=True,
+        )
+        return await verify_retrieve_stream(
+            responses[0],
+            data_hash,
+            seed,
+            max_size=max_size,
+            keep_data=keep_data,
+            verbose=self.config.neuron.verbose,
+        )
+    except Exception as e:
+        bt.logging.error(f"RetrieveStream of {data_hash} from {axon.hotkey} failed: {e}")
+        return None, False, None
 
 
 async def retrieve_data(
@@ -148,7 +205,11 @@ async def retrieve_data(
 
     tasks = []
     for uid in uids:
-        tasks.append(asyncio.create_task(handle_retrieve(self, uid)))
+        tasks.append(
+            asyncio.create_task(
+                handle_retrieve(self, uid, keep_data=data_hash is not None)
+            )
+        )
     response_tuples = await asyncio.gather(*tasks)
 
     if self.config.neuron.verbose and self.config.neuron.log_responses:
@@ -156,7 +217,7 @@ async def retrieve_data(
             bt.logging.trace(
                 f"Retrieve response: {uid} | {pformat(response.axon.dict())}"
             )
-            for uid, (response, _, _) in zip(uids, response_tuples)
+            for uid, (response, _, _, _) in zip(uids, response_tuples)
         ]
     rewards: torch.FloatTensor = torch.zeros(
         len(response_tuples), dtype=torch.float32
@@ -164,7 +225,7 @@ async def retrieve_data(
 
     times = [
         response.dendrite.process_time or 60
-        for response, _, _ in response_tuples
+        for response, _, _, _ in response_tuples
     ]
     bt.logging.debug(f"Dendrite Times: {times}")
     sorted_times = sorted(list(zip(uids, times)), key=lambda x: x[1])
@@ -178,7 +239,7 @@ async def retrieve_data(
 
     decoded_data = b""
     data_sizes = []
-    for idx, (uid, (response, data_hash, seed)) in enumerate(
+    for idx, (uid, (response, data_hash, seed, retrieved_data)) in enumerate(
         zip(uids, response_tuples)
     ):
         hotkey = self.metagraph.hotkeys[uid]
@@ -187,11 +248,39 @@ async def retrieve_data(
             bt.logging.debug(f"No response: skipping retrieve for uid {uid}")
             continue  # We don't have any data for this hotkey, skip it.
 
+        # Get the tier factor for this miner to determine the total reward
+        tier_factor = await get_tier_factor(hotkey, self.database, in_top_2=in_top_2_dict.get(uid, False))
+
+        if isinstance(response, protocol.RetrieveStream):
+            # The stream was hashed and verified against data_hash and the seed as it arrived
+            data_sizes.append(response.size or 0)
+            success = response.error is None
+            if not success:
+                bt.logging.error(
+                    f"retrieve() Streamed data from UID {uid} failed verification: {response.error}"
+                )
+                rewards[idx] = RETRIEVAL_FAILURE_REWARD * tier_factor
+            else:
+                rewards[idx] = 1.0 * tier_factor
+                if retrieved_data is not None:
+                    decoded_data = retrieved_data
+            await update_statistics(
+                ss58_address=hotkey,
+                success=success,
+                task_type="retrieve",
+                database=self.database,
+            )
+            event.uids.append(uid)
+            event.successful.append(success)
+            event.completion_times.append(time.time() - start_time)
+            event.task_status_messages.append(response.dendrite.status_message)
+            event.task_status_codes.append(response.dendrite.status_code)
+            event.rewards.append(rewards[idx].item())
+            continue
+
         # Collect data sizes from responses
         data_sizes.append(sys.getsizeof(response.data))
 
-        # Get the tier factor for this miner to determine the total reward
-        tier_factor = await get_tier_factor(hotkey, self.database, in_top_2=in_top_2_dict.get(uid, False))
         try:
             decoded_data = base64.b64decode(response.data)
         except Exception as e:
@@ -312,18 +401,49 @@ async def retrieve_broadband(self, full_hash: str):
             moving_averaged_scores=[],
         )
 
-        synapse = protocol.Retrieve(
-            data_hash=chunk_hash,
-            seed=get_random_bytes(32).hex(),
-        )
-
         axons = [self.metagraph.axons[uid] for uid in uids]
-        responses = await self.dendrite(
-            axons,
-            synapse,
-            deserialize=False,
-            timeout=60,
-        )
+        segments = None
+        if self.config.neuron.stream_retrieve:
+            synapse = protocol.RetrieveStream(
+                data_hash=chunk_hash,
+                seed=get_random_bytes(32).hex(),
+            )
+            results = await asyncio.gather(
+                *[
+                    stream_retrieve(
+                        self,
+                        axon,
+                        chunk_hash,
+                        synapse.seed,
+                        max_size=chunk_size,
+                        keep_data=True,
+                    )
+                    for axon in axons
+                ]
+            )
+            responses = []
+            for axon, (response, verified, data) in zip(axons, results):
+                if response is None:
+                    response = protocol.RetrieveStream(
+                        data_hash=chunk_hash,
+                        seed=synapse.seed,
+                        error="No complete stream received",
+                    )
+                    response.axon.hotkey = axon.hotkey
+                if verified and segments is None:
+                    segments = data
+                responses.append(response)
+        else:
+            synapse = protocol.Retrieve(
+                data_hash=chunk_hash,
+                seed=get_random_bytes(32).hex(),
+            )
+            responses = await self.dendrite(
+                axons,
+                synapse,
+                deserialize=False,
+                timeout=60,
+            )
 
         # Compute the rewards for the responses given proc time.
         rewards: torch.FloatTensor = torch.zeros(
@@ -358,7 +478,7 @@ async def retrieve_broadband(self, full_hash: str):
             event.best_uid = event.uids[best_index]
             event.best_hotkey = self.metagraph.hotkeys[event.best_uid]
 
-        return responses, synapse.seed
+        return responses, synapse.seed, segments
 
     # Get the chunks you need to reconstruct IN order
     ordered_metadata = await get_ordered_metadata(full_hash, self.database)
@@ -399,7 +519,11 @@ async def retrieve_broadband(self, full_hash: str):
 
         chunks = {}
         # TODO: make these asyncio tasks and use .to_thread() to avoid blocking
-        for i, (response_group, seed) in enumerate(responses):
+        for i, (response_group, seed, segments) in enumerate(responses):
+            if segments is not None:
+                # Streamed chunks were verified as they arrived, keep the first verified one
+                chunks[i] = b"".join(segments)
+                continue
             for response in response_group:
                 if response.dendrite.status_code != 200:
                     bt.logging.debug(f"failed response: {response.axon.dict()}")
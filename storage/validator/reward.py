@@ -31,6 +31,7 @@ from storage.validator.verify import (
     verify_retrieve_with_seed,
 )
 from storage.validator.bonding import update_statistics, get_tier_factor
+from storage.validator.utils import record_point_encoding
 from storage.validator.event import EventSchema
 
 from storage.constants import (
@@ -38,7 +39,7 @@ from storage.constants import (
     RETRIEVAL_FAILURE_REWARD,
     CHALLENGE_FAILURE_REWARD,
 )
-from storage.protocol import Store, Retrieve, Challenge
+from storage.protocol import Store, Retrieve, RetrieveStream, Challenge
 
 
 def adjusted_sigmoid(x, steepness=1, shift=0):
@@ -250,7 +251,7 @@ def apply_reward_scores(
 
 async def create_reward_vector(
     self,
-    synapse: Union[Store, Retrieve, Challenge],
+    synapse: Union[Store, Retrieve, RetrieveStream, Challenge],
     rewards: torch.FloatTensor,
     uids: List[int],
     responses: List[Synapse],
@@ -272,6 +273,11 @@ async def create_reward_vector(
         verify_fn = partial(verify_retrieve_with_seed, seed=synapse.seed)
         task_type = "retrieve"
         failure_reward = RETRIEVAL_FAILURE_REWARD
+    elif isinstance(synapse, RetrieveStream):
+        # Streams are verified as they are received, see `verify_retrieve_stream`
+        verify_fn = lambda synapse: synapse.error is None
+        task_type = "retrieve"
+        failure_reward = RETRIEVAL_FAILURE_REWARD
     elif isinstance(synapse, Challenge):
         verify_fn = partial(verify_challenge_with_seed, seed=synapse.seed)
         task_type = "challenge"
@@ -303,6 +309,7 @@ async def create_reward_vector(
             bt.logging.debug(
                 f"Successfully verified {synapse.__class__} commitment from UID: {uid} | hotkey: {hotkey}"
             )
+            record_point_encoding(self, hotkey, response)
             await callback(hotkey, idx, uid, response)
         else:
             bt.logging.error(
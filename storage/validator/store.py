@@ -36,8 +36,10 @@ from storage.shared.ecc import (
     hash_data,
     setup_CRS,
     ecc_point_to_hex,
+    POINT_ENCODING_VERSION,
 )
 from storage.validator.utils import (
+    get_point_encoding,
     make_random_file,
     compute_chunk_distribution_mut_exclusive_numpy_reuse_uids,
 )
@@ -112,6 +114,7 @@ async def store_encrypted_data(
         h=ecc_point_to_hex(h),
         seed=get_random_bytes(32).hex(),  # 256-bit seed
         ttl=ttl or self.config.neuron.data_ttl,
+        point_encoding=POINT_ENCODING_VERSION,
     )
 
     # Select subset of miners to query (e.g. redunancy factor of N)
@@ -132,6 +135,11 @@ async def store_encrypted_data(
             # initial loop
             failed_uids = []
 
+        # Send (g, h) in the newest encoding all the selected miners understand
+        encoding = get_point_encoding(self, [self.metagraph.hotkeys[uid] for uid in uids])
+        synapse.g = ecc_point_to_hex(g, encoding)
+        synapse.h = ecc_point_to_hex(h, encoding)
+
         # Broadcast the query to selected miners on the network.
         responses = await self.dendrite(
             axons,
@@ -327,6 +335,7 @@ async def store_broadband(
             h=ecc_point_to_hex(h),
             seed=random_seed,
             ttl=ttl or self.config.neuron.data_ttl,
+            point_encoding=POINT_ENCODING_VERSION,
         )
 
         uids = [
@@ -335,6 +344,11 @@ async def store_broadband(
             if not await hotkey_at_capacity(self.metagraph.hotkeys[uid], self.database)
         ]
 
+        # Send (g, h) in the newest encoding all the selected miners understand
+        encoding = get_point_encoding(self, [self.metagraph.hotkeys[uid] for uid in uids])
+        synapse.g = ecc_point_to_hex(g, encoding)
+        synapse.h = ecc_point_to_hex(h, encoding)
+
         axons = [self.metagraph.axons[uid] for uid in uids]
         responses = await self.dendrite(
             axons,
@@ -28,7 +28,11 @@ from Crypto.Random import random
 from itertools import combinations, cycle
 from typing import List, Union
 
-from storage.shared.ecc import hash_data
+from storage.shared.ecc import (
+    hash_data,
+    point_encoding,
+    POINT_ENCODING_LEGACY,
+)
 from storage.validator.database import hotkey_at_capacity
 
 import bittensor as bt
@@ -104,6 +108,37 @@ def make_random_file(name: str = None, maxsize: int = None) -> Union[bytes, str]
         return data  # Return the data itself
 
 
+def get_point_encoding(self, hotkeys: List[str]) -> int:
+    """
+    Returns the newest point encoding understood by every given miner, as learned from their
+    responses. Miners which have not answered yet are assumed to only understand the legacy one.
+
+    Parameters:
+    - hotkeys (List[str]): The hotkeys of the miners a request is sent to.
+
+    Returns:
+    - int: The point encoding to send the (g, h) of the request in.
+    """
+    return min(
+        (self.point_encodings.get(hotkey, POINT_ENCODING_LEGACY) for hotkey in hotkeys),
+        default=POINT_ENCODING_LEGACY,
+    )
+
+
+def record_point_encoding(self, hotkey: str, response: bt.Synapse):
+    """
+    Records the point encoding of the commitment a miner answered with, which tells whether the
+    miner also understands (g, h) in that encoding.
+
+    Parameters:
+    - hotkey (str): The hotkey of the miner.
+    - response (bt.Synapse): The verified response of the miner.
+    """
+    commitment = getattr(response, "commitment", None)
+    if commitment:
+        self.point_encodings[hotkey] = point_encoding(commitment)
+
+
 # Determine a random chunksize between 512kb (random sample from this range) store as chunksize_E
 def get_random_chunksize(minsize: int = 128, maxsize: int = 1024) -> int:
     """
@@ -20,9 +20,11 @@ import base64
 from pprint import pformat
 
 from ..shared.ecc import (
-    hash_data,
+    DataHasher,
+    hash_stream,
     hex_to_ecc_point,
     ecc_point_to_hex,
+    point_encoding,
     ECCommitment,
 )
 from ..shared.merkle import (
@@ -54,7 +56,7 @@ def verify_chained_commitment(proof, seed, commitment, verbose=True):
             "Missing proof, seed, or commitment for chained commitment verification."
         )
         return False
-    expected_commitment = str(hash_data(proof.encode() + seed.encode()))
+    expected_commitment = str(hash_stream((proof.encode(), seed.encode())))
     if verbose:
         bt.logging.debug("received proof      :", proof)
         bt.logging.debug("received seed       :", seed)
@@ -97,7 +99,7 @@ def verify_challenge_with_seed(synapse, seed, verbose=False):
 
     if not committer.open(
         commitment,
-        hash_data(base64.b64decode(synapse.data_chunk) + str(seed).encode()),
+        hash_stream((base64.b64decode(synapse.data_chunk), str(seed).encode())),
         synapse.randomness,
     ):
         if verbose:
@@ -107,9 +109,10 @@ def verify_challenge_with_seed(synapse, seed, verbose=False):
             bt.logging.error(f"synapse   : {pformat(synapse.axon.dict())}")
         return False
 
+    # The leaves of the Merkle tree are the commitments in the encoding the miner answered with
     if not validate_merkle_proof(
         b64_decode(synapse.merkle_proof),
-        ecc_point_to_hex(commitment),
+        ecc_point_to_hex(commitment, point_encoding(synapse.commitment)),
         synapse.merkle_root,
     ):
         if verbose:
@@ -141,7 +144,7 @@ def verify_store_with_seed(synapse, b64_encrypted_data, seed, verbose=False):
         return False
 
     seed_value = str(seed).encode()
-    reconstructed_hash = hash_data(encrypted_data + seed_value)
+    reconstructed_hash = hash_stream((encrypted_data, seed_value))
 
     # e.g. send synapse.commitment_hash as an int for consistency
     if synapse.commitment_hash != str(reconstructed_hash):
@@ -160,7 +163,7 @@ def verify_store_with_seed(synapse, b64_encrypted_data, seed, verbose=False):
 
     if not committer.open(
         commitment,
-        hash_data(encrypted_data + str(seed).encode()),
+        reconstructed_hash,
         synapse.randomness,
     ):
         bt.logging.error(f"Opening commitment failed")
@@ -192,3 +195,63 @@ def verify_retrieve_with_seed(synapse, seed, verbose=False):
         return False
 
     return True
+
+
+async def verify_retrieve_stream(
+    stream, data_hash, seed, max_size=None, keep_data=False, verbose=False
+):
+    """
+    Consumes the response of a miner to a RetrieveStream request, verifying the data as it arrives.
+    Every segment is fed to an incremental hash as soon as it is received, so the data is checked
+    against its hash without being reassembled or base64 decoded. Past `max_size` bytes the
+    segments are no longer hashed nor kept, only drained to receive the final synapse, so the
+    overflow is reported along with the error and status of the miner.
+
+    Args:
+        stream: The async iterator returned by the dendrite for one axon with `streaming=True`,
+            yielding the data segments and then the final RetrieveStream synapse.
+        data_hash (str): The expected hash of the data.
+        seed (str): The seed sent with the request.
+        max_size (int, optional): The largest number of bytes accepted.
+        keep_data (bool): Whether to keep the segments, e.g. to reassemble the data.
+        verbose (bool, optional): Enables verbose logging for debugging. Defaults to False.
+
+    Returns:
+        tuple: The final synapse (None if the stream ended without one), whether the data and its
+            commitment were verified, and the list of segments if `keep_data` is set (else None).
+            On failure the reason is stored in the `error` field of the synapse.
+    """
+    hasher = DataHasher()
+    segments = [] if keep_data else None
+    size = 0
+    synapse = None
+    error = None
+    async for item in stream:
+        if not isinstance(item, (bytes, bytearray)):
+            synapse = item
+            continue
+        size += len(item)
+        if max_size is not None and size > max_size:
+            if error is None:
+                error = f"Stream exceeded {max_size} bytes"
+                segments = None
+            continue
+        hasher.update(item)
+        if keep_data:
+            segments.append(item)
+
+    if synapse is None:
+        return None, False, None
+    if synapse.error is not None:
+        error = synapse.error if error is None else f"{error}, miner error: {synapse.error}"
+    if error is None and synapse.size != size:
+        error = f"Received {size} bytes, miner sent {synapse.size}"
+    if error is None and str(hasher.intdigest()) != str(data_hash):
+        error = "Hash of received data does not match expected hash"
+    if error is None and not verify_retrieve_with_seed(synapse, seed, verbose=verbose):
+        error = "Commitment verification failed"
+    if error is not None:
+        bt.logging.debug(f"RetrieveStream of {str(data_hash)[:12]} failed: {error}")
+        synapse.error = error
+        return synapse, False, None
+    return synapse, True, segments
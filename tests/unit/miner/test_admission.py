@@ -0,0 +1,93 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from storage.miner.admission import (
+    ADMIT,
+    DEPRIORITIZE,
+    SHED,
+    AdmissionController,
+)
+
+
+class TestAdmissionController(TestCase):
+    def setUp(self):
+        self.admission = AdmissionController(
+            capacity=2, window=10.0, commit_cost=0.01, hash_cost=0.0
+        )
+
+    @parameterized.expand(
+        [
+            (1000, 100, 0.1),
+            (1001, 100, 0.11),
+            (10, 100, 0.01),
+        ]
+    )
+    def test_estimate_counts_commitments(self, size, chunk_size, expected):
+        self.assertAlmostEqual(expected, self.admission.estimate(size, chunk_size, True))
+
+    def test_estimate_adds_hashing_without_proof(self):
+        self.admission.hash_cost = 1e-3
+        self.assertAlmostEqual(
+            0.01 + 100 * 1e-3, self.admission.estimate(100, 100, has_proof=False)
+        )
+
+    def test_admits_within_budget(self):
+        self.assertEqual(ADMIT, self.admission.admit("a", 1.0, time_left=10.0))
+
+    def test_sheds_work_that_cannot_meet_its_deadline(self):
+        token = self.admission.start("a", 10.0)
+        self.assertEqual(SHED, self.admission.admit("b", 1.0, time_left=2.0))
+        self.admission.finish(token, 0)
+        self.assertEqual(ADMIT, self.admission.admit("b", 1.0, time_left=2.0))
+        self.assertEqual(1, self.admission.stats()["decisions"][SHED])
+
+    def test_deprioritizes_validator_over_its_stake_share(self):
+        self.admission.admit("small", 0.1, time_left=10.0, weight=1.0)
+        self.admission.admit("large", 0.1, time_left=10.0, weight=9.0)
+        # The small validator may use a tenth of 2 CPUs over 10 seconds
+        self.assertAlmostEqual(2.0, self.admission.budget("small"))
+        self.assertEqual(
+            DEPRIORITIZE, self.admission.admit("small", 3.0, time_left=10.0, weight=1.0)
+        )
+        self.assertEqual(ADMIT, self.admission.admit("large", 3.0, time_left=10.0, weight=9.0))
+
+    def test_sheds_over_budget_work_while_others_run(self):
+        self.admission.admit("small", 0.1, time_left=10.0, weight=1.0)
+        self.admission.admit("large", 0.1, time_left=10.0, weight=9.0)
+        token = self.admission.start("large", 1.0)
+        self.assertEqual(SHED, self.admission.admit("small", 3.0, time_left=10.0, weight=1.0))
+        self.admission.finish(token, 100)
+
+    def test_finish_charges_validator_and_calibrates_cost(self):
+        token = self.admission.start("a", 1.0)
+        self.admission.finish(token, 10)
+
+        stats = self.admission.stats()
+        self.assertEqual(0.0, stats["outstanding"])
+        self.assertGreater(stats["validators"]["a"]["consumed"], 0.0)
+        # The commitments finished much faster than the initial estimate
+        self.assertLess(stats["commit_cost"], 0.01)
+
+    def test_forgets_idle_validators(self):
+        with patch("storage.miner.admission.time.monotonic") as monotonic:
+            monotonic.return_value = 0.0
+            self.admission.admit("old", 0.1, time_left=10.0, weight=9.0)
+            self.admission.admit("busy", 0.1, time_left=10.0, weight=9.0)
+            self.admission.finish(self.admission.start("busy", 1.0), 10)
+            self.admission._validators["busy"][0] = 100.0
+
+            # Seen within the window, the idle validator still takes its share
+            monotonic.return_value = 5.0
+            self.admission.admit("new", 0.1, time_left=10.0, weight=2.0)
+            self.assertAlmostEqual(2 * 10.0 * 2 / 20, self.admission.budget("new"))
+
+            monotonic.return_value = 100.0
+            self.admission.admit("new", 0.1, time_left=10.0, weight=2.0)
+            validators = self.admission.stats()["validators"]
+
+        self.assertNotIn("old", validators)
+        # Idle as long, but its consumption has not decayed away yet
+        self.assertIn("busy", validators)
+        self.assertAlmostEqual(2 * 10.0 * 2 / 11, self.admission.budget("new"))
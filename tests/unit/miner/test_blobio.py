@@ -0,0 +1,76 @@
+import os
+import asyncio
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from storage.miner.blobio import BlobIO, write_file_atomic
+
+
+class TestBlobIO(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_write_file_atomic_leaves_no_temporary_file(self):
+        path = os.path.join(self.directory.name, "a", "blob")
+        write_file_atomic(path, b"old")
+        write_file_atomic(path, b"new", fsync=True)
+
+        with open(path, "rb") as f:
+            self.assertEqual(b"new", f.read())
+        self.assertEqual(["blob"], os.listdir(os.path.dirname(path)))
+
+    @parameterized.expand([(False,), (True,)])
+    def test_concurrent_writes(self, fsync):
+        io = BlobIO(max_workers=2, max_pending=2, fsync=fsync, fsync_interval=0.001)
+        paths = [os.path.join(self.directory.name, str(i)) for i in range(8)]
+
+        async def main():
+            return await asyncio.gather(
+                *(io.write(path, str(i).encode()) for i, path in enumerate(paths))
+            )
+
+        self.assertEqual(paths, asyncio.run(main()))
+        io.shutdown()
+        for i, path in enumerate(paths):
+            with open(path, "rb") as f:
+                self.assertEqual(str(i).encode(), f.read())
+
+    def test_write_fails_when_the_directory_is_not_flushed(self):
+        io = BlobIO(fsync=True, fsync_interval=0.001)
+        path = os.path.join(self.directory.name, "blob")
+
+        with patch(
+            "storage.miner.blobio.fsync_directory", side_effect=OSError("I/O error")
+        ):
+            with self.assertRaises(OSError):
+                asyncio.run(io.write(path, b"data"))
+        io.shutdown()
+
+    def test_queue_depth_is_bounded(self):
+        io = BlobIO(max_workers=1, max_pending=1)
+        release = threading.Event()
+        started = []
+
+        def blocking(i):
+            started.append(i)
+            release.wait()
+            return i
+
+        async def main():
+            tasks = [asyncio.ensure_future(io.run(blocking, i)) for i in range(3)]
+            await asyncio.sleep(0.05)
+            pending = list(started)
+            release.set()
+            return pending, await asyncio.gather(*tasks)
+
+        pending, results = asyncio.run(main())
+        io.shutdown()
+        self.assertEqual([0], pending)
+        self.assertEqual([0, 1, 2], results)
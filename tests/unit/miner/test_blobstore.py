@@ -0,0 +1,180 @@
+import os
+import asyncio
+import tempfile
+from unittest import TestCase
+
+import fakeredis
+
+from storage.miner.blobstore import BLOB_RETIRED_KEY, BlobStore
+from storage.miner.cache import BlobCache
+from storage.miner.codec import PathTemplates, shard_directories
+from storage.miner.database import get_filepath, metadata_codec, store_chunk_metadata
+from storage.miner.disks import DiskSet
+
+DATA_HASH = str(2**255 + 12345)
+
+
+class TestBlobStore(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.directory.name, shard_levels=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_path_is_sharded_by_hash_prefix(self):
+        self.assertEqual("80/00", shard_directories(DATA_HASH, 2))
+        self.assertEqual(
+            os.path.join(self.directory.name, "blobs", "80", "00", DATA_HASH),
+            self.store.path(DATA_HASH),
+        )
+
+    def test_put_deduplicates(self):
+        first = self.store.put(DATA_HASH, b"data")
+        mtime = os.path.getmtime(first)
+        second = self.store.put(DATA_HASH, b"data")
+
+        self.assertEqual(first, second)
+        self.assertEqual(mtime, os.path.getmtime(second))
+
+    def test_locate_falls_back_to_legacy_paths(self):
+        legacy = os.path.join(self.directory.name, "hotkey", DATA_HASH)
+        os.makedirs(os.path.dirname(legacy))
+        with open(legacy, "wb") as f:
+            f.write(b"data")
+
+        self.assertEqual(legacy, self.store.locate(DATA_HASH, "hotkey", "/missing"))
+        self.assertIsNone(self.store.locate(DATA_HASH, "other"))
+
+    def test_lock_serializes_tasks(self):
+        events = []
+
+        async def task(name):
+            async with self.store.lock(DATA_HASH):
+                events.append(f"{name} in")
+                await asyncio.sleep(0.01)
+                events.append(f"{name} out")
+
+        async def main():
+            await asyncio.gather(task("a"), task("b"))
+
+        asyncio.run(main())
+
+        self.assertEqual(["a in", "a out", "b in", "b out"], events)
+        self.assertEqual({}, self.store._locks)
+
+    def test_store_writes_through_blob_io(self):
+        async def main():
+            return await self.store.store(None, DATA_HASH, b"data")
+
+        filepath = asyncio.run(main())
+
+        self.assertEqual(self.store.path(DATA_HASH), filepath)
+        with open(filepath, "rb") as f:
+            self.assertEqual(b"data", f.read())
+        self.assertEqual([DATA_HASH], os.listdir(os.path.dirname(filepath)))
+
+    def test_open_serves_cached_blobs(self):
+        store = BlobStore(self.directory.name, cache=BlobCache(max_bytes=1024))
+        filepath = store.put(DATA_HASH, b"data")
+
+        with store.open(DATA_HASH, filepath) as view:
+            self.assertEqual(b"data", bytes(view))
+        os.remove(filepath)
+        with store.open(DATA_HASH, filepath) as view:
+            self.assertEqual(b"data", bytes(view))
+        self.assertEqual(1, store.cache.hits)
+
+
+class TestBlobMoves(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.bulk = os.path.join(self.directory.name, "bulk")
+        self.fast = os.path.join(self.directory.name, "fast")
+        self.store = BlobStore(
+            self.bulk, disks=DiskSet([self.bulk], fast_directories=[self.fast])
+        )
+        self.r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        metadata_codec.templates = PathTemplates()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_relocate_keeps_the_old_copy_for_a_grace_period(self):
+        bulk_root, fast_root = self.store.disks.roots
+
+        async def main():
+            source = self.store.path(DATA_HASH, bulk_root.blob_directory)
+            os.makedirs(os.path.dirname(source))
+            with open(source, "wb") as f:
+                f.write(b"data")
+            await store_chunk_metadata(self.r, DATA_HASH, source, "hk1", 4, "a")
+
+            moved = await self.store.relocate(self.r, DATA_HASH, fast_root)
+            # A request that resolved the old path before the move can still read it
+            readable = os.path.isfile(source)
+            kept = await self.store.delete_retired(self.r, grace_period=60)
+            reclaimed = await self.store.delete_retired(self.r, grace_period=0)
+            return (
+                source,
+                moved,
+                readable,
+                kept,
+                reclaimed,
+                await get_filepath(self.r, DATA_HASH, "hk1"),
+                await self.r.hlen(BLOB_RETIRED_KEY),
+            )
+
+        source, moved, readable, kept, reclaimed, filepath, retired = asyncio.run(main())
+
+        self.assertEqual(4, moved)
+        self.assertTrue(readable)
+        self.assertEqual(0, kept)
+        self.assertEqual(4, reclaimed)
+        self.assertFalse(os.path.exists(source))
+        self.assertEqual(self.store.path(DATA_HASH, fast_root.blob_directory), filepath)
+        self.assertEqual(0, retired)
+
+    def test_blob_moved_back_is_not_deleted(self):
+        bulk_root, fast_root = self.store.disks.roots
+
+        async def main():
+            source = self.store.path(DATA_HASH, bulk_root.blob_directory)
+            os.makedirs(os.path.dirname(source))
+            with open(source, "wb") as f:
+                f.write(b"data")
+            await store_chunk_metadata(self.r, DATA_HASH, source, "hk1", 4, "a")
+
+            await self.store.relocate(self.r, DATA_HASH, fast_root)
+            await self.store.relocate(self.r, DATA_HASH, bulk_root)
+            await self.store.delete_retired(self.r, grace_period=0)
+            return source, await get_filepath(self.r, DATA_HASH, "hk1")
+
+        source, filepath = asyncio.run(main())
+
+        self.assertEqual(source, filepath)
+        with open(source, "rb") as f:
+            self.assertEqual(b"data", f.read())
+        self.assertFalse(os.path.exists(self.store.path(DATA_HASH, fast_root.blob_directory)))
+
+    def test_migrate_retires_the_legacy_files(self):
+        async def main():
+            legacy = os.path.join(self.bulk, "hk1", DATA_HASH)
+            os.makedirs(os.path.dirname(legacy))
+            with open(legacy, "wb") as f:
+                f.write(b"data")
+            await store_chunk_metadata(self.r, DATA_HASH, legacy, "hk1", 4, "a")
+
+            updated = await self.store.migrate(self.r, DATA_HASH)
+            readable = os.path.isfile(legacy)
+            await self.store.delete_retired(self.r, grace_period=0)
+            return legacy, updated, readable, await get_filepath(self.r, DATA_HASH, "hk1")
+
+        legacy, updated, readable, filepath = asyncio.run(main())
+
+        self.assertEqual(1, updated)
+        self.assertTrue(readable)
+        self.assertFalse(os.path.exists(legacy))
+        self.assertEqual(self.store.path(DATA_HASH), filepath)
+        with open(filepath, "rb") as f:
+            self.assertEqual(b"data", f.read())
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from storage.miner.cache import BlobCache
+
+
+class TestBlobCache(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = BlobCache(max_bytes=10)
+        cache.put("a", b"aaaa")
+        cache.put("b", b"bbbb")
+        cache.get("a")
+        cache.put("c", b"cccc")
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(8, cache.size)
+        self.assertEqual(1, cache.evictions)
+
+    def test_skips_large_blobs(self):
+        cache = BlobCache(max_bytes=10, max_blob_size=4)
+
+        self.assertFalse(cache.put("a", b"aaaaa"))
+        self.assertEqual(0, len(cache))
+
+    def test_invalidate(self):
+        cache = BlobCache(max_bytes=10)
+        cache.put("a", b"aaaa")
+
+        self.assertTrue(cache.invalidate("a"))
+        self.assertFalse(cache.invalidate("a"))
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(0, cache.size)
+
+    def test_hit_rate(self):
+        cache = BlobCache(max_bytes=10)
+        cache.put(1, b"aaaa")
+        cache.get(1)
+        cache.get(2)
+
+        self.assertEqual(0.5, cache.hit_rate)
+        self.assertEqual({"hits": 1, "misses": 1}, {k: cache.stats()[k] for k in ("hits", "misses")})
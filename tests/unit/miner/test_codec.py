@@ -0,0 +1,81 @@
+import json
+import asyncio
+from unittest import TestCase
+from parameterized import parameterized
+
+from storage.miner.codec import (
+    DEFAULT_TTL,
+    LAYOUT_EXPLICIT,
+    LAYOUT_HASH,
+    LAYOUT_HOTKEY,
+    MAX_TTL,
+    MetadataCodec,
+    decode_metadata,
+    encode_metadata,
+    is_binary_metadata,
+    join_filepath,
+    split_filepath,
+)
+
+
+class TestMetadataCodec(TestCase):
+    @parameterized.expand(
+        [
+            [{"size": 100, "seed": "42", "ttl": 60, "generated": 1.5}, 1, LAYOUT_HOTKEY, None],
+            [{"size": 2**40, "seed": "", "ttl": 60, "generated": 0.0}, 0, LAYOUT_EXPLICIT, "/abs/path"],
+            [
+                {"size": 1, "seed": "7", "ttl": 1, "generated": 2.0, "proof": 2**256 - 1},
+                3,
+                LAYOUT_HASH,
+                None,
+            ],
+        ]
+    )
+    def test_round_trip(self, metadata, template_id, layout, suffix):
+        encoded = encode_metadata(metadata, template_id, layout, suffix)
+
+        self.assertTrue(is_binary_metadata(encoded))
+        self.assertEqual((metadata, template_id, layout, suffix), decode_metadata(encoded))
+
+    @parameterized.expand(
+        [
+            (None, DEFAULT_TTL),
+            (0, DEFAULT_TTL),
+            (-60, 1),
+            (2**32, MAX_TTL),
+            (2**40, MAX_TTL),
+            (60, 60),
+        ]
+    )
+    def test_ttl_is_clamped_to_the_format(self, ttl, expected):
+        metadata = {"size": 1, "seed": "", "ttl": ttl, "generated": 1.0}
+
+        decoded = decode_metadata(encode_metadata(metadata, 1, LAYOUT_HOTKEY))[0]
+
+        self.assertEqual(expected, decoded["ttl"])
+
+    def test_json_is_not_binary(self):
+        self.assertFalse(is_binary_metadata(json.dumps({"size": "1"}).encode()))
+
+    def test_json_is_only_decoded_while_legacy(self):
+        codec = MetadataCodec()
+        raw = json.dumps({"filepath": "/data/123", "size": "1", "seed": "7"}).encode()
+
+        metadata = asyncio.run(codec.loads(None, "123", "hotkey", raw))
+        self.assertEqual((1, "7"), (metadata["size"], metadata["seed"]))
+
+        codec.legacy = False
+        with self.assertRaises(Exception):
+            asyncio.run(codec.loads(None, "123", "hotkey", raw))
+
+    @parameterized.expand(
+        [
+            ["/data/hotkey/123", ("/data", LAYOUT_HOTKEY, None)],
+            ["/data/blobs/123", ("/data/blobs", LAYOUT_HASH, None)],
+            ["/data/other/456", ("/data/other", LAYOUT_EXPLICIT, "456")],
+            ["", ("", LAYOUT_EXPLICIT, "")],
+        ]
+    )
+    def test_split_filepath(self, filepath, expected):
+        self.assertEqual(expected, split_filepath(filepath, "123", "hotkey"))
+        self.assertEqual(filepath, join_filepath(*expected, "123", "hotkey"))
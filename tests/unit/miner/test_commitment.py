@@ -0,0 +1,116 @@
+import os
+import asyncio
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from storage.miner.commitment import CommitmentEngine, PriorityGate
+from storage.miner.utils import commit_data_with_seed
+from storage.shared import ecc
+from storage.shared.ecc import (
+    POINT_ENCODING_COMPRESSED,
+    POINT_ENCODING_LEGACY,
+    ECCommitment,
+    ecc_point_to_hex,
+    setup_CRS,
+)
+from storage.shared.utils import chunk_data
+
+
+class TestPriorityGate(TestCase):
+    def test_free_slots_go_to_the_highest_priority(self):
+        async def main():
+            gate = PriorityGate(1)
+            order = []
+
+            async def batch(name, priority):
+                await gate.acquire(priority)
+                order.append(name)
+                gate.release()
+
+            await gate.acquire()
+            tasks = [
+                asyncio.ensure_future(batch("deprioritized", 0.0)),
+                asyncio.ensure_future(batch("admitted", 2.0)),
+                asyncio.ensure_future(batch("staked", 20.0)),
+            ]
+            await asyncio.sleep(0)
+            waiting = gate.waiting
+            gate.release()
+            await asyncio.gather(*tasks)
+            return order, waiting, gate.free
+
+        order, waiting, free = asyncio.run(main())
+
+        self.assertEqual(3, waiting)
+        self.assertEqual(["staked", "admitted", "deprioritized"], order)
+        self.assertEqual(1, free)
+
+    def test_cancelled_waiter_passes_its_slot_on(self):
+        async def main():
+            gate = PriorityGate(1)
+            await gate.acquire()
+            cancelled = asyncio.ensure_future(gate.acquire(10.0))
+            waiting = asyncio.ensure_future(gate.acquire(1.0))
+            await asyncio.sleep(0)
+            gate.release()
+            cancelled.cancel()
+            await asyncio.wait_for(waiting, timeout=1)
+            gate.release()
+            return gate.free
+
+        self.assertEqual(1, asyncio.run(main()))
+
+
+class TestCommitmentEngine(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.engine = CommitmentEngine(max_workers=2, min_batch_size=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.shutdown()
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.data = os.urandom(5000)
+        self.filepath = os.path.join(self.directory.name, "blob")
+        with open(self.filepath, "wb") as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @parameterized.expand([(POINT_ENCODING_LEGACY,), (POINT_ENCODING_COMPRESSED,)])
+    def test_matches_the_inline_commitments(self, encoding):
+        g, h = setup_CRS()
+        chunk_size = 512
+        n_chunks = len(self.data) // chunk_size + 1
+
+        randomness, points, merkle_tree = asyncio.run(
+            self.engine.commit_file_with_seed(
+                ecc_point_to_hex(g),
+                ecc_point_to_hex(h),
+                "P-256",
+                filepath=self.filepath,
+                chunk_size=chunk_size,
+                n_chunks=n_chunks,
+                seed="seed",
+                encoding=encoding,
+            )
+        )
+
+        # Commit in process as the miner used to, reusing the randomness of the workers
+        drawn = iter(r for r in randomness if r is not None)
+        with patch.object(ecc, "random") as random:
+            random.randint.side_effect = lambda *args: next(drawn)
+            expected_randomness, _, expected_points, expected_tree = commit_data_with_seed(
+                ECCommitment(g, h), chunk_data(self.data, chunk_size), n_chunks, "seed", encoding
+            )
+
+        self.assertEqual(10, sum(r is not None for r in randomness))
+        self.assertEqual(expected_randomness, randomness)
+        self.assertEqual(expected_points, points)
+        self.assertEqual(expected_tree.get_merkle_root(), merkle_tree.get_merkle_root())
@@ -0,0 +1,210 @@
+import os
+import json
+import asyncio
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import fakeredis
+from parameterized import parameterized
+
+from storage.miner.codec import PathTemplates, decode_metadata, is_binary_metadata
+from storage.miner.database import (
+    EXPIRY_INDEX_KEY,
+    ROTATE_SEED_SCRIPT,
+    expiry_member,
+    get_chunk_metadata,
+    get_storage_ledger,
+    metadata_codec,
+    rotate_chunk_seed,
+    run_script,
+    store_chunk_metadata,
+    store_or_update_chunk_metadata,
+    update_proof_info,
+)
+from storage.miner.utils import precompute_storage_proof
+from storage.shared.ecc import hash_data
+
+FILEPATH = "/data/hk1/1"
+PROOF = 2**256 - 12345
+
+
+class TestSeedScripts(TestCase):
+    def setUp(self):
+        self.r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        metadata_codec.templates = PathTemplates()
+
+    async def store(self, seed, proof):
+        await store_chunk_metadata(self.r, "1", FILEPATH, "hk1", 100, seed, ttl=60)
+        if proof is not None:
+            metadata = await get_chunk_metadata(self.r, "1", "hk1")
+            metadata["proof"] = proof
+            raw = await metadata_codec.dumps(self.r, "1", "hk1", metadata)
+            await self.r.hset("1", "hk1", raw)
+        return await get_chunk_metadata(self.r, "1", "hk1")
+
+    async def expected(self, metadata, seed):
+        # The entry the codec encodes for the new seed, which the scripts must produce in place
+        metadata = dict(metadata, seed=seed)
+        metadata.pop("proof", None)
+        return metadata, await metadata_codec.dumps(self.r, "1", "hk1", metadata)
+
+    @parameterized.expand(
+        [
+            ("42", "43", None),
+            ("42", "43", PROOF),
+            ("", "9" * 300, PROOF),
+            ("9" * 300, "", None),
+        ]
+    )
+    def test_rotate_seed(self, seed, new_seed, proof):
+        async def main():
+            stored = await self.store(seed, proof)
+            previous = await rotate_chunk_seed(self.r, "1", "hk1", new_seed)
+            raw = await self.r.hget("1", "hk1")
+            return stored, previous, raw, await self.expected(stored, new_seed)
+
+        stored, previous, raw, (expected, expected_raw) = asyncio.run(main())
+
+        self.assertEqual(proof, stored.get("proof"))
+        self.assertEqual(stored, previous)
+        self.assertEqual(expected_raw, raw)
+        self.assertEqual(expected, decode_metadata(raw)[0] | {"filepath": FILEPATH})
+
+    def test_rotate_seed_of_missing_entry(self):
+        async def main():
+            previous = await rotate_chunk_seed(self.r, "1", "hk1", "43")
+            return previous, await self.r.exists("1")
+
+        previous, exists = asyncio.run(main())
+
+        self.assertIsNone(previous)
+        self.assertFalse(exists)
+
+    @parameterized.expand([(None,), (PROOF,)])
+    def test_upsert_rotates_the_seed_of_an_existing_entry(self, proof):
+        async def main():
+            stored = await self.store("42", proof)
+            ledger = await get_storage_ledger(self.r)
+            await store_or_update_chunk_metadata(self.r, "1", FILEPATH, "hk1", 100, "43")
+            return (
+                stored,
+                ledger,
+                await self.r.hget("1", "hk1"),
+                await get_storage_ledger(self.r),
+                (await self.expected(stored, "43"))[1],
+            )
+
+        stored, ledger, raw, updated_ledger, expected_raw = asyncio.run(main())
+
+        # The size, ttl and generation time of the entry are kept
+        self.assertEqual(expected_raw, raw)
+        self.assertEqual(ledger, updated_ledger)
+
+    def test_upsert_stores_a_new_entry(self):
+        async def main():
+            await store_or_update_chunk_metadata(self.r, "1", FILEPATH, "hk1", 100, "42", ttl=60)
+            return await self.r.hget("1", "hk1"), await get_chunk_metadata(self.r, "1", "hk1")
+
+        raw, metadata = asyncio.run(main())
+
+        self.assertTrue(is_binary_metadata(raw))
+        self.assertEqual(
+            {"filepath": FILEPATH, "size": 100, "seed": "42", "ttl": 60},
+            {k: v for k, v in metadata.items() if k != "generated"},
+        )
+
+    def test_upsert_rewrites_json_entries_through_the_codec(self):
+        async def main():
+            entry = {"filepath": FILEPATH, "size": 100, "seed": "42", "ttl": 60, "generated": 1.0}
+            await self.r.hset("1", "hk1", json.dumps(entry))
+            await store_or_update_chunk_metadata(self.r, "1", FILEPATH, "hk1", 100, "43")
+            return await self.r.hget("1", "hk1")
+
+        raw = asyncio.run(main())
+
+        self.assertTrue(is_binary_metadata(raw))
+        self.assertEqual("43", decode_metadata(raw)[0]["seed"])
+
+    @parameterized.expand([(store_chunk_metadata,), (store_or_update_chunk_metadata,)])
+    def test_out_of_range_ttl_is_clamped(self, store):
+        async def main():
+            await store(self.r, "1", FILEPATH, "hk1", 100, "42", ttl=-60)
+            await store(self.r, "2", FILEPATH, "hk1", 100, "42", ttl=2**40)
+            return [
+                (
+                    await get_chunk_metadata(self.r, key, "hk1"),
+                    await self.r.zscore(EXPIRY_INDEX_KEY, expiry_member(key, "hk1")),
+                )
+                for key in ("1", "2")
+            ]
+
+        (expired, expired_at), (kept, kept_until) = asyncio.run(main())
+
+        self.assertEqual(1, expired["ttl"])
+        self.assertAlmostEqual(expired["generated"] + 1, expired_at)
+        self.assertEqual(2**32 - 1, kept["ttl"])
+        self.assertAlmostEqual(kept["generated"] + 2**32 - 1, kept_until)
+
+
+class TestStorageProofs(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.directory.name, "1")
+        self.data = os.urandom(1000)
+        with open(self.filepath, "wb") as f:
+            f.write(self.data)
+        self.r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        metadata_codec.templates = PathTemplates()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_proof_is_stored_with_its_seed(self):
+        async def main():
+            await store_chunk_metadata(self.r, "1", self.filepath, "hk1", 1000, "42")
+            stored = await precompute_storage_proof(self.r, "1", "hk1", self.filepath, "42")
+            return stored, await get_chunk_metadata(self.r, "1", "hk1")
+
+        stored, metadata = asyncio.run(main())
+
+        self.assertTrue(stored)
+        self.assertEqual("42", metadata["seed"])
+        self.assertEqual(hash_data(self.data + b"42"), metadata["proof"])
+
+    def test_proof_of_a_replaced_seed_is_discarded(self):
+        async def main():
+            await store_chunk_metadata(self.r, "1", self.filepath, "hk1", 1000, "42")
+            # A challenge rotates the seed after the proof was scheduled for "42"
+            await rotate_chunk_seed(self.r, "1", "hk1", "43")
+            stored = await precompute_storage_proof(self.r, "1", "hk1", self.filepath, "42")
+            return stored, await get_chunk_metadata(self.r, "1", "hk1")
+
+        stored, metadata = asyncio.run(main())
+
+        self.assertFalse(stored)
+        self.assertEqual("43", metadata["seed"])
+        self.assertNotIn("proof", metadata)
+
+    def test_proof_is_discarded_when_the_seed_changes_during_the_watch(self):
+        loads = metadata_codec.loads
+
+        async def rotate_then_load(r, chunk_hash, hotkey, raw):
+            # The seed is replaced after the entry was read under WATCH, before the proof is written
+            await run_script(self.r, ROTATE_SEED_SCRIPT, keys=["1"], args=["hk1", "43"])
+            return await loads(r, chunk_hash, hotkey, raw)
+
+        async def main():
+            await store_chunk_metadata(self.r, "1", self.filepath, "hk1", 1000, "42")
+            with patch.object(metadata_codec, "loads", side_effect=rotate_then_load):
+                stored = await update_proof_info(self.r, "1", "hk1", "42", 12345)
+            return stored, await get_chunk_metadata(self.r, "1", "hk1")
+
+        stored, metadata = asyncio.run(main())
+
+        self.assertFalse(stored)
+        self.assertEqual("43", metadata["seed"])
+        self.assertNotIn("proof", metadata)
+
+    def test_proof_of_a_missing_entry_is_discarded(self):
+        self.assertFalse(asyncio.run(update_proof_info(self.r, "1", "hk1", "42", 12345)))
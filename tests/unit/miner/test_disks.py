@@ -0,0 +1,82 @@
+import os
+import asyncio
+import tempfile
+from unittest import TestCase
+
+from storage.miner.blobstore import BlobStore
+from storage.miner.disks import DiskSet
+
+DATA_HASH = str(2**255 + 12345)
+
+
+class TestDiskSet(TestCase):
+    def setUp(self):
+        self.directories = [tempfile.TemporaryDirectory() for _ in range(2)]
+        self.disks = DiskSet([d.name for d in self.directories])
+
+    def tearDown(self):
+        for directory in self.directories:
+            directory.cleanup()
+
+    def test_deduplicates_roots_and_disks(self):
+        disks = DiskSet([self.directories[0].name, self.directories[0].name + "/"])
+        self.assertEqual(1, len(disks.roots))
+        # Both temporary directories are on the same filesystem, counted once
+        self.assertEqual(self.disks.roots[0].total_bytes, self.disks.usage()["total_bytes"])
+
+    def test_root_of(self):
+        first, second = self.disks.roots
+        self.assertIs(second, self.disks.root_of(os.path.join(second.blob_directory, "80", "1")))
+        self.assertIsNone(self.disks.root_of("/elsewhere/1"))
+        self.assertIsNone(self.disks.root_of(first.directory + "-other/1"))
+
+    def test_choose_skips_full_disks(self):
+        first, second = self.disks.roots
+        first.free_bytes = 0
+        self.disks.refresh_interval = float("inf")
+
+        self.assertEqual({second}, {self.disks.choose(10) for _ in range(20)})
+
+        second.free_bytes = 0
+        with self.assertRaises(OSError):
+            self.disks.choose(10)
+
+    def test_choose_avoids_busy_disks(self):
+        first, second = self.disks.roots
+        self.disks.refresh_interval = float("inf")
+        first.free_bytes = second.free_bytes = 10**12
+        second.pending = 10**9
+
+        chosen = [self.disks.choose(10) for _ in range(100)]
+        self.assertGreater(chosen.count(first), 90)
+
+    def test_blob_store_places_and_finds_blobs(self):
+        store = BlobStore(self.directories[0].name, disks=self.disks)
+        first, second = self.disks.roots
+        first.free_bytes = 0
+        self.disks.refresh_interval = float("inf")
+
+        filepath = asyncio.run(store.store(None, DATA_HASH, b"data"))
+
+        self.assertEqual(store.path(DATA_HASH, second.blob_directory), filepath)
+        self.assertEqual(1, second.placed)
+        self.assertEqual(filepath, store.locate(DATA_HASH, "hotkey"))
+        # Already stored on the second disk, not written again
+        first.free_bytes = 10**12
+        self.assertEqual(filepath, store.put(DATA_HASH, b"data"))
+        store.io.shutdown()
+
+    def test_new_blobs_prefer_the_fast_tier(self):
+        with tempfile.TemporaryDirectory() as fast:
+            disks = DiskSet([self.directories[0].name], fast_directories=[fast])
+            bulk_root, fast_root = disks.roots
+            disks.refresh_interval = float("inf")
+
+            self.assertTrue(disks.tiered)
+            self.assertIs(fast_root, disks.choose(10))
+            self.assertIs(bulk_root, disks.choose(10, fast=False))
+
+            fast_root.free_bytes = 0
+            self.assertIs(bulk_root, disks.choose(10))
+            with self.assertRaises(OSError):
+                disks.choose(10, fast=True, fallback=False)
@@ -0,0 +1,18 @@
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from storage.miner.database import expiration_time, expiry_member, parse_expiry_member
+
+
+class TestExpiryIndex(TestCase):
+    @parameterized.expand([("123", "5Hotkey"), (b"123", b"5Hotkey")])
+    def test_member_roundtrip(self, chunk_hash, hotkey):
+        member = expiry_member(chunk_hash, hotkey)
+
+        self.assertEqual("123:5Hotkey", member)
+        self.assertEqual(("123", "5Hotkey"), parse_expiry_member(member.encode()))
+
+    def test_expiration_time(self):
+        self.assertEqual(1060.5, expiration_time({"generated": 1000.5, "ttl": 60}))
+        self.assertEqual(1060.5, expiration_time({"generated": "1000.5", "ttl": "60"}))
@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import asyncio
+import tempfile
+from unittest import TestCase
+
+import fakeredis
+
+from storage.miner.codec import PathTemplates
+from storage.miner.database import (
+    STORAGE_LEDGER_RECONCILED_KEY,
+    bootstrap_storage_ledger,
+    delete_chunk_metadata,
+    get_storage_ledger,
+    get_total_storage_used,
+    metadata_codec,
+    reconcile_storage_ledger,
+    store_chunk_metadata,
+    store_or_update_chunk_metadata,
+)
+
+
+class TestStorageLedger(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        metadata_codec.templates = PathTemplates()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def blob(self, name, size):
+        filepath = os.path.join(self.directory.name, name)
+        with open(filepath, "wb") as f:
+            f.write(b"x" * size)
+        return filepath
+
+    def test_store_and_delete_update_the_ledger(self):
+        async def main():
+            filepath = self.blob("1", 100)
+            await store_or_update_chunk_metadata(self.r, "1", filepath, "hk1", 100, "a")
+            await store_chunk_metadata(self.r, "1", filepath, "hk2", 100, "b")
+            # Updating the seed of an existing entry does not count it again
+            await store_or_update_chunk_metadata(self.r, "1", filepath, "hk1", 100, "c")
+            stored = await get_storage_ledger(self.r)
+
+            await delete_chunk_metadata(self.r, "1", "hk1")
+            deleted_one = await get_storage_ledger(self.r)
+            await delete_chunk_metadata(self.r, "1", "hk2")
+            return stored, deleted_one, await get_storage_ledger(self.r)
+
+        stored, deleted_one, deleted_all = asyncio.run(main())
+
+        self.assertEqual(
+            {"bytes": 200, "objects": 2, "disk_bytes": 100, "blobs": 1},
+            {k: v for k, v in stored.items() if k != "hotkeys"},
+        )
+        self.assertEqual({"bytes": 100, "objects": 1}, stored["hotkeys"]["hk1"])
+        self.assertEqual(100, deleted_one["bytes"])
+        self.assertEqual(100, deleted_one["disk_bytes"])
+        self.assertEqual(0, deleted_all["bytes"])
+        self.assertEqual(0, deleted_all["disk_bytes"])
+        self.assertEqual(0, deleted_all["blobs"])
+
+    def test_bootstrap_counts_data_stored_before_the_ledger(self):
+        async def main():
+            # Entries of an older miner: JSON, sized with sys.getsizeof and no ledger
+            old = self.blob("1", 100)
+            entry = {"filepath": old, "size": sys.getsizeof(b"x" * 100), "seed": "a"}
+            await self.r.hset("1", "hk1", json.dumps(entry))
+            # Stored after the upgrade, before the ledger is built
+            new = self.blob("2", 50)
+            await store_or_update_chunk_metadata(self.r, "2", new, "hk1", 50, "b")
+            untrusted = await get_total_storage_used(self.r)
+
+            ledger = await bootstrap_storage_ledger(self.r)
+            again = await bootstrap_storage_ledger(self.r)
+            await delete_chunk_metadata(self.r, "1", "hk1")
+            return untrusted, ledger, again, await get_storage_ledger(self.r)
+
+        untrusted, ledger, again, after_delete = asyncio.run(main())
+
+        self.assertIsNone(untrusted)
+        self.assertEqual(150, ledger["disk_bytes"])
+        self.assertEqual({"bytes": 150, "objects": 2}, ledger["hotkeys"]["hk1"])
+        self.assertIsNone(again)
+        # The size of the old entry was corrected, so deleting it does not go negative
+        self.assertEqual(50, after_delete["bytes"])
+        self.assertEqual(50, after_delete["disk_bytes"])
+
+    def test_reconcile_skips_missing_files_and_marks_the_ledger(self):
+        async def main():
+            filepath = self.blob("1", 10)
+            await store_chunk_metadata(self.r, "1", filepath, "hk1", 10, "a")
+            await store_chunk_metadata(
+                self.r, "2", os.path.join(self.directory.name, "2"), "hk1", 20, "b"
+            )
+            ledger = await reconcile_storage_ledger(self.r)
+            return ledger, await self.r.exists(STORAGE_LEDGER_RECONCILED_KEY)
+
+        ledger, reconciled = asyncio.run(main())
+
+        self.assertEqual(10, ledger["bytes"])
+        self.assertEqual(1, ledger["objects"])
+        self.assertEqual(1, ledger["blobs"])
+        self.assertTrue(reconciled)
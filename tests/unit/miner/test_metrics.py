@@ -0,0 +1,81 @@
+import json
+import os
+import asyncio
+import tempfile
+import urllib.request
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from storage.miner.metrics import (
+    Histogram,
+    MetricsRegistry,
+    MetricsServer,
+    write_metrics_snapshot,
+)
+
+
+class TestMetrics(TestCase):
+    @parameterized.expand(
+        [
+            (0.5, 0.01),
+            (0.9, 0.1),
+            (0.99, 1.0),
+        ]
+    )
+    def test_histogram_quantile(self, q, expected):
+        histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+        for value in [0.005] * 50 + [0.05] * 40 + [0.5] * 10:
+            histogram.observe(value)
+
+        self.assertEqual(expected, histogram.quantile(q))
+        self.assertEqual(100, histogram.count)
+
+    def test_render_exposition_format(self):
+        registry = MetricsRegistry(buckets=(0.1, 1.0))
+        registry.describe("requests_total", "Requests received.")
+        registry.inc("requests_total", handler="challenge", hotkey="5abc")
+        registry.inc("requests_total", handler="challenge", hotkey="5abc")
+        registry.observe("phase_seconds", 0.5, phase="redis")
+        registry.gauge("queue_depth", lambda: 3)
+        registry.gauge("disk_free_bytes", lambda: {"/data": 10}, label="directory")
+
+        text = registry.render()
+
+        self.assertIn("# HELP requests_total Requests received.", text)
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{handler="challenge",hotkey="5abc"} 2', text)
+        self.assertIn("queue_depth 3.0", text)
+        self.assertIn('disk_free_bytes{directory="/data"} 10.0', text)
+        self.assertIn('phase_seconds_bucket{phase="redis",le="0.1"} 0', text)
+        self.assertIn('phase_seconds_bucket{phase="redis",le="1.0"} 1', text)
+        self.assertIn('phase_seconds_count{phase="redis"} 1', text)
+
+    def test_failing_gauge_is_skipped(self):
+        registry = MetricsRegistry()
+        registry.gauge("broken", lambda: 1 / 0)
+        registry.gauge("working", lambda: 1)
+
+        self.assertEqual({"working": {"": 1.0}}, registry.snapshot()["gauges"])
+
+    def test_snapshot_file_and_http_endpoint(self):
+        registry = MetricsRegistry()
+        with registry.time("phase_seconds", phase="read"):
+            pass
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.json")
+            asyncio.run(write_metrics_snapshot(None, registry, path))
+            with open(path) as f:
+                snapshot = json.load(f)
+        self.assertEqual(1, snapshot["histograms"]["phase_seconds"]["phase=read"]["count"])
+
+        server = MetricsServer(registry, port=0)
+        server.start()
+        try:
+            with urllib.request.urlopen(
+                f"http://127.0.0.1:{server.port}/metrics", timeout=5
+            ) as response:
+                body = response.read().decode()
+        finally:
+            server.stop()
+        self.assertIn('phase_seconds_count{phase="read"} 1', body)
@@ -0,0 +1,44 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from parameterized import parameterized
+
+from storage.miner.migration import infer_base_directory, move_blob, rebase_path
+
+
+class TestMigration(TestCase):
+    @parameterized.expand(
+        [
+            ("/data/blobs/ab/cd/123", None, "/data"),
+            ("/data/123", None, "/data"),
+            ("/data/5Hotkey/123", "5Hotkey", "/data"),
+            ("/data/other/123", "5Hotkey", "/data/other"),
+        ]
+    )
+    def test_infer_base_directory(self, filepath, hotkey, expected):
+        self.assertEqual(expected, infer_base_directory(filepath, hotkey))
+
+    @parameterized.expand(
+        [
+            ("/data/blobs/ab/cd/123", "/disk/blobs/ab/cd/123"),
+            ("/data/5Hotkey/123", "/disk/5Hotkey/123"),
+            ("/elsewhere/123", "/disk/123"),
+        ]
+    )
+    def test_rebase_path(self, filepath, expected):
+        self.assertEqual(expected, rebase_path(filepath, "/data", "/disk"))
+
+    def test_move_blob(self):
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "old", "123")
+            target = os.path.join(directory, "new", "ab", "123")
+            os.makedirs(os.path.dirname(source))
+            with open(source, "wb") as f:
+                f.write(b"data")
+
+            self.assertTrue(move_blob(source, target))
+            self.assertFalse(os.path.exists(source))
+            # Already moved, e.g. by rsync
+            self.assertTrue(move_blob(source, target))
+            self.assertFalse(move_blob(source, target + "missing"))
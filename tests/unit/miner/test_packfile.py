@@ -0,0 +1,75 @@
+import os
+import asyncio
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import fakeredis
+
+from storage.miner.blobio import BlobIO
+from storage.miner.packfile import BlobRange, PackStore, decode_location, encode_location
+from storage.miner.utils import blob_size, hash_blob, open_blob
+from storage.shared.ecc import hash_data
+
+
+class TestPackfile(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.packs = PackStore(self.directory.name, segment_size=64, max_blob_size=16)
+
+    def tearDown(self):
+        self.packs.close()
+        self.directory.cleanup()
+
+    def test_location_roundtrip(self):
+        self.assertEqual((3, 2**40, 512), decode_location(encode_location(3, 2**40, 512)))
+
+    def test_accepts_small_blobs_only(self):
+        self.assertTrue(self.packs.accepts(16))
+        self.assertFalse(self.packs.accepts(17))
+
+    def test_open_blob_reads_range(self):
+        path = os.path.join(self.directory.name, "segment")
+        with open(path, "wb") as f:
+            f.write(b"headdatatail")
+        location = BlobRange(path, 4, 4)
+
+        with open_blob(location) as blob:
+            self.assertEqual(b"data", bytes(blob))
+        self.assertEqual(4, blob_size(location))
+        self.assertEqual(hash_data(b"dataseed"), hash_blob(location, b"seed"))
+
+    def test_concurrent_rollover_leaves_no_empty_segment(self):
+        r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+
+        async def main():
+            # Fill the first segment, so that the next puts all find it full
+            for i in range(4):
+                await self.packs.put(r, str(i), b"x" * 16)
+            return await asyncio.gather(
+                *(self.packs.put(r, str(i), b"y" * 16) for i in range(4, 8))
+            )
+
+        locations = asyncio.run(main())
+        self.packs.close()
+
+        segments = sorted(os.listdir(self.packs.directory))
+        self.assertEqual(2, len(segments))
+        for segment in segments:
+            self.assertGreater(os.path.getsize(os.path.join(self.packs.directory, segment)), 0)
+        self.assertEqual({self.packs.segment_path(2)}, {location.path for location in locations})
+
+    def test_segment_writes_are_flushed_with_fsync(self):
+        r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        io = BlobIO(fsync=True)
+        packs = PackStore(self.directory.name, segment_size=64, max_blob_size=16, io=io)
+
+        with patch("storage.miner.packfile.os.fsync", wraps=os.fsync) as fsync:
+            location = asyncio.run(packs.put(r, "1", b"data"))
+        packs.close()
+        io.shutdown()
+
+        # The blob, and the directory of its new segment
+        self.assertEqual(2, fsync.call_count)
+        with open_blob(location) as blob:
+            self.assertEqual(b"data", bytes(blob))
@@ -0,0 +1,58 @@
+from collections import deque
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import patch
+
+from storage.miner.utils import RateLimiter, compute_stake_weights, log_request
+
+
+class TestRateLimiter(TestCase):
+    def test_buckets_are_per_caller(self):
+        limiter = RateLimiter(max_requests=2, time_window=60)
+
+        self.assertTrue(limiter.is_allowed("a"))
+        self.assertTrue(limiter.is_allowed("a"))
+        self.assertFalse(limiter.is_allowed("a"))
+        self.assertTrue(limiter.is_allowed("b"))
+
+    def test_bucket_refills_over_time(self):
+        limiter = RateLimiter(max_requests=2, time_window=60)
+        with patch("storage.miner.utils.time.monotonic", return_value=0.0):
+            self.assertTrue(limiter.is_allowed("a"))
+            self.assertTrue(limiter.is_allowed("a"))
+            self.assertFalse(limiter.is_allowed("a"))
+        with patch("storage.miner.utils.time.monotonic", return_value=30.0):
+            self.assertTrue(limiter.is_allowed("a"))
+            self.assertFalse(limiter.is_allowed("a"))
+
+    def test_weight_scales_capacity(self):
+        limiter = RateLimiter(max_requests=2, time_window=60)
+
+        allowed = sum(limiter.is_allowed("whale", weight=5.0) for _ in range(20))
+
+        self.assertEqual(10, allowed)
+
+    def test_callers_are_bounded(self):
+        limiter = RateLimiter(max_requests=1, time_window=60, max_callers=3)
+        for caller in range(10):
+            limiter.is_allowed(caller)
+
+        self.assertEqual([7, 8, 9], list(limiter.buckets))
+
+    def test_compute_stake_weights(self):
+        weights = compute_stake_weights(
+            ["a", "b", "c", "d"], [0, 100, 300, 1000], min_weight=0.1, max_weight=2.0
+        )
+
+        self.assertEqual(0.1, weights["a"])
+        self.assertAlmostEqual(100 / (1400 / 3), weights["b"])
+        self.assertEqual(2.0, weights["d"])
+
+    def test_log_request_is_bounded(self):
+        synapse = SimpleNamespace(name="Store", dendrite=SimpleNamespace(hotkey="a"))
+        request_log = {"a": [("Store", 0.0)] * 5}
+        for _ in range(5):
+            log_request(synapse, request_log, max_entries=3)
+
+        self.assertIsInstance(request_log["a"], deque)
+        self.assertEqual(3, len(request_log["a"]))
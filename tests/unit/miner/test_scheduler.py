@@ -0,0 +1,92 @@
+import time
+import asyncio
+import threading
+from unittest import TestCase
+
+from storage.miner.scheduler import MIN_RUN_TIME_SAMPLES, DeadlineExceeded, WorkScheduler
+
+
+class TestWorkScheduler(TestCase):
+    def setUp(self):
+        self.scheduler = WorkScheduler(max_workers=1)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def block_worker(self):
+        release = threading.Event()
+        self.scheduler.submit(release.wait)
+        return release
+
+    def test_runs_highest_stake_first(self):
+        release = self.block_worker()
+        order = []
+        futures = [
+            self.scheduler.submit(order.append, name, kind="store", stake=stake)
+            for name, stake in (("low", 1.0), ("high", 100.0), ("mid", 10.0))
+        ]
+        release.set()
+        for future in futures:
+            future.result(timeout=1)
+
+        self.assertEqual(["high", "mid", "low"], order)
+
+    def test_challenges_outrank_stores_of_equal_stake(self):
+        release = self.block_worker()
+        order = []
+        futures = [
+            self.scheduler.submit(order.append, kind, kind=kind, stake=5.0)
+            for kind in ("store", "challenge")
+        ]
+        release.set()
+        for future in futures:
+            future.result(timeout=1)
+
+        self.assertEqual(["challenge", "store"], order)
+
+    def test_drops_work_past_its_deadline(self):
+        release = self.block_worker()
+        future = self.scheduler.submit(
+            lambda: "done", kind="store", deadline=time.monotonic() + 0.01
+        )
+        time.sleep(0.05)
+        release.set()
+
+        with self.assertRaises(DeadlineExceeded):
+            future.result(timeout=1)
+        self.assertEqual(1, self.scheduler.stats()["types"]["store"]["dropped"])
+
+    def test_run_returns_result(self):
+        async def main():
+            return await self.scheduler.run(sum, [1, 2, 3], kind="retrieve")
+
+        self.assertEqual(6, asyncio.run(main()))
+        self.assertEqual(1, self.scheduler.stats()["types"]["retrieve"]["completed"])
+
+    def test_single_slow_sample_does_not_drop_work(self):
+        self.scheduler.submit(time.sleep, 0.2, kind="challenge").result(timeout=1)
+
+        future = self.scheduler.submit(
+            lambda: "done", kind="challenge", deadline=time.monotonic() + 0.1
+        )
+
+        self.assertEqual("done", future.result(timeout=1))
+
+    def test_drops_decay_the_run_time_estimate(self):
+        for _ in range(MIN_RUN_TIME_SAMPLES):
+            self.scheduler.submit(time.sleep, 0.2, kind="challenge").result(timeout=1)
+
+        results = []
+        for _ in range(100):
+            future = self.scheduler.submit(
+                lambda: "done", kind="challenge", deadline=time.monotonic() + 0.05
+            )
+            try:
+                results.append(future.result(timeout=1))
+                break
+            except DeadlineExceeded:
+                continue
+
+        # Work runs again once the drops brought the estimate under the deadline budget
+        self.assertEqual(["done"], results)
+        self.assertGreater(self.scheduler.stats()["types"]["challenge"]["dropped"], 0)
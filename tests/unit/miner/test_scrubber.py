@@ -0,0 +1,186 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+from unittest import TestCase
+
+import fakeredis
+
+from storage.shared.ecc import hash_data
+from storage.miner.blobstore import BlobStore
+from storage.miner.codec import PathTemplates
+from storage.miner.database import metadata_codec, store_or_update_chunk_metadata
+from storage.miner.packfile import BlobRange
+from storage.miner.scrubber import (
+    SCRUB_CURSOR_KEY,
+    SCRUB_DAMAGED_KEY,
+    SCRUB_STATS_KEY,
+    ByteRateLimiter,
+    check_blob,
+    quarantine_blob,
+    scrub_blob,
+    scrub_blobs,
+)
+
+DATA = b"encrypted data"
+DATA_HASH = str(hash_data(DATA))
+
+
+class TestScrubber(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.directory.name, shard_levels=2)
+
+    def tearDown(self):
+        self.store.io.shutdown()
+        self.directory.cleanup()
+
+    def test_intact_blob_passes(self):
+        filepath = self.store.put(DATA_HASH, DATA)
+
+        self.assertIsNone(check_blob(DATA_HASH, filepath))
+
+    def test_detects_corruption(self):
+        filepath = self.store.put(DATA_HASH, DATA)
+        with open(filepath, "r+b") as f:
+            f.write(b"E")
+
+        self.assertEqual("hash mismatch", check_blob(DATA_HASH, filepath))
+
+    def test_detects_truncation(self):
+        filepath = self.store.put(DATA_HASH, DATA)
+        os.truncate(filepath, 4)
+
+        self.assertEqual("hash mismatch", check_blob(DATA_HASH, filepath))
+
+    def test_detects_unreadable_blob(self):
+        self.assertIn("unreadable", check_blob(DATA_HASH, self.store.path(DATA_HASH)))
+
+    def test_checks_packed_range(self):
+        segment = os.path.join(self.directory.name, "segment")
+        with open(segment, "wb") as f:
+            f.write(b"head" + DATA + b"tail")
+
+        self.assertIsNone(check_blob(DATA_HASH, BlobRange(segment, 4, len(DATA))))
+        self.assertIsNotNone(check_blob(DATA_HASH, BlobRange(segment, 0, len(DATA))))
+
+    def test_quarantine_moves_blob(self):
+        filepath = self.store.put(DATA_HASH, DATA)
+
+        target = quarantine_blob(self.store, DATA_HASH, filepath)
+
+        self.assertFalse(os.path.exists(filepath))
+        with open(target, "rb") as f:
+            self.assertEqual(DATA, f.read())
+
+    def test_rate_limiter_sleeps_past_burst(self):
+        limiter = ByteRateLimiter(rate=1000, burst=100)
+
+        async def main():
+            start = time.monotonic()
+            await limiter.throttle(100)
+            await limiter.throttle(50)
+            return time.monotonic() - start
+
+        self.assertGreaterEqual(asyncio.run(main()), 0.045)
+
+
+class TestScrubBlobs(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = BlobStore(self.directory.name, shard_levels=2)
+        self.r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+        metadata_codec.templates = PathTemplates()
+
+    def tearDown(self):
+        self.store.io.shutdown()
+        self.directory.cleanup()
+
+    async def add(self, data, hotkeys=("hk1",)):
+        data_hash = str(hash_data(data))
+        filepath = await self.store.store(self.r, data_hash, data)
+        for hotkey in hotkeys:
+            await store_or_update_chunk_metadata(
+                self.r, data_hash, filepath, hotkey, len(data), "seed"
+            )
+        return data_hash, filepath
+
+    def test_keeps_legacy_entry_with_getsizeof_size(self):
+        async def main():
+            data_hash, filepath = await self.add(DATA)
+            # Older miners recorded sys.getsizeof(data) as the size
+            entry = {"filepath": filepath, "size": sys.getsizeof(DATA), "seed": "seed"}
+            await self.r.hset(data_hash, "hk1", json.dumps(entry))
+
+            nbytes, report = await scrub_blob(self.r, self.store, data_hash)
+            return filepath, nbytes, report, await self.r.exists(data_hash)
+
+        filepath, nbytes, report, exists = asyncio.run(main())
+
+        self.assertIsNone(report)
+        self.assertEqual(len(DATA), nbytes)
+        self.assertTrue(exists)
+        self.assertTrue(os.path.isfile(filepath))
+
+    def test_drops_every_entry_of_a_damaged_blob(self):
+        async def main():
+            data_hash, filepath = await self.add(DATA, ("hk1", "hk2"))
+            with open(filepath, "r+b") as f:
+                f.write(b"E")
+
+            _, report = await scrub_blob(self.r, self.store, data_hash)
+            damaged = json.loads(await self.r.hget(SCRUB_DAMAGED_KEY, data_hash))
+            return filepath, report, damaged, await self.r.exists(data_hash)
+
+        filepath, report, damaged, exists = asyncio.run(main())
+
+        self.assertEqual(["hk1", "hk2"], sorted(report["hotkeys"]))
+        self.assertEqual({"hk1": "hash mismatch", "hk2": "hash mismatch"}, damaged["reasons"])
+        self.assertFalse(exists)
+        self.assertFalse(os.path.exists(filepath))
+        self.assertEqual(1, len(report["quarantined"]))
+        self.assertTrue(os.path.isfile(report["quarantined"][0]))
+
+    def test_keeps_entries_pointing_at_intact_legacy_copies(self):
+        async def main():
+            data_hash = str(hash_data(DATA))
+            # Per hotkey copies of the legacy layout, hk1's has gone missing
+            for hotkey in ("hk1", "hk2"):
+                filepath = os.path.join(self.directory.name, hotkey, data_hash)
+                os.makedirs(os.path.dirname(filepath))
+                with open(filepath, "wb") as f:
+                    f.write(DATA)
+                await store_or_update_chunk_metadata(
+                    self.r, data_hash, filepath, hotkey, len(DATA), "seed"
+                )
+            os.remove(os.path.join(self.directory.name, "hk1", data_hash))
+
+            _, report = await scrub_blob(self.r, self.store, data_hash)
+            return data_hash, report, await self.r.hkeys(data_hash)
+
+        data_hash, report, hotkeys = asyncio.run(main())
+
+        self.assertEqual({"hk1": "missing"}, report["reasons"])
+        self.assertEqual([b"hk2"], hotkeys)
+        self.assertTrue(os.path.isfile(os.path.join(self.directory.name, "hk2", data_hash)))
+
+    def test_scrub_blobs_resumes_and_counts(self):
+        async def main():
+            hashes = [(await self.add(b"blob %d" % i))[0] for i in range(6)]
+            os.remove(self.store.path(hashes[2]))
+
+            first = await scrub_blobs(self.r, self.store, batch_size=1, max_keys=1)
+            cursor = await self.r.get(SCRUB_CURSOR_KEY)
+            rest = await scrub_blobs(self.r, self.store, batch_size=100)
+            stats = await self.r.hgetall(SCRUB_STATS_KEY)
+            return hashes, first, cursor, rest, stats
+
+        hashes, first, cursor, rest, stats = asyncio.run(main())
+
+        self.assertNotEqual(b"0", cursor)
+        self.assertEqual(6, int(stats[b"checked"]))
+        self.assertEqual(1, int(stats[b"damaged"]))
+        self.assertEqual(1, int(stats[b"passes"]))
+        self.assertEqual(6, first["checked"] + rest["checked"])
@@ -0,0 +1,30 @@
+import os
+import time
+import tempfile
+from unittest import TestCase
+
+from storage.miner.tiering import AccessTracker, list_blobs
+
+
+class TestTiering(TestCase):
+    def test_tracker_drains_counts(self):
+        tracker = AccessTracker()
+        for data_hash in (1, "1", "2"):
+            tracker.record(data_hash)
+
+        self.assertEqual({"1": 2, "2": 1}, tracker.drain())
+        self.assertEqual({}, tracker.drain())
+
+    def test_list_blobs_skips_recent_and_temporary_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            os.makedirs(os.path.join(directory, "ab"))
+            for name in ("123", "456", "123.1.2.tmp"):
+                with open(os.path.join(directory, "ab", name), "wb") as f:
+                    f.write(b"data")
+            old = time.time() - 100
+            os.utime(os.path.join(directory, "ab", "123"), (old, old))
+
+            self.assertEqual([("123", 4)], list_blobs(directory, min_age=50))
+            self.assertEqual(
+                [("123", 4), ("456", 4)], sorted(list_blobs(directory))
+            )
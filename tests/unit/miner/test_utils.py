@@ -0,0 +1,81 @@
+import ast
+import inspect
+import os
+from types import SimpleNamespace
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import fakeredis
+
+from storage.miner.admission import AdmissionController
+from storage.miner.scheduler import WorkScheduler
+from storage.miner.utils import update_storage_stats
+
+MINER_PATH = os.path.join(
+    os.path.dirname(__file__), os.pardir, os.pardir, os.pardir, "neurons", "miner.py"
+)
+
+
+def self_attributes(function: ast.AST, context) -> set:
+    """
+    Returns the attributes of `self` read or assigned in a function.
+    """
+    return {
+        node.attr
+        for node in ast.walk(function)
+        if isinstance(node, ast.Attribute)
+        and isinstance(node.value, ast.Name)
+        and node.value.id == "self"
+        and isinstance(node.ctx, context)
+    }
+
+
+class TestUpdateStorageStats(TestCase):
+    def test_runs_on_the_components_of_a_new_miner(self):
+        blob_store = MagicMock(cache=None)
+        blob_store.disks.usage.return_value = {"free_bytes": 900}
+        blob_store.disks.stats.return_value = []
+        blob_store.disks.roots = []
+        miner = SimpleNamespace(
+            blob_store=blob_store,
+            sync_database=fakeredis.FakeRedis(server=fakeredis.FakeServer()),
+            scheduler=WorkScheduler(max_workers=1),
+            admission=AdmissionController(capacity=1),
+        )
+        try:
+            update_storage_stats(miner)
+        finally:
+            miner.scheduler.shutdown()
+
+        self.assertEqual(0, miner.current_storage_usage)
+        self.assertEqual(0.0, miner.percent_disk_usage)
+
+    def test_miner_builds_its_components_before_the_first_call(self):
+        stats = ast.parse(inspect.getsource(update_storage_stats)).body[0]
+        needed = self_attributes(stats, ast.Load) - self_attributes(stats, ast.Store)
+        with open(MINER_PATH) as f:
+            miner = ast.parse(f.read())
+        init = next(
+            node
+            for cls in miner.body
+            if isinstance(cls, ast.ClassDef) and cls.name == "miner"
+            for node in cls.body
+            if isinstance(node, ast.FunctionDef) and node.name == "__init__"
+        )
+
+        # The statements of __init__ up to the first call, in order
+        built = set()
+        for statement in init.body:
+            calls = [
+                node
+                for node in ast.walk(statement)
+                if isinstance(node, ast.Call)
+                and getattr(node.func, "id", None) == "update_storage_stats"
+            ]
+            if calls:
+                break
+            built |= self_attributes(statement, ast.Store)
+        else:
+            self.fail("Miner.__init__ does not call update_storage_stats")
+
+        self.assertEqual(set(), needed - built)
@@ -0,0 +1,130 @@
+import os
+import tempfile
+from unittest import TestCase
+from parameterized import parameterized
+
+from storage.shared.ecc import (
+    DataHasher,
+    ECCommitment,
+    FixedBaseTable,
+    POINT_ENCODING_COMPRESSED,
+    POINT_ENCODING_LEGACY,
+    POINT_ENCODING_VERSION,
+    ecc_point_to_hex,
+    hash_data,
+    hash_file,
+    hash_stream,
+    hex_to_ecc_point,
+    mul_add,
+    negotiate_point_encoding,
+    point_encoding,
+    setup_CRS,
+)
+
+
+class TestECC(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.g, cls.h = setup_CRS()
+        cls.table = FixedBaseTable(cls.g, cls.h)
+
+    @parameterized.expand(
+        [
+            [1, 1],
+            [1, 2**256],
+            [2**256 - 1, 12345],
+            [98765, 2**255 + 7],
+            [2**256, 2**256],
+        ]
+    )
+    def test_fixed_base_table_matches_generic_multiplication(self, m, r):
+        expected = self.g * m + self.h * r
+
+        self.assertEqual(expected, self.table.mul_add(m, r))
+        self.assertEqual(expected, mul_add(self.g, m, self.h, r))
+
+    def test_fixed_base_table_rejects_wide_scalars(self):
+        self.assertIsNone(self.table.mul_add(2**257, 1))
+
+    def test_precomputed_commitment_opens(self):
+        fast = ECCommitment(self.g, self.h, precompute=True)
+        generic = ECCommitment(self.g, self.h)
+
+        c, m_val, r = fast.commit(b"some data")
+
+        self.assertTrue(generic.open(c, m_val, r))
+        self.assertTrue(fast.open(c, m_val, r))
+        self.assertFalse(fast.open(c, m_val + 1, r))
+
+    def test_commit_hashed_opens(self):
+        committer = ECCommitment(self.g, self.h)
+
+        c, m_val, r = committer.commit_hashed(hash_stream((b"some data", b"seed")))
+
+        self.assertEqual(hash_data(b"some dataseed"), m_val)
+        self.assertTrue(committer.open(c, m_val, r))
+
+
+class TestPointEncoding(TestCase):
+    @parameterized.expand([["P-256", 66], ["P-384", 98], ["P-521", 134]])
+    def test_encodings_round_trip(self, curve, compressed_length):
+        for point in setup_CRS(curve=curve):
+            legacy = ecc_point_to_hex(point)
+            compressed = ecc_point_to_hex(point, POINT_ENCODING_COMPRESSED)
+
+            self.assertEqual(compressed_length, len(compressed))
+            self.assertEqual(POINT_ENCODING_LEGACY, point_encoding(legacy))
+            self.assertEqual(POINT_ENCODING_COMPRESSED, point_encoding(compressed))
+            self.assertEqual(point, hex_to_ecc_point(legacy, curve))
+            self.assertEqual(point, hex_to_ecc_point(compressed, curve))
+
+    def test_decoded_points_are_independent_copies(self):
+        g, _ = setup_CRS()
+        encoded = ecc_point_to_hex(g, POINT_ENCODING_COMPRESSED)
+
+        point = hex_to_ecc_point(encoded, "P-256")
+        point.double()
+
+        self.assertEqual(g, hex_to_ecc_point(encoded, "P-256"))
+
+    @parameterized.expand([["02" + "ff" * 32], ["03" + "00" * 31], ["3132"]])
+    def test_invalid_points_are_rejected(self, encoded):
+        with self.assertRaises(ValueError):
+            hex_to_ecc_point(encoded, "P-256")
+
+    @parameterized.expand(
+        [
+            [None, POINT_ENCODING_LEGACY],
+            [POINT_ENCODING_LEGACY, POINT_ENCODING_LEGACY],
+            [POINT_ENCODING_COMPRESSED, POINT_ENCODING_COMPRESSED],
+            [POINT_ENCODING_VERSION + 1, POINT_ENCODING_VERSION],
+        ]
+    )
+    def test_negotiate_point_encoding(self, requested, expected):
+        self.assertEqual(expected, negotiate_point_encoding(requested))
+
+
+class TestStreamingHash(TestCase):
+    def test_hash_stream_matches_hash_data(self):
+        data = os.urandom(4096)
+
+        self.assertEqual(hash_data(data + b"seed"), hash_stream((data, b"seed")))
+        self.assertEqual(
+            hash_data(data + b"seed"), hash_stream((memoryview(data), b"se", b"ed"))
+        )
+        self.assertEqual(hash_data(b""), hash_stream(()))
+        self.assertEqual(hash_data(b"12"), hash_stream((1, 2)))
+
+    def test_hash_file_matches_hash_data(self):
+        data = os.urandom(10000)
+        with tempfile.TemporaryDirectory() as directory:
+            filepath = os.path.join(directory, "blob")
+            with open(filepath, "wb") as file:
+                file.write(data)
+
+            self.assertEqual(hash_data(data), hash_file(filepath))
+            self.assertEqual(hash_data(data + b"seed"), hash_file(filepath, b"seed"))
+            self.assertEqual(
+                hash_data(data + b"seed"),
+                DataHasher().update_file(filepath, block_size=333).update(b"seed").intdigest(),
+            )
@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import TestCase
+
+from storage.shared.ecc import hash_data, hash_stream
+from storage.validator.verify import verify_retrieve_stream
+
+DATA = b"segment-one|segment-two"
+PREVIOUS_SEED = "previous"
+SEED = "seed"
+
+
+def make_stream(segments, **trailer):
+    proof = hash_data(DATA + PREVIOUS_SEED.encode())
+    synapse = SimpleNamespace(
+        size=sum(len(segment) for segment in segments),
+        commitment_proof=str(proof),
+        commitment_hash=str(hash_stream((str(proof).encode(), SEED.encode()))),
+        error=None,
+        axon=SimpleNamespace(dict=dict),
+    )
+    for key, value in trailer.items():
+        setattr(synapse, key, value)
+
+    async def stream():
+        for segment in segments:
+            yield segment
+        yield synapse
+
+    return stream()
+
+
+def verify(stream, **kwargs):
+    return asyncio.run(verify_retrieve_stream(stream, str(hash_data(DATA)), SEED, **kwargs))
+
+
+class TestVerifyRetrieveStream(TestCase):
+    def test_verifies_segments_incrementally(self):
+        synapse, verified, segments = verify(
+            make_stream([DATA[:12], DATA[12:]]), keep_data=True
+        )
+
+        self.assertTrue(verified)
+        self.assertEqual(DATA, b"".join(segments))
+
+    def test_rejects_corrupted_data(self):
+        synapse, verified, _ = verify(make_stream([DATA[:12], b"x" * 12]))
+
+        self.assertFalse(verified)
+        self.assertIn("hash", synapse.error)
+
+    def test_rejects_wrong_commitment(self):
+        synapse, verified, _ = verify(make_stream([DATA], commitment_hash="0"))
+
+        self.assertFalse(verified)
+
+    def test_reports_oversized_streams(self):
+        synapse, verified, segments = verify(
+            make_stream([DATA, DATA]), max_size=len(DATA), keep_data=True
+        )
+
+        self.assertFalse(verified)
+        self.assertIsNone(segments)
+        self.assertEqual(f"Stream exceeded {len(DATA)} bytes", synapse.error)
+
+    def test_keeps_the_miner_error_of_oversized_streams(self):
+        synapse, verified, _ = verify(
+            make_stream([DATA, DATA], error="disk failure"), max_size=len(DATA)
+        )
+
+        self.assertFalse(verified)
+        self.assertIn(f"Stream exceeded {len(DATA)} bytes", synapse.error)
+        self.assertIn("disk failure", synapse.error)